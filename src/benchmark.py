@@ -0,0 +1,241 @@
+# benchmark.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from blocking import blocking_metrics, candidate_pairs
+from canonicalize import CANON_RULES, canonicalize_labels
+from cluster import cluster_pairs, summarize_labels
+from data_generate import gen_customers, gen_customers_fast
+from instrument import peak_rss_mb, reset_peak
+from model import load_model_bundle
+from normalize import normalize_frame
+from parallel import parallel_features, parallel_match
+from rules import evaluate_pairwise, match_rules, prepare_aux_cols, true_pairs
+from storage import read_pairs
+from store import RecordStore
+
+# Parameters
+ROOT        = Path(__file__).resolve().parents[1]
+BENCH_DIR   = ROOT / "out" / "bench"        # results/<run>.json and cached datasets in data/
+SIZES       = [1_000, 10_000]               # rows per dataset (the CLI takes up to 1e7)
+DUP_RATE    = 0.30                          # gen_customers: share of entities with duplicates
+MAX_DUPS    = 2                             # gen_customers: max duplicates per entity
+SEED        = 42
+GENERATOR   = "fast"                        # gen_customers_fast; "faker" = gen_customers (slow)
+TIME_TOL    = 0.20                          # compare: slower by more than 20% -> regression
+F1_TOL      = 0.005                         # compare: F1 lower by more than this -> regression
+MIN_SECONDS = 0.05                          # compare: faster stages are too noisy to flag
+
+# --- 1) Datasets ---
+def dataset(n_rows: int, dup_rate: float = DUP_RATE, max_dups_per: int = MAX_DUPS,
+            seed: int = SEED, data_dir: Path = BENCH_DIR / "data", generator: str = GENERATOR) -> Path:
+    """
+    Normalized gen_customers / gen_customers_fast data with n_rows rows
+    (uid = ground truth), as Parquet; generated once per parameter set and
+    reused by later runs.
+    """
+    path = Path(data_dir) / f"customers_{generator}_{n_rows}_{dup_rate}_{max_dups_per}_{seed}.parquet"
+    if not path.exists():
+        gen = {'fast': gen_customers_fast, 'faker': gen_customers}[generator]
+        per_entity = 1 + dup_rate * (1 + max_dups_per) / 2     # expected rows per uid
+        raw = gen(n_unique=int(n_rows / per_entity * 1.1) + 10, dup_rate=dup_rate,   # margin, cut below
+                  max_dups_per=max_dups_per, seed=seed)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        normalize_frame(raw.head(n_rows), aux=False).to_parquet(path, index=False)
+    return path
+
+# --- 2) Measurements ---
+def measure(stage: str, n_rows: int, fn: Callable, repeat: int = 1):
+    """Best-of-repeat wall time and peak RSS of fn(). Returns (result, record)."""
+    best = None
+    for _ in range(repeat):
+        reset_peak()
+        t0 = time.perf_counter()
+        result = fn()
+        seconds = time.perf_counter() - t0
+        best = seconds if best is None else min(best, seconds)
+    print(f"[bench] {n_rows:>9} rows  {stage:<20} {best:9.3f} s")
+    return result, {'n_rows': n_rows, 'stage': stage, 'seconds': round(best, 6),
+                    'rows_per_s': round(n_rows / best, 1) if best else None,
+                    'peak_rss_mb': round(peak_rss_mb(), 1)}
+
+def _quality(T: set, pairs: np.ndarray) -> dict:
+    m = evaluate_pairwise(T, set(zip(pairs[:, 0].tolist(), pairs[:, 1].tolist())))
+    return {k: round(m[k], 6) for k in ('precision', 'recall', 'f1')}
+
+def _pairs_per_s(rec: dict, n_pairs: int) -> dict:
+    rec.update(pairs=n_pairs, pairs_per_s=round(n_pairs / rec['seconds'], 1) if rec['seconds'] else None)
+    return rec
+
+# --- 3) Stages in isolation and end to end ---
+def bench_stages(path: Path, model_path: Optional[Path], meta_path: Optional[Path],
+                 workers: int = 1, repeat: int = 1) -> List[dict]:
+    """
+    Time every pipeline stage on its own input: aux columns, exact-key blocking,
+    pair features, rules, model, union-find clustering, the cluster summary
+    printed by pipeline.main and canonicalization. Stages are named after the
+    function they time (parallel_features, match_rules, parallel_match,
+    summarize_labels: the pipeline's batch paths, not the per-pair baselines).
+    """
+    df = pd.read_parquet(path).astype({'Zip_norm': str, 'Phone_norm': str})
+    n, out = len(df), []
+    T = true_pairs(df)
+
+    df, rec = measure('prepare_aux_cols', n, lambda: prepare_aux_cols(df), repeat)
+    out.append(rec)
+    cand, rec = measure('blocking', n, lambda: candidate_pairs(df), repeat)
+    m = blocking_metrics(df, cand)
+    out.append(_pairs_per_s({**rec, 'candidates': len(cand),
+                             'PC': round(m['PC'], 6), 'PQ': round(m['PQ'], 6)}, len(cand)))
+
+    store = RecordStore.from_frame(df)
+    (F, _), rec = measure('parallel_features', n, lambda: parallel_features(store, cand, workers), repeat)
+    out.append(_pairs_per_s(rec, len(cand)))
+    fired, rec = measure('match_rules', n, lambda: match_rules(F), repeat)
+    pred = cand[fired > 0]
+    out.append(_pairs_per_s({**rec, **_quality(T, pred)}, len(cand)))
+
+    if model_path is not None and Path(model_path).exists():
+        model = load_model_bundle(model_path, meta_path)
+        (mask, _), rec = measure('parallel_match', n,
+                                 lambda: parallel_match(store, cand, workers, model), repeat)
+        pred = cand[mask]
+        out.append(_pairs_per_s({**rec, **_quality(T, pred)}, len(cand)))
+
+    clusters, rec = measure('clusters', n, lambda: cluster_pairs(pred, df.index), repeat)
+    out.append(_pairs_per_s({**rec, 'clusters': int(clusters.n_clusters)}, len(pred)))
+    _, rec = measure('summarize_labels', n, lambda: summarize_labels(df, clusters.labels), repeat)
+    out.append(rec)
+    _, rec = measure('canonicalize', n, lambda: canonicalize_labels(df, clusters.labels, CANON_RULES), repeat)
+    out.append(rec)
+    return out
+
+def bench_end_to_end(path: Path, model_path: Optional[Path], meta_path: Optional[Path],
+                     workers: int = 1) -> dict:
+    """pipeline.py on the dataset in a child process (no stage cache): wall time, child peak RSS, F1."""
+    df = pd.read_parquet(path, columns=['uid'])
+    with tempfile.TemporaryDirectory() as out:
+        cmd = [sys.executable, "-W", "ignore", str(Path(__file__).with_name("pipeline.py")),
+               "--data", str(path), "--out-dir", out, "--no-cache", "--workers", str(workers)]
+        # no model: point --model at a missing file, the pipeline then falls back to the rules
+        cmd += ["--model", str(model_path or Path(out) / "none.joblib"), "--meta", str(meta_path)]
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL)
+        # the child's VmHWM, polled: ru_maxrss of a child also counts this process's RSS before exec
+        peak = 0.0
+        while proc.poll() is None:
+            peak = max(peak, peak_rss_mb(proc.pid) or 0.0)
+            time.sleep(0.02)
+        seconds = time.perf_counter() - t0
+        status = proc.returncode
+        if status:
+            raise RuntimeError(f"pipeline failed on {path} (status {status})")
+        pred = read_pairs(Path(out) / "pairs_pred.parquet")
+    n = len(df)
+    print(f"[bench] {n:>9} rows  {'end_to_end':<20} {seconds:9.3f} s")
+    return {'n_rows': n, 'stage': 'end_to_end', 'seconds': round(seconds, 6),
+            'rows_per_s': round(n / seconds, 1), 'peak_rss_mb': round(peak, 1) or None,
+            **_quality(true_pairs(df), np.asarray(pred).reshape(-1, 2))}
+
+def _meta(args: dict) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'cpus': os.cpu_count(), 'args': args}
+
+def run(sizes=SIZES, dup_rate: float = DUP_RATE, max_dups_per: int = MAX_DUPS, seed: int = SEED,
+        model_path: Optional[Path] = None, meta_path: Optional[Path] = None, workers: int = 1,
+        repeat: int = 1, end_to_end: bool = True, data_dir: Path = BENCH_DIR / "data",
+        generator: str = GENERATOR) -> dict:
+    """The benchmark over all sizes: {'meta': {...}, 'results': [record, ...]}."""
+    args = dict(sizes=list(sizes), dup_rate=dup_rate, max_dups_per=max_dups_per, seed=seed,
+                model=str(model_path) if model_path else None, workers=workers, repeat=repeat,
+                generator=generator)
+    results = []
+    for n in sizes:
+        t0 = time.perf_counter()
+        path = dataset(n, dup_rate, max_dups_per, seed, data_dir, generator)
+        print(f"[bench] {n:>9} rows  dataset {path.name} ({time.perf_counter() - t0:.1f} s)")
+        results += bench_stages(path, model_path, meta_path, workers, repeat)
+        if end_to_end:
+            results.append(bench_end_to_end(path, model_path, meta_path, workers))
+    return {'meta': _meta(args), 'results': results}
+
+# --- 4) Comparing runs ---
+def compare(base: dict, new: dict, time_tol: float = TIME_TOL, f1_tol: float = F1_TOL,
+            min_seconds: float = MIN_SECONDS) -> pd.DataFrame:
+    """
+    Stage-by-stage comparison of two run results (run() / JSON files) on the
+    (n_rows, stage) they share. `regression` marks stages slower by more than
+    time_tol (when they take at least min_seconds) or with F1 lower by more than f1_tol.
+    """
+    key = ['n_rows', 'stage']
+    cols = key + ['seconds', 'peak_rss_mb', 'f1']
+    frame = lambda r: pd.DataFrame(r['results']).reindex(columns=cols)
+    m = frame(base).merge(frame(new), on=key, suffixes=('_base', '_new'))
+    m['time_ratio'] = m['seconds_new'] / m['seconds_base']
+    m['f1_diff'] = m['f1_new'] - m['f1_base']
+    slower = (m['time_ratio'] > 1 + time_tol) & (m['seconds_new'] >= min_seconds)
+    m['regression'] = slower | (m['f1_diff'] < -f1_tol).fillna(False)
+    return m
+
+def main(argv=None):
+    from pipeline import META_PATH, MODEL_PATH
+    ap = argparse.ArgumentParser(description="Stage and end-to-end benchmark on gen_customers data")
+    ap.add_argument("--sizes", type=lambda s: int(float(s)), nargs="+", default=SIZES,
+                    help="rows per dataset, e.g. 1e3 1e5 1e7")
+    ap.add_argument("--dup-rate", type=float, default=DUP_RATE)
+    ap.add_argument("--max-dups-per", type=int, default=MAX_DUPS)
+    ap.add_argument("--seed", type=int, default=SEED)
+    ap.add_argument("--generator", choices=["fast", "faker"], default=GENERATOR,
+                    help="gen_customers_fast or gen_customers (slow above ~1e5 rows)")
+    ap.add_argument("--model", type=Path, default=MODEL_PATH)
+    ap.add_argument("--meta", type=Path, default=META_PATH)
+    ap.add_argument("--rules", action="store_true", help="skip the model (rules only)")
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=1, help="best of N timings per stage")
+    ap.add_argument("--no-end-to-end", action="store_true")
+    ap.add_argument("--out", type=Path, default=None,
+                    help="results JSON (default: out/bench/<commit>_<time>.json)")
+    ap.add_argument("--compare", type=Path, nargs="+", metavar="RESULTS",
+                    help="BASE [NEW]: compare two results files (NEW defaults to this run); "
+                         "exit code 1 on a regression")
+    args = ap.parse_args(argv)
+
+    if args.compare and len(args.compare) > 1:
+        new = json.loads(args.compare[1].read_text(encoding="utf-8"))
+    else:
+        model = None if args.rules else args.model
+        new = run(args.sizes, args.dup_rate, args.max_dups_per, args.seed, model, args.meta,
+                  args.workers, args.repeat, not args.no_end_to_end, generator=args.generator)
+        out = args.out or BENCH_DIR / f"{new['meta']['commit'] or 'run'}_{time.strftime('%Y%m%d-%H%M%S')}.json"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(new, indent=2), encoding="utf-8")
+        print(pd.DataFrame(new['results']).set_index(['n_rows', 'stage']).to_string())
+        print(f"[bench] results -> {out}")
+
+    if args.compare:
+        base = json.loads(args.compare[0].read_text(encoding="utf-8"))
+        m = compare(base, new)
+        print(m.set_index(['n_rows', 'stage']).to_string(float_format=lambda x: f"{x:.4f}"))
+        if m['regression'].any():
+            print(f"[bench] regressions: {int(m['regression'].sum())}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# blocking.py
+from __future__ import annotations
+from typing import Dict, Iterator, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Parameters
+MAX_BLOCK_SIZE = 1000        # blocks above this are split (or skipped), see encode_blocks
+CHUNK_SIZE     = 1_000_000   # candidate pairs per yielded chunk
+
+# --- 1) Blocking keys (same definitions as in blocking.ipynb) ---
+def block_keys(df: pd.DataFrame) -> Dict[str, pd.Series]:
+    email_domain = df['Email_norm'].str.split('@').str[-1]
+    phone_last4  = df['Phone_norm'].str[-4:]
+    name0        = df['Name_norm'].str[:1]
+    keys = {
+        'domain_zip': email_domain + '_' + df['Zip_norm'],
+        'pl4_zip':    phone_last4  + '_' + df['Zip_norm'],
+        'name0_zip':  name0        + '_' + df['Zip_norm'],
+    }
+    if 'City_norm' in df:
+        keys['city_zip'] = df['City_norm'] + '_' + df['Zip_norm']
+    return keys
+
+# --- 2) Integer-coded inverted index ---
+def encode_blocks(keys: Dict[str, pd.Series],
+                  max_block_size: int = MAX_BLOCK_SIZE,
+                  oversize: str = 'subblock',
+                  sort_by: Optional[pd.Series] = None) -> Tuple[Dict[str, np.ndarray], pd.DataFrame]:
+    """
+    Factorize every blocking key into int64 block codes per row (-1 = no block).
+
+    Blocks with more than max_block_size rows are either split into consecutive
+    sub-blocks of at most max_block_size rows, ordered by sort_by
+    (oversize='subblock'), or dropped (oversize='skip').
+
+    Returns:
+        (codes, report): codes maps key name -> codes array aligned with the rows;
+        report lists the oversized blocks (key, block, size, action).
+    """
+    if oversize not in ('subblock', 'skip'):
+        raise ValueError(f"oversize must be 'subblock' or 'skip', got {oversize!r}")
+
+    rank = None
+    if sort_by is not None:
+        rank = pd.factorize(sort_by, sort=True, use_na_sentinel=False)[0]
+
+    codes, report = {}, []
+    for name, ser in keys.items():
+        c, uniq = pd.factorize(ser)
+        c = c.astype(np.int64)
+        sizes = np.bincount(c[c >= 0], minlength=len(uniq))
+        big = np.flatnonzero(sizes > max_block_size)
+        for b in big:
+            report.append({'key': name, 'block': uniq[b], 'size': int(sizes[b]), 'action': oversize})
+
+        if big.size:
+            rows = np.flatnonzero(np.isin(c, big))
+            if oversize == 'skip':
+                c[rows] = -1
+            else:
+                # order rows inside each oversized block, then cut into chunks
+                secondary = rank[rows] if rank is not None else rows
+                rows = rows[np.lexsort((rows, secondary, c[rows]))]
+                block = c[rows]
+                first = np.r_[0, np.flatnonzero(np.diff(block)) + 1]
+                pos = np.arange(len(rows)) - np.repeat(first, np.diff(np.r_[first, len(rows)]))
+                sub = block * (max_block_size + len(rows)) + pos // max_block_size
+                c[rows] = len(uniq) + np.unique(sub, return_inverse=True)[1]
+        codes[name] = c
+
+    report = pd.DataFrame(report, columns=['key', 'block', 'size', 'action'])
+    return codes, report
+
+# --- 3) Streaming candidate pairs ---
+def iter_block_pairs(codes: Dict[str, np.ndarray],
+                     chunk_size: int = CHUNK_SIZE,
+                     groups: Optional[np.ndarray] = None,
+                     dedup: Optional[Dict[str, np.ndarray]] = None) -> Iterator[np.ndarray]:
+    """
+    Yield deduplicated candidate pairs as (n, 2) int64 arrays of row positions, i < j.
+
+    A pair sharing blocks under several keys is emitted only for the first of
+    them: it is dropped from key k if an earlier key already put both rows in
+    one block. This avoids holding a global set of pairs.
+
+    With `groups` (a group id per row, e.g. a shard), only pairs across two
+    groups are yielded and blocks inside a single group are not expanded.
+    `dedup` (same keys, in the same order) gives the codes the earlier-key check
+    uses, when `codes` only holds some of the blocks (see blockmatch.py).
+    """
+    names = list(codes)
+    dedup = codes if dedup is None else dedup
+    buf, buffered = [], 0
+    for k, name in enumerate(names):
+        c = codes[name]
+        rows = np.flatnonzero(c >= 0)
+        if groups is not None and len(rows):
+            lo = np.full(c.max() + 1, np.iinfo(np.int64).max)
+            hi = np.full(c.max() + 1, np.iinfo(np.int64).min)
+            np.minimum.at(lo, c[rows], groups[rows])
+            np.maximum.at(hi, c[rows], groups[rows])
+            rows = rows[(lo != hi)[c[rows]]]              # blocks spanning several groups
+        rows = rows[np.argsort(c[rows], kind='stable')]   # ascending rows inside a block
+        sizes = np.bincount(c[rows])
+        starts = np.r_[0, np.cumsum(sizes)[:-1]]
+
+        for m in np.unique(sizes[sizes > 1]):
+            blocks = np.flatnonzero(sizes == m)
+            a, b = np.triu_indices(m, 1)
+            step = max(1, chunk_size // len(a))
+            for s in range(0, len(blocks), step):
+                members = rows[starts[blocks[s:s + step], None] + np.arange(m)]
+                i, j = members[:, a].ravel(), members[:, b].ravel()
+                keep = np.ones(len(i), dtype=bool) if groups is None else groups[i] != groups[j]
+                for prev in names[:k]:
+                    pc = dedup[prev]
+                    keep &= ~((pc[i] == pc[j]) & (pc[i] >= 0))
+                buf.append(np.column_stack([i[keep], j[keep]]))
+                buffered += int(keep.sum())
+                if buffered >= chunk_size:
+                    yield np.concatenate(buf)
+                    buf, buffered = [], 0
+    if buffered:
+        yield np.concatenate(buf)
+
+def iter_candidate_pairs(df: pd.DataFrame,
+                         max_block_size: int = MAX_BLOCK_SIZE,
+                         oversize: str = 'subblock',
+                         chunk_size: int = CHUNK_SIZE,
+                         report: Optional[list] = None) -> Iterator[np.ndarray]:
+    """
+    Blocking for df: yield candidate pairs as (n, 2) int64 arrays of df.index labels.
+    Oversized blocks are appended to `report` (list of dicts) when it is given.
+    """
+    codes, rep = encode_blocks(block_keys(df), max_block_size, oversize, sort_by=df['Name_norm'])
+    if report is not None:
+        report.extend(rep.to_dict('records'))
+    labels = df.index.to_numpy()
+    for chunk in iter_block_pairs(codes, chunk_size):
+        i, j = labels[chunk[:, 0]], labels[chunk[:, 1]]
+        yield np.column_stack([np.minimum(i, j), np.maximum(i, j)])
+
+def candidate_pairs(df: pd.DataFrame, **kw) -> np.ndarray:
+    chunks = list(iter_candidate_pairs(df, **kw))
+    return np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.int64)
+
+# --- 4) Blocking quality (PC / RR / PQ as in blocking.ipynb) ---
+def blocking_metrics(df: pd.DataFrame, cand: np.ndarray, uid_col: str = 'uid') -> dict:
+    cand = np.asarray(cand).reshape(-1, 2)
+    uid = df[uid_col].to_numpy()
+    ui = uid[df.index.get_indexer(cand[:, 0])]
+    uj = uid[df.index.get_indexer(cand[:, 1])]
+    g = df[uid_col].value_counts().to_numpy()
+    n_true = int((g * (g - 1) // 2).sum())
+    tp = int((ui == uj).sum())
+    n = len(df); total = n * (n - 1) // 2
+    return {'PC': tp / max(n_true, 1),                          # recall (pairs completeness)
+            'RR': 1 - len(cand) / total if total else 0.0,      # reduction ratio
+            'PQ': tp / max(len(cand), 1),                       # pairs quality
+            'true_pairs': n_true, 'cand_pairs': len(cand)}
+
+def block_size_hist(codes: Dict[str, np.ndarray]) -> Dict[str, pd.Series]:
+    """Per key: block size -> number of blocks (blocks of size > 1)."""
+    out = {}
+    for name, c in codes.items():
+        sizes = np.bincount(c[c >= 0])
+        out[name] = pd.Series(sizes[sizes > 1]).value_counts().sort_index()
+    return out
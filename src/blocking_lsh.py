@@ -0,0 +1,147 @@
+# blocking_lsh.py
+from __future__ import annotations
+from typing import Dict, Iterator, Optional, Sequence, Tuple
+import argparse
+import numpy as np
+import pandas as pd
+
+from blocking import (MAX_BLOCK_SIZE, CHUNK_SIZE, block_keys, blocking_metrics,
+                      encode_blocks, iter_block_pairs)
+from rules import prepare_aux_cols
+
+# Parameters
+LSH_FIELDS = ['Name_norm', 'Street_norm', 'email_user']
+Q          = 3          # characters per q-gram
+BANDS      = 16         # bands per field: more bands -> more recall, more candidates
+ROWS       = 4          # signature rows per band: more rows -> fewer, purer candidates
+SEED       = 42
+ROW_CHUNK  = 100_000    # records hashed at once
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    # splitmix64 finalizer: a well-spread 64-bit bijection (uint64 arithmetic wraps)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+# --- 1) q-grams and MinHash signatures ---
+def qgrams(s: str, q: int = Q) -> set:
+    """Character q-grams of s padded with a space on both sides; short strings give one gram."""
+    s = f" {s} "
+    return {s[k:k + q] for k in range(max(len(s) - q + 1, 1))}
+
+def _gram_hashes(values: np.ndarray, q: int) -> Tuple[np.ndarray, np.ndarray]:
+    # (row position, 64-bit gram hash) for every distinct gram of every non-empty value
+    rows, grams = [], []
+    for r, v in enumerate(values):
+        if isinstance(v, str) and v:
+            g = qgrams(v, q)
+            rows.extend([r] * len(g))
+            grams.extend(g)
+    h = pd.util.hash_array(np.array(grams, dtype=object))
+    return np.array(rows, dtype=np.int64), h
+
+def minhash_signatures(values, num_perm: int, q: int = Q, seed: int = SEED,
+                       row_chunk: int = ROW_CHUNK) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    MinHash signatures of the q-gram sets of `values` under num_perm hash
+    functions mix(gram_hash ^ seed_k), seeded so every run and shard agrees.
+
+    Returns:
+        (sig, valid): sig is an (n, num_perm) uint64 array; valid is False
+        for missing or empty values, whose signature rows are meaningless.
+    """
+    values = np.asarray(values, dtype=object)
+    rng = np.random.default_rng(seed)
+    seeds = rng.integers(0, np.iinfo(np.uint64).max, num_perm, dtype=np.uint64, endpoint=True)
+    sig = np.zeros((len(values), num_perm), dtype=np.uint64)
+    valid = np.zeros(len(values), dtype=bool)
+    for lo in range(0, len(values), row_chunk):
+        rows, h = _gram_hashes(values[lo:lo + row_chunk], q)
+        if not len(rows):
+            continue
+        starts = np.r_[0, np.flatnonzero(np.diff(rows)) + 1]
+        present = lo + rows[starts]
+        valid[present] = True
+        for k in range(num_perm):
+            sig[present, k] = np.minimum.reduceat(_mix(h ^ seeds[k]), starts)
+    return sig, valid
+
+# --- 2) Banded buckets as block codes ---
+def band_keys(sig: np.ndarray, valid: np.ndarray, bands: int, rows: int) -> Dict[int, pd.Series]:
+    """One bucket key per band: a 64-bit hash of its `rows` signature values (<NA> if not valid)."""
+    if sig.shape[1] < bands * rows:
+        raise ValueError(f"signature has {sig.shape[1]} values, need bands*rows = {bands * rows}")
+    keys = {}
+    for band in range(bands):
+        h = np.zeros(len(sig), dtype=np.uint64)
+        for col in sig[:, band * rows:(band + 1) * rows].T:
+            h = (h ^ col) * np.uint64(0x100000001B3)      # FNV-style mixing, wraps mod 2^64
+        keys[band] = pd.Series(pd.arrays.IntegerArray(h, ~valid))
+    return keys
+
+def lsh_codes(df: pd.DataFrame, fields: Sequence[str] = LSH_FIELDS, bands: int = BANDS,
+              rows: int = ROWS, q: int = Q, seed: int = SEED,
+              max_block_size: int = MAX_BLOCK_SIZE,
+              oversize: str = 'subblock') -> Tuple[Dict[str, np.ndarray], pd.DataFrame]:
+    """
+    LSH buckets of every field as blocking keys '<field>_lsh<band>', in the
+    encode_blocks format (row -> block code), so they feed iter_block_pairs
+    alone or next to the exact keys. Two values share a bucket of some band
+    with probability 1 - (1 - J^rows)^bands for q-gram Jaccard similarity J.
+    """
+    if 'email_user' in fields and 'email_user' not in df:
+        df = prepare_aux_cols(df.copy())
+    keys = {}
+    for field in fields:
+        sig, valid = minhash_signatures(df[field].to_numpy(dtype=object), bands * rows, q, seed)
+        for band, ser in band_keys(sig, valid, bands, rows).items():
+            keys[f"{field}_lsh{band}"] = ser
+    return encode_blocks(keys, max_block_size, oversize, sort_by=df['Name_norm'])
+
+# --- 3) Candidate pairs (same interface as blocking.iter_candidate_pairs) ---
+def iter_lsh_candidate_pairs(df: pd.DataFrame, with_keys: bool = False,
+                             max_block_size: int = MAX_BLOCK_SIZE,
+                             oversize: str = 'subblock',
+                             chunk_size: int = CHUNK_SIZE,
+                             report: Optional[list] = None, **lsh) -> Iterator[np.ndarray]:
+    """
+    LSH blocking for df: yield candidate pairs as (n, 2) int64 arrays of df.index
+    labels, i < j. with_keys=True also blocks on the exact keys of blocking.py
+    (pairs found by both are emitted once). `lsh` goes to lsh_codes.
+    """
+    codes, rep = lsh_codes(df, max_block_size=max_block_size, oversize=oversize, **lsh)
+    if with_keys:
+        exact, rep_exact = encode_blocks(block_keys(df), max_block_size, oversize,
+                                         sort_by=df['Name_norm'])
+        codes, rep = {**exact, **codes}, pd.concat([rep_exact, rep], ignore_index=True)
+    if report is not None:
+        report.extend(rep.to_dict('records'))
+    labels = df.index.to_numpy()
+    for chunk in iter_block_pairs(codes, chunk_size):
+        i, j = labels[chunk[:, 0]], labels[chunk[:, 1]]
+        yield np.column_stack([np.minimum(i, j), np.maximum(i, j)])
+
+def lsh_candidate_pairs(df: pd.DataFrame, **kw) -> np.ndarray:
+    chunks = list(iter_lsh_candidate_pairs(df, **kw))
+    return np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.int64)
+
+def main(argv=None):
+    from blocking import candidate_pairs
+    from pipeline import CLEAR_DATA_PATH, load_data
+    ap = argparse.ArgumentParser(description="PC / RR / PQ of exact-key vs LSH blocking")
+    ap.add_argument("--data", default=CLEAR_DATA_PATH)
+    ap.add_argument("--bands", type=int, nargs="+", default=[BANDS])
+    ap.add_argument("--rows", type=int, nargs="+", default=[ROWS])
+    args = ap.parse_args(argv)
+
+    df = load_data(args.data)
+    runs = {'keys': candidate_pairs(df)}
+    for b in args.bands:
+        for r in args.rows:
+            runs[f'lsh b={b} r={r}'] = lsh_candidate_pairs(df, bands=b, rows=r)
+            runs[f'keys+lsh b={b} r={r}'] = lsh_candidate_pairs(df, with_keys=True, bands=b, rows=r)
+    table = pd.DataFrame([blocking_metrics(df, cand) for cand in runs.values()], index=list(runs))
+    print(table.to_string(float_format=lambda x: f"{x:.4f}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# blocking_tfidf.py
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Iterator, Optional, Tuple
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from blocking import CHUNK_SIZE, blocking_metrics
+
+if TYPE_CHECKING:   # annotations only: scipy / sklearn load when this blocker runs
+    from scipy import sparse
+
+# Parameters
+TFIDF_FIELDS = ['Name_norm', 'Street_norm', 'City_norm']
+NGRAMS     = (2, 3)   # character n-gram sizes (within word boundaries)
+TOP_K      = 10       # neighbours kept per record
+CUTOFF     = 0.5      # minimum cosine similarity of a neighbour
+MAX_DF     = 1_000    # n-grams in more records are ignored: bounds the work per record,
+                      # as MAX_BLOCK_SIZE bounds blocks
+CHUNK_ROWS = 1_000    # records per sparse product chunk
+
+# --- 1) TF-IDF vectors ---
+def tfidf_matrix(df: pd.DataFrame, fields=TFIDF_FIELDS, ngrams=NGRAMS,
+                 max_df: int = MAX_DF) -> sparse.csr_matrix:
+    """L2-normalized character n-gram TF-IDF rows of the concatenated fields (float32)."""
+    from sklearn.feature_extraction.text import TfidfVectorizer  # only when this blocker runs
+    text = df[fields[0]].fillna('').astype(str)
+    for f in fields[1:]:
+        text = text + ' ' + df[f].fillna('').astype(str)
+    vec = TfidfVectorizer(analyzer='char_wb', ngram_range=ngrams, max_df=max_df,
+                          dtype=np.float32, sublinear_tf=True)
+    return vec.fit_transform(text.to_numpy(dtype=str)).tocsr()
+
+# --- 2) Chunked top-k sparse dot product ---
+def top_k_chunk(X: sparse.csr_matrix, XT: sparse.csr_matrix, lo: int, hi: int,
+                k: int = TOP_K, cutoff: float = CUTOFF) -> np.ndarray:
+    """
+    For rows lo..hi-1: their k most similar other rows with cosine >= cutoff,
+    from one sparse product X[lo:hi] @ X.T. Returns (m, 2) row positions (row, neighbour).
+    """
+    S = (X[lo:hi] @ XT).tocsr()
+    rows = np.repeat(np.arange(lo, hi), np.diff(S.indptr))
+    cols, sim = S.indices.astype(np.int64), S.data
+    keep = (sim >= cutoff) & (cols != rows)
+    rows, cols, sim = rows[keep], cols[keep], sim[keep]
+    # best first inside each row; rank = position within the row's run
+    order = np.lexsort((cols, -sim, rows))
+    rows, cols = rows[order], cols[order]
+    first = np.r_[0, np.flatnonzero(np.diff(rows)) + 1] if len(rows) else np.empty(0, dtype=np.int64)
+    rank = np.arange(len(rows)) - np.repeat(first, np.diff(np.r_[first, len(rows)]))
+    top = rank < k
+    return np.column_stack([rows[top], cols[top]])
+
+_WORKER = {}
+
+def _init_worker(X):
+    _WORKER.update(X=X, XT=X.T.tocsr())
+
+def _run_chunk(bounds: Tuple[int, int], k: int, cutoff: float) -> np.ndarray:
+    return top_k_chunk(_WORKER['X'], _WORKER['XT'], *bounds, k=k, cutoff=cutoff)
+
+def top_k_pairs(X: sparse.csr_matrix, k: int = TOP_K, cutoff: float = CUTOFF,
+                chunk_rows: int = CHUNK_ROWS, workers: int = 1) -> Iterator[np.ndarray]:
+    """top_k_chunk over all rows, chunk by chunk (in a process pool when workers > 1)."""
+    n = X.shape[0]
+    bounds = [(lo, min(lo + chunk_rows, n)) for lo in range(0, n, chunk_rows)]
+    if workers <= 1 or len(bounds) < 2:
+        XT = X.T.tocsr()
+        for lo, hi in bounds:
+            yield top_k_chunk(X, XT, lo, hi, k, cutoff)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X,)) as pool:
+        yield from pool.map(_run_chunk, bounds, [k] * len(bounds), [cutoff] * len(bounds))
+
+# --- 3) Candidate pairs (same interface as blocking.iter_candidate_pairs) ---
+def iter_tfidf_candidate_pairs(df: pd.DataFrame, k: int = TOP_K, cutoff: float = CUTOFF,
+                               chunk_rows: int = CHUNK_ROWS, workers: int = 1,
+                               chunk_size: int = CHUNK_SIZE, fields=TFIDF_FIELDS,
+                               report: Optional[list] = None) -> Iterator[np.ndarray]:
+    """
+    Top-k TF-IDF blocking for df: yield candidate pairs as (n, 2) int64 arrays
+    of df.index labels, i < j, each pair once. Every record contributes at most
+    k pairs, so there are at most n * k candidates. `report` is unused.
+    """
+    n = len(df)
+    if n < 2:
+        return
+    parts = [np.minimum(p[:, 0], p[:, 1]) * n + np.maximum(p[:, 0], p[:, 1])
+             for p in top_k_pairs(tfidf_matrix(df, fields), k, cutoff, chunk_rows, workers)]
+    ids = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+    labels = df.index.to_numpy()
+    for s in range(0, len(ids), chunk_size):
+        part = ids[s:s + chunk_size]
+        i, j = labels[part // n], labels[part % n]
+        yield np.column_stack([np.minimum(i, j), np.maximum(i, j)])
+
+def tfidf_candidate_pairs(df: pd.DataFrame, **kw) -> np.ndarray:
+    chunks = list(iter_tfidf_candidate_pairs(df, **kw))
+    return np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.int64)
+
+def main(argv=None):
+    from blocking import candidate_pairs
+    from pipeline import CLEAR_DATA_PATH, load_data
+    ap = argparse.ArgumentParser(description="PC / RR / PQ of exact-key vs TF-IDF top-k blocking")
+    ap.add_argument("--data", default=CLEAR_DATA_PATH)
+    ap.add_argument("--k", type=int, nargs="+", default=[TOP_K])
+    ap.add_argument("--cutoff", type=float, default=CUTOFF)
+    ap.add_argument("--workers", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    df = load_data(args.data)
+    runs = {'keys': lambda: candidate_pairs(df)}
+    for k in args.k:
+        runs[f'tfidf k={k}'] = lambda k=k: tfidf_candidate_pairs(df, k=k, cutoff=args.cutoff,
+                                                                 workers=args.workers)
+    rows = []
+    for name, run in runs.items():
+        t0 = time.perf_counter()
+        cand = run()
+        rows.append({'method': name, **blocking_metrics(df, cand),
+                     'seconds': round(time.perf_counter() - t0, 3)})
+    print(pd.DataFrame(rows).set_index('method').to_string(float_format=lambda x: f"{x:.4f}"))
+
+if __name__ == "__main__":
+    main()
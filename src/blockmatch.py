@@ -0,0 +1,151 @@
+# blockmatch.py
+from __future__ import annotations
+from collections import Counter
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import JaroWinkler
+
+from blocking import MAX_BLOCK_SIZE, CHUNK_SIZE, block_keys, encode_blocks, iter_block_pairs
+from model import model_proba
+from parallel import match_chunk, split_pairs
+from rules import FEATURES, HARD_NAME, NAME_THR, match_rules, rule_counts
+from simcache import similarity_caches
+from store import RecordStore
+
+# Parameters
+MATRIX_MIN = 8      # smaller blocks are matched as one batch of pair lists
+MATRIX_MAX = 500    # larger blocks too: m x m matrices would cost more than the pairs
+NAME_CUTS  = (NAME_THR, HARD_NAME, 0.88)    # name_sim thresholds of the rules
+
+# equality feature -> store column
+EQ_COLS = {'zip_eq': 'Zip_norm', 'city_eq': 'City_norm', 'email_eq': 'Email_norm',
+           'phone_eq': 'Phone_norm', 'email_user_eq': 'email_user',
+           'phone_last4_eq': 'phone_last4'}
+
+# --- 1) One block: similarity matrices -> features of its new pairs ---
+def _sim_matrix(codes: np.ndarray, vocab: np.ndarray, scorer, workers: int, cuts=()) -> np.ndarray:
+    # cdist over the distinct values of the block only, broadcast back to its rows
+    u, inv = np.unique(codes, return_inverse=True)
+    values = np.where(u >= 0, vocab[u], None)
+    M = process.cdist(values, values, scorer=scorer, dtype=np.float64, workers=workers)
+    # cdist's Jaro-Winkler may differ from the scalar call (rules.name_scores) in
+    # the last ulp: rescore cells at a rule threshold so decisions stay identical
+    if cuts:
+        near = np.zeros(M.shape, dtype=bool)
+        for cut in cuts:
+            near |= np.abs(M - cut) < 1e-9
+        for a, b in zip(*np.nonzero(near)):
+            M[a, b] = scorer(values[a], values[b])
+    return M[inv[:, None], inv[None, :]]
+
+def block_features(store: RecordStore, rows: np.ndarray, earlier: List[np.ndarray],
+                   workers: int = 1) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    """
+    Features of all pairs (rows[a], rows[b]), a < b, of one block from two
+    rapidfuzz cdist matrices (name_sim, street_sim) and code equality. Pairs
+    that share a block of an `earlier` key (codes arrays) are left out, as in
+    blocking.iter_block_pairs. Returns (row_a, row_b, {feature: values}) with
+    the values of pair_features_batch.
+    """
+    a, b = np.triu_indices(len(rows), 1)
+    keep = np.ones(len(a), dtype=bool)
+    for pc in earlier:
+        c = pc[rows]
+        keep &= ~((c[a] == c[b]) & (c[a] >= 0))
+    a, b = a[keep], b[keep]
+    name = _sim_matrix(store.codes['Name_norm'][rows], store.vocab,
+                       JaroWinkler.normalized_similarity, workers, NAME_CUTS)
+    street = _sim_matrix(store.codes['Street_norm'][rows], store.vocab,
+                         fuzz.token_set_ratio, workers)
+    F = {'name_sim': name[a, b], 'street_sim': street[a, b]}
+    for feature, col in EQ_COLS.items():
+        if col in store.codes:
+            c = store.codes[col][rows]
+            F[feature] = (c[a] == c[b]) & (c[a] >= 0)
+        else:
+            F[feature] = np.zeros(len(a), dtype=bool)
+    return rows[a], rows[b], F
+
+def _decide(F: pd.DataFrame, model, stats: Counter) -> np.ndarray:
+    # same counters as parallel.match_chunk: pairs and, for the rules, pairs per fired rule
+    stats['pairs'] += len(F)
+    if model is None:
+        fired = match_rules(F)
+        stats.update(rule_counts(fired))
+        return fired > 0
+    clf, feat_cols, thr = model
+    return model_proba(F, clf, feat_cols) >= thr
+
+# --- 2) Fused blocking + matching ---
+def block_match(df: pd.DataFrame, model=None, max_block_size: int = MAX_BLOCK_SIZE,
+                matrix_min: int = MATRIX_MIN, matrix_max: int = MATRIX_MAX,
+                workers: int = 1, chunk_size: int = CHUNK_SIZE) -> Tuple[np.ndarray, Counter]:
+    """
+    Blocking and matching in one pass over the blocks of blocking.block_keys.
+    Blocks of matrix_min..matrix_max rows get their name/street similarity
+    matrices from one cdist call each (workers threads) and the rule / model
+    decision on their pairs' cells; the other blocks are expanded as pair
+    lists and matched by parallel.match_chunk. A pair in blocks of several
+    keys is scored once, for the first key. Predictions equal
+    match_pairs(candidate_pairs(df)).
+
+    Returns:
+        (pred_pairs, stats): sorted (n, 2) index-label pairs and counters.
+    """
+    store = RecordStore.from_frame(df)
+    codes, _ = encode_blocks(block_keys(df), max_block_size, sort_by=df['Name_norm'])
+    labels = df.index.to_numpy()
+    stats, out = Counter(), []
+
+    # medium blocks: matrices, decided in batches of about chunk_size pairs
+    pending, pending_pairs = [], 0
+    def flush():
+        nonlocal pending, pending_pairs
+        if pending:
+            i = np.concatenate([p[0] for p in pending])
+            j = np.concatenate([p[1] for p in pending])
+            F = pd.DataFrame({f: np.concatenate([p[2][f] for p in pending]) for f in FEATURES})
+            hit = _decide(F, model, stats)
+            out.append(np.column_stack([labels[i[hit]], labels[j[hit]]]))
+        pending, pending_pairs = [], 0
+
+    rest = {}
+    names = list(codes)
+    for k, name in enumerate(names):
+        c = codes[name]
+        sizes = np.bincount(c[c >= 0]) if (c >= 0).any() else np.zeros(0, dtype=np.int64)
+        matrix = (sizes >= matrix_min) & (sizes <= matrix_max)
+        rows = np.flatnonzero(c >= 0)
+        rows = rows[matrix[c[rows]]]
+        rows = rows[np.argsort(c[rows], kind='stable')]
+        bounds = np.r_[0, np.cumsum(sizes[matrix])]
+        earlier = [codes[p] for p in names[:k]]
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            i, j, F = block_features(store, rows[lo:hi], earlier, workers)
+            pending.append((i, j, F))
+            pending_pairs += len(i)
+            stats['matrix_pairs'] += len(i)
+            if pending_pairs >= chunk_size:
+                flush()
+        stats['matrix_blocks'] += int(matrix.sum())
+        in_matrix = (c >= 0) & matrix[np.maximum(c, 0)] if len(matrix) else np.zeros(len(c), dtype=bool)
+        rest[name] = np.where(in_matrix, -1, c)
+    flush()
+
+    # small and huge blocks: pair lists, deduplicated against the full codes
+    sim_cache = similarity_caches(store)
+    for chunk in iter_block_pairs(rest, chunk_size, dedup=codes):
+        pairs = np.column_stack([labels[chunk[:, 0]], labels[chunk[:, 1]]])
+        stats['list_pairs'] += len(pairs)
+        for part in split_pairs(pairs, chunk_size):
+            mask, st = match_chunk(store, part, model, sim_cache)
+            stats.update(st)
+            out.append(part[mask])
+
+    pred = np.concatenate(out) if out else np.empty((0, 2), dtype=np.int64)
+    pred = np.column_stack([pred.min(axis=1), pred.max(axis=1)]).astype(np.int64)
+    pred = pred[np.lexsort((pred[:, 1], pred[:, 0]))]
+    stats.update(candidates=stats['matrix_pairs'] + stats['list_pairs'], matches=len(pred))
+    return pred, stats
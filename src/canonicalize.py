@@ -2,6 +2,7 @@
 from __future__ import annotations
 from typing import Callable, Dict, Iterable, List, Sequence
 import hashlib
+import numpy as np
 import pandas as pd
 
 # --- 1) Stable entity_id (independent of row order) ---
@@ -22,6 +23,16 @@ def most_frequent_valid(s: pd.Series):
     # Currently identical to majority; validation for email/phone can be added here later
     return majority(s)
 
+# Rules used by the pipeline
+CANON_RULES = {
+    "Name_norm":  longest,              # choose the longest normalized string
+    "Street_norm": majority,
+    "City_norm":   majority,
+    "Zip_norm":    majority,
+    "Email_norm":  most_frequent_valid, # most frequent valid value
+    "Phone_norm":  most_frequent_valid, # most frequent valid value
+}
+
 # --- 3) Canonicalization of a single cluster ---
 def canonicalize_cluster(df: pd.DataFrame, idxs: List[int],
                          rules: Dict[str, Callable[[pd.Series], object]]) -> dict:
@@ -68,3 +79,114 @@ def canonicalize_all(df: pd.DataFrame, clusters: List[List[int]],
                   .sort_values(["support_size","entity_id"], ascending=[False, True])
                   .reset_index(drop=True))
     return df_with_eid, entities
+
+# --- 5) Vectorized canonicalization from a labels array ---
+def _stable_ids(keys: Iterable[str], prefix: str = "ent_") -> List[str]:
+    return [prefix + hashlib.sha1(k.encode()).hexdigest()[:12] for k in keys]
+
+def _best(frame: pd.DataFrame, score: str) -> pd.Series:
+    # one value per cluster: highest score, ties go to the cluster's earliest row
+    best = (frame.sort_values(["cl", score, "pos"], ascending=[True, False, True])
+                 .drop_duplicates("cl"))
+    return pd.Series(best["val"].to_numpy(), index=best["cl"].to_numpy())
+
+def _value_counts(cl: np.ndarray, pos: np.ndarray, vals: np.ndarray) -> pd.DataFrame:
+    # per (cluster, value): count and earliest row - what value_counts() ranks by
+    g = (pd.DataFrame({"cl": cl, "code": pd.factorize(vals)[0], "pos": pos})
+           .groupby(["cl", "code"], sort=False)["pos"].agg(n="size", pos="min")
+           .reset_index())
+    return g.assign(val=vals[np.searchsorted(pos, g["pos"].to_numpy())])
+
+def canonicalize_labels(df: pd.DataFrame, labels,
+                        rules: Dict[str, Callable[[pd.Series], object]],
+                        copy: bool = True):
+    """
+    Same output as canonicalize_all, with clusters given as a labels array
+    aligned with df rows (e.g. cluster.Clusters.labels) instead of lists.
+    copy=False adds entity_id to df itself instead of to a copy.
+
+    majority / most_frequent_valid / longest and the metadata columns are computed
+    with grouped operations over multi-row clusters; singletons pass straight
+    through. Other rule callables are applied per cluster slice as a fallback.
+    """
+    labels = np.asarray(labels)
+    n = len(df)
+    idx = df.index.to_numpy()
+    # rows grouped by cluster, ascending index inside a cluster (like build_clusters)
+    order = np.lexsort((idx, labels))
+    lab = labels[order]
+    starts = np.flatnonzero(np.r_[True, lab[1:] != lab[:-1]]) if n else np.zeros(0, dtype=int)
+    sizes = np.diff(np.r_[starts, n])
+    k = len(starts)
+    cl = np.repeat(np.arange(k), sizes)          # cluster number of every sorted row
+    single = sizes == 1
+    in_multi = ~single[cl]
+    s_rows = starts[single]
+
+    # entity ids: one sha1 per cluster over "|".join(sorted idx)
+    idx_str = idx[order].astype(str).astype(object)
+    keys = idx_str[starts]
+    for c in np.flatnonzero(~single):
+        keys[c] = "|".join(idx_str[starts[c]:starts[c] + sizes[c]])
+    eids = np.array(_stable_ids(keys), dtype=object)
+    out = {"entity_id": eids.tolist(), "support_size": sizes.tolist()}
+
+    def per_cluster(multi: pd.Series, single_vals: np.ndarray, fill=None) -> list:
+        res = np.full(k, fill, dtype=object)
+        res[multi.index.to_numpy()] = multi.to_numpy()
+        res[single] = single_vals
+        return res.tolist()
+
+    values = {}
+    for col in set(rules) | {"Name_norm", "Email_norm", "Phone_norm"}:
+        if col in df:
+            vals = df[col].to_numpy(dtype=object)[order]
+            valid = pd.notna(vals)
+            m = in_multi & valid
+            values[col] = (vals, valid, cl[m], np.flatnonzero(m))
+
+    for col, fn in rules.items():
+        if col not in df:
+            continue
+        vals, valid, mcl, mpos = values[col]
+        if fn in (majority, most_frequent_valid):
+            best = _best(_value_counts(mcl, mpos, vals[mpos]), "n")
+            out[col] = per_cluster(best, np.where(valid[s_rows], vals[s_rows], None))
+        elif fn is longest:
+            v = vals[mpos].astype(str).astype(object)
+            frame = pd.DataFrame({"cl": mcl, "pos": mpos, "val": v,
+                                  "len": pd.Series(v, dtype=object).str.len().to_numpy()})
+            sv = np.where(valid[s_rows], vals[s_rows].astype(str), None)
+            out[col] = per_cluster(_best(frame, "len"), sv)
+        else:
+            # custom rule: call it on every cluster slice, like canonicalize_cluster
+            s = df[col].iloc[order]
+            out[col] = [fn(s.iloc[a:a + m]) for a, m in zip(starts, sizes)]
+
+    # Useful metadata/aggregates (as in canonicalize_cluster)
+    if "Name_norm" in values:
+        vals, valid, mcl, mpos = values["Name_norm"]
+        top = _value_counts(mcl, mpos, vals[mpos]).groupby("cl")["n"].max()
+        share = top / sizes[top.index.to_numpy()]
+        out["name_share"] = per_cluster(share, np.where(valid[s_rows], 1.0, None))
+    for col, name in (("Email_norm", "all_emails"), ("Phone_norm", "all_phones")):
+        if col not in values:
+            continue
+        vals, valid, mcl, mpos = values[col]
+        u = (pd.DataFrame({"cl": mcl, "val": vals[mpos]}).drop_duplicates()
+               .sort_values(["cl", "val"]))
+        ucl, uval = u["cl"].to_numpy(), u["val"].tolist()
+        bounds = np.flatnonzero(np.r_[True, ucl[1:] != ucl[:-1], True]) if len(ucl) else np.zeros(1, int)
+        joined = pd.Series([";".join(uval[a:b]) for a, b in zip(bounds[:-1], bounds[1:])],
+                           index=ucl[bounds[:-1]], dtype=object)
+        out[name] = per_cluster(joined, np.where(valid[s_rows], vals[s_rows], ""), fill="")
+
+    df_with_eid = df.copy() if copy else df
+    eid_rows = np.empty(n, dtype=object)
+    eid_rows[order] = eids[cl]
+    df_with_eid["entity_id"] = eid_rows.tolist()
+
+    entities = (pd.DataFrame(out)
+                  .sort_values(["support_size", "entity_id"], ascending=[False, True])
+                  .reset_index(drop=True))
+    return df_with_eid, entities
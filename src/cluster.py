@@ -1,6 +1,8 @@
 # cluster.py
 from collections import defaultdict, deque
 from itertools import combinations
+from typing import NamedTuple
+import numpy as np
 import pandas as pd
 from rapidfuzz.distance import JaroWinkler
 from rapidfuzz import fuzz
@@ -37,6 +39,111 @@ def build_clusters(pairs, index):
         clusters.append(sorted(comp))
     return clusters
 
+# --- Array-based union-find ---
+
+class Clusters(NamedTuple):
+    """
+    Connected components in CSR form over row positions 0..n-1.
+    Cluster c holds members[offsets[c]:offsets[c+1]] (ascending); labels[r] is the
+    cluster of row r. Clusters are numbered by their first row, as in build_clusters.
+    """
+    labels: np.ndarray
+    offsets: np.ndarray
+    members: np.ndarray
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @classmethod
+    def from_labels(cls, labels, n_clusters: int = None) -> 'Clusters':
+        """CSR form of a labels array (labels 0..k-1 numbered by first row)."""
+        labels = np.asarray(labels)
+        if n_clusters is None:
+            n_clusters = int(labels.max()) + 1 if len(labels) else 0
+        offsets = np.r_[0, np.cumsum(np.bincount(labels, minlength=n_clusters))]
+        members = np.argsort(labels, kind='stable')
+        return cls(labels, offsets, members)
+
+    def to_lists(self, index=None):
+        """Same shape as build_clusters(): list of sorted lists of index labels."""
+        if not self.n_clusters:
+            return []
+        vals = self.members if index is None else np.asarray(index)[self.members]
+        return [part.tolist() for part in np.split(vals, self.offsets[1:-1])]
+
+def find_roots(parent: np.ndarray, x: np.ndarray) -> np.ndarray:
+    """Roots of rows x in a parent forest (parent[x] <= x); parent may be memory-mapped."""
+    r = parent[x]
+    while True:
+        up = parent[r]
+        if np.array_equal(up, r):
+            return r
+        r = up
+
+def union_edges(parent: np.ndarray, u: np.ndarray, v: np.ndarray) -> None:
+    """
+    Union edges (u[k], v[k]) into a parent forest in place (parent[x] <= x, so
+    roots are the smallest row of their component).
+
+    Every round compresses the edge endpoints onto their roots, drops edges
+    already inside one component and hooks each larger root onto the smallest
+    root it shares an edge with: np.minimum.at lets every edge of a root take
+    part, so a hub linked to many rows is merged in one round, not one per edge.
+    The hooked roots are then pointer-jumped onto their new roots.
+    """
+    while len(u):
+        ru, rv = find_roots(parent, u), find_roots(parent, v)
+        parent[u], parent[v] = ru, rv
+        live = ru != rv
+        u, v, ru, rv = u[live], v[live], ru[live], rv[live]
+        if not len(u):
+            break
+        hi = np.maximum(ru, rv)
+        np.minimum.at(parent, hi, np.minimum(ru, rv))
+        # hooks of one round can chain (k+1 -> k -> k-1 ...): pointer-jump the hooked roots
+        r = parent[hi]
+        while True:
+            up = parent[r]
+            if np.array_equal(up, r):
+                break
+            parent[hi] = r = up
+
+def union_find(i, j, n: int) -> Clusters:
+    """
+    Connected components of n rows linked by edges (i[k], j[k]) given as row positions.
+
+    Vectorized union-find (union_edges), then pointer jumping until every row
+    points at its root. Roots are the smallest row of their component.
+    """
+    dt = np.int32 if n < 2**31 else np.int64
+    parent = np.arange(n, dtype=dt)
+    union_edges(parent, np.asarray(i, dtype=dt), np.asarray(j, dtype=dt))
+    while True:
+        jumped = parent[parent]
+        if np.array_equal(jumped, parent):
+            break
+        parent = jumped
+
+    # compact labels 0..k-1 in order of each component's smallest row
+    is_root = parent == np.arange(n, dtype=dt)
+    labels = (np.cumsum(is_root) - 1)[parent]
+    return Clusters.from_labels(labels, int(is_root.sum()))
+
+def cluster_pairs(pairs, index) -> Clusters:
+    """union_find over pairs of index labels (set of tuples or (n, 2) array)."""
+    pairs = pairs if isinstance(pairs, np.ndarray) else np.array(list(pairs), dtype=np.int64)
+    pairs = pairs.reshape(-1, 2)
+    index = pd.Index(index)
+    i, j = index.get_indexer(pairs[:, 0]), index.get_indexer(pairs[:, 1])
+    if (i < 0).any() or (j < 0).any():
+        raise KeyError("pair labels not found in index")
+    return union_find(i, j, len(index))
+
 # cluster.py
 
 def summarize_clusters(df, clusters, uid_col='uid'):
@@ -71,6 +178,28 @@ def summarize_clusters(df, clusters, uid_col='uid'):
         })
     return pd.DataFrame(rows).sort_values(['size'], ascending=False)
 
+def summarize_labels(df, labels, uid_col='uid'):
+    """
+    summarize_clusters() from a row -> cluster labels array (Clusters.labels,
+    clusters numbered by their first row): sizes by bincount and uid counts by
+    one groupby over (cluster, uid) instead of a loop over cluster lists.
+    """
+    labels = np.asarray(labels)
+    k = int(labels.max()) + 1 if len(labels) else 0
+    out = pd.DataFrame({'cluster_id': np.arange(k), 'size': np.bincount(labels, minlength=k)})
+    out['n_uids'] = out['top_uid'] = out['top_uid_share'] = None
+    if uid_col in df.columns and k:
+        g = pd.DataFrame({'c': labels, 'u': df[uid_col].to_numpy(), 'pos': np.arange(len(labels))})
+        g = g[g['u'].notna()]
+        cnt = g.groupby(['c', 'u'], sort=False).agg(n=('pos', 'size'), first=('pos', 'min')).reset_index()
+        # value_counts order: most frequent uid first, ties by first row
+        top = cnt.sort_values(['c', 'n', 'first'], ascending=[True, False, True]).drop_duplicates('c')
+        out['n_uids'] = np.bincount(cnt['c'], minlength=k)
+        out['top_uid'] = pd.Series(top['u'].to_numpy(), index=top['c'].to_numpy())
+        out['top_uid_share'] = pd.Series(top['n'].to_numpy() / out['size'].to_numpy()[top['c']],
+                                         index=top['c'].to_numpy())
+    return out.sort_values(['size'], ascending=False)
+
 def show_cluster(df, clusters, cid, cols=None, uid_col='uid'):
     """
     Return a view of a specific cluster, optionally limited to selected columns.
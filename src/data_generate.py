@@ -1,10 +1,18 @@
 import re
 import random
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List
+import argparse
 import numpy as np
 import pandas as pd
 from faker import Faker
 
+# Parameters (gen_customers_fast)
+VOCAB_SIZE = 5_000      # Faker samples per vocabulary (first/last names, street names, cities)
+SHARD_SIZE = 100_000    # entities per shard: the unit of seeding, parallelism and output chunks
+
 def gen_customers(
     n_unique: int = 500,
     dup_rate: float = 0.30,
@@ -101,11 +109,214 @@ def gen_customers(
     df.insert(0, "row_id", np.arange(1, len(df) + 1))
     return df
 
-# Example usage:
-if __name__ == "__main__":
-    df = gen_customers(n_unique=500, dup_rate=0.3, max_dups_per=2, locale="en_US", seed=42)
+# --- Fast generator: Faker vocabularies + vectorized noise ---
+@lru_cache(maxsize=4)
+def faker_vocab(locale: str = "en_US", seed: int = 42, size: int = VOCAB_SIZE) -> Dict[str, np.ndarray]:
+    """Distinct Faker values to sample from, built once per (locale, seed, size)."""
+    fake = Faker(locale)
+    fake.seed_instance(seed)
+    draw = lambda f: pd.unique(np.array([f() for _ in range(size)], dtype=str))
+    return {'first': draw(fake.first_name), 'last': draw(fake.last_name),
+            'street': draw(fake.street_name), 'city': draw(fake.city)}
+
+def _encode(values: np.ndarray):
+    # strings -> (n, width) matrix of code points + lengths
+    s = np.asarray(values, dtype=str)
+    width = max(s.dtype.itemsize // 4, 1)
+    return s.astype(f'<U{width}').view(np.uint32).reshape(len(s), width).copy(), np.char.str_len(s)
+
+def _decode(M: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(M).view(f'<U{M.shape[1]}').ravel()
+
+def _delete_char(M: np.ndarray, L: np.ndarray, mask: np.ndarray, pos: np.ndarray):
+    # drop M[r, pos[r]] in the masked rows: shift the rest of the row left
+    j = np.arange(M.shape[1])
+    src = np.minimum(j[None, :] + (mask[:, None] & (j[None, :] >= pos[:, None])), M.shape[1] - 1)
+    M = np.take_along_axis(M, src, axis=1)
+    M[np.flatnonzero(mask), L[mask] - 1] = 0
+    return M, L - mask
+
+def noisy_strings(rng: np.random.Generator, values: np.ndarray) -> np.ndarray:
+    """gen_customers' noisy_str on a whole array: replace (ASCII letters), delete, swap."""
+    M, L = _encode(values)
+    n = len(L)
+    rows = np.arange(n)
+    ok = L >= 2
+    # character replacement: next letter, lowercased
+    m = ok & (rng.random(n) < 0.35)
+    pos = (rng.random(n) * L).astype(np.int64)
+    c = M[rows, pos]
+    c = np.where((c >= 65) & (c <= 90), c + 32, c)
+    m &= (c >= 97) & (c <= 122)
+    M[rows[m], pos[m]] = (c[m] - 97 + 1) % 26 + 97
+    # character deletion
+    m = ok & (rng.random(n) < 0.25)
+    M, L = _delete_char(M, L, m, (rng.random(n) * L).astype(np.int64))
+    # swap adjacent characters
+    m = ok & (L > 2) & (rng.random(n) < 0.25)
+    pos = (rng.random(n) * np.maximum(L - 1, 0)).astype(np.int64)[m]
+    r = rows[m]
+    M[r, pos], M[r, pos + 1] = M[r, pos + 1], M[r, pos].copy()
+    return _decode(M)
+
+def tweak_emails(rng: np.random.Generator, local: np.ndarray, domain: str = "example.com") -> np.ndarray:
+    """gen_customers' tweak_email on local parts: drop a character, then .com -> .co."""
+    M, L = _encode(local)
+    n = len(L)
+    m = (rng.random(n) < 0.6) & (L > 3)
+    M, L = _delete_char(M, L, m, (rng.random(n) * L).astype(np.int64))
+    email = np.char.add(_decode(M), "@" + domain)
+    co = rng.random(n) < 0.3
+    email[co] = np.char.replace(email[co], ".com", ".co", count=1)
+    return email
+
+def tweak_phones(rng: np.random.Generator, digits: np.ndarray) -> np.ndarray:
+    """gen_customers' tweak_phone on an (n, 10) digit matrix: 0-2 random digits replaced."""
+    digits = digits.copy()
+    n, width = digits.shape
+    k = rng.integers(0, 3, n)
+    for t in range(2):
+        m = k > t
+        digits[np.flatnonzero(m), rng.integers(0, width, n)[m]] = rng.integers(0, 10, n)[m]
+    return digits
+
+def _digits_str(digits: np.ndarray) -> np.ndarray:
+    return _decode((digits + 48).astype(np.uint32))
+
+def customer_shard(vocab: Dict[str, np.ndarray], n_unique: int, uid0: int, seed: np.random.SeedSequence,
+                   dup_rate: float = 0.30, max_dups_per: int = 2) -> pd.DataFrame:
+    """
+    Entities uid0+1 .. uid0+n_unique, each followed by its duplicates, as in
+    gen_customers (same fields, noise and probabilities); no row_id yet.
+    """
+    rng = np.random.default_rng(seed)
+    pick = lambda key: vocab[key][rng.integers(0, len(vocab[key]), n_unique)]
+    name = np.char.add(np.char.add(pick('first'), " "), pick('last'))
+    street = np.char.add(np.char.add(pick('street'), " "), rng.integers(1, 200, n_unique).astype(str))
+    city = pick('city')
+    zipc = np.char.zfill(rng.integers(0, 100_000, n_unique).astype(str), 5)
+    local = pd.Series(name).str.lower().str.replace(r"[^a-z0-9]+", ".", regex=True).to_numpy(dtype=str)
+    email = np.char.add(local, "@example.com")
+    phone = np.column_stack([np.zeros(n_unique, dtype=np.int64), rng.integers(0, 10, (n_unique, 9))])
+
+    # duplicates: each entity's rows are consecutive, the original first
+    n_dups = np.where(rng.random(n_unique) < dup_rate, rng.integers(1, max_dups_per + 1, n_unique), 0)
+    ent = np.repeat(np.arange(n_unique), 1 + n_dups)
+    dup = np.ones(len(ent), dtype=bool)
+    dup[np.r_[0, np.cumsum(1 + n_dups)[:-1]]] = False
+    d = ent[dup]
+    nd = len(d)
+
+    out = {'uid': uid0 + 1 + ent}
+    for col, base, noisy in (('name', name, noisy_strings(rng, name[d])),
+                             ('street', street, noisy_strings(rng, street[d]))):
+        out[col] = base[ent]
+        out[col][dup] = noisy
+    out['city'] = city[ent]
+    keep = rng.random(nd) < 0.9
+    out['city'][dup] = np.where(keep, city[d], noisy_strings(rng, city[d]))
+    out['zip'] = zipc[ent]                                  # ZIP often matches
+    out['email'] = email[ent]
+    keep = rng.random(nd) < 0.7
+    out['email'][dup] = np.where(keep, email[d], tweak_emails(rng, local[d]))
+    digits = phone[ent]
+    keep = rng.random(nd) < 0.7
+    digits[dup] = np.where(keep[:, None], phone[d], tweak_phones(rng, phone[d]))
+    out['phone'] = _digits_str(digits)
+    return pd.DataFrame({k: v if k == 'uid' else v.astype(object) for k, v in out.items()})
+
+_VOCAB = {}
+
+def _init_worker(vocab):
+    _VOCAB.update(vocab)
+
+def _run_shard(args):
+    return customer_shard(_VOCAB, *args)
+
+def iter_customer_shards(n_unique: int = 500, dup_rate: float = 0.30, max_dups_per: int = 2,
+                         locale: str = "en_US", seed: int = 42, shard_size: int = SHARD_SIZE,
+                         workers: int = 1) -> Iterator[pd.DataFrame]:
+    """
+    gen_customers_fast shard by shard (in a process pool when workers > 1).
+    Shard k gets the k-th SeedSequence(seed) child, so the data depends on
+    (seed, shard_size) but not on workers. row_id continues across shards.
+    """
+    vocab = faker_vocab(locale, seed)
+    bounds = list(range(0, n_unique, shard_size))
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds))
+    tasks = [(min(shard_size, n_unique - lo), lo, ss, dup_rate, max_dups_per)
+             for lo, ss in zip(bounds, seeds)]
+    if workers > 1 and len(tasks) > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(vocab,))
+        shards = pool.map(_run_shard, tasks)
+    else:
+        pool, shards = None, (customer_shard(vocab, *t) for t in tasks)
+    try:
+        row0 = 0
+        for df in shards:
+            df.insert(0, "row_id", np.arange(row0 + 1, row0 + len(df) + 1))
+            row0 += len(df)
+            yield df
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+def gen_customers_fast(n_unique: int = 500, dup_rate: float = 0.30, max_dups_per: int = 2,
+                       locale: str = "en_US", seed: int = 42, shard_size: int = SHARD_SIZE,
+                       workers: int = 1) -> pd.DataFrame:
+    """
+    High-throughput gen_customers: names, streets and cities sampled from Faker
+    vocabularies, typo noise applied with NumPy on encoded strings. Same
+    columns and uid / row_id semantics; not the same rows as gen_customers.
+    """
+    return pd.concat(iter_customer_shards(n_unique, dup_rate, max_dups_per, locale, seed,
+                                          shard_size, workers), ignore_index=True)
+
+def write_customers(path, n_unique: int, **kw) -> int:
+    """Stream gen_customers_fast shards to CSV or Parquet (by extension); returns the row count."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows, writer = 0, None
+    try:
+        for df in iter_customer_shards(n_unique, **kw):
+            if path.suffix == ".parquet":
+                import pyarrow as pa, pyarrow.parquet as pq
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                writer = writer or pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+            else:
+                df.to_csv(path, mode="a" if rows else "w", header=not rows, index=False)
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Synthetic customers with duplicates (uid = ground truth)")
+    ap.add_argument("--n-unique", type=lambda s: int(float(s)), default=500)
+    ap.add_argument("--dup-rate", type=float, default=0.3)
+    ap.add_argument("--max-dups-per", type=int, default=2)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--fast", action="store_true", help="gen_customers_fast, streamed in shards")
+    ap.add_argument("--workers", type=int, default=1, help="processes for --fast")
+    ap.add_argument("--out", type=Path, default=Path("data/customers_synthetic.csv"),
+                    help=".csv or .parquet")
+    args = ap.parse_args(argv)
+
+    if args.fast:
+        rows = write_customers(args.out, args.n_unique, dup_rate=args.dup_rate,
+                               max_dups_per=args.max_dups_per, seed=args.seed, workers=args.workers)
+        print(f"Total rows: {rows} | Unique customers (uid): {args.n_unique}")
+        print(f"\nFile saved: {args.out}")
+        return
+    df = gen_customers(n_unique=args.n_unique, dup_rate=args.dup_rate,
+                       max_dups_per=args.max_dups_per, locale="en_US", seed=args.seed)
     print(df.head(10))
     print("\nTotal rows:", len(df), " | Unique customers (uid):", df["uid"].nunique())
     # Save to CSV
-    df.to_csv("data/customers_synthetic.csv", index=False)
-    print('\nFile saved: customers_synthetic.csv')
+    df.to_csv(args.out, index=False)
+    print(f'\nFile saved: {args.out.name}')
+
+if __name__ == "__main__":
+    main()
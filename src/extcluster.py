@@ -0,0 +1,114 @@
+# extcluster.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+import tempfile
+import numpy as np
+import pandas as pd
+
+from cluster import union_edges
+from storage import read_pairs
+
+MEMORY_LIMIT = 1 << 30   # default budget in bytes
+EDGE_BYTES   = 64        # working memory per edge of a chunk (endpoints, roots, masks)
+MIN_EDGES    = 10_000
+
+# --- 1) Edge partitions ---
+def iter_edge_chunks(sources: Iterable, chunk_edges: int,
+                     index: Optional[pd.Index] = None) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Yield (u, v) row-position arrays of at most chunk_edges edges from edge partitions:
+    (n, 2) arrays, .npy files of row positions (memory-mapped, e.g. an
+    streaming.EdgeSpool) or pair tables (.csv/.parquet/.arrow) of index labels,
+    mapped to positions through `index`.
+    """
+    for src in sources:
+        if isinstance(src, np.ndarray):
+            edges = src.reshape(-1, 2)
+        elif Path(src).suffix == '.npy':
+            edges = np.load(src, mmap_mode='r')
+        else:
+            if index is None:
+                raise ValueError(f"{src}: pair tables hold index labels, pass `index`")
+            labels = read_pairs(src)
+            edges = np.column_stack([index.get_indexer(labels[:, 0]), index.get_indexer(labels[:, 1])])
+        for s in range(0, len(edges), chunk_edges):
+            part = np.asarray(edges[s:s + chunk_edges])
+            yield part[:, 0], part[:, 1]
+
+# --- 2) Union-find against a (possibly memory-mapped) parent array ---
+# chunks go through cluster.union_edges, which only reads / writes the rows of their edges
+
+def _resolve_labels(parent: np.ndarray, labels: np.ndarray, block: int) -> int:
+    """
+    Point every row at its root and write compact labels 0..k-1 numbered by each
+    component's smallest row. Rows are visited in ascending blocks; since
+    parent[x] <= x, rows of earlier blocks are already final.
+    """
+    n, k = len(parent), 0
+    for lo in range(0, n, block):
+        hi = min(lo + block, n)
+        p = np.array(parent[lo:hi])
+        out = p < lo
+        p[out] = parent[p[out]]
+        while True:
+            inside = p >= lo
+            q = p.copy()
+            q[inside] = p[p[inside] - lo]
+            if np.array_equal(q, p):
+                break
+            p = q
+        parent[lo:hi] = p
+
+        is_root = p == np.arange(lo, hi)
+        lab = np.empty(hi - lo, dtype=labels.dtype)
+        lab[is_root] = k + np.arange(int(is_root.sum()))
+        inside = p >= lo
+        lab[inside] = lab[p[inside] - lo]
+        lab[~inside] = labels[p[~inside]]
+        labels[lo:hi] = lab
+        k += int(is_root.sum())
+    return k
+
+def external_components(sources: Iterable, n: int, labels_path,
+                        memory_limit: int = MEMORY_LIMIT, workdir=None,
+                        index: Optional[pd.Index] = None) -> np.ndarray:
+    """
+    Connected components of n rows over edge partitions that need not fit in memory.
+
+    Edges are read in chunks sized from memory_limit and unioned into one parent
+    array, which is memory-mapped in `workdir` when it does not fit in half the
+    budget (chunks are then sorted by endpoint for locality). A final pass in
+    ascending row blocks writes the row -> cluster label array to labels_path
+    (.npy). Labels are those of cluster.union_find, i.e. clusters numbered by
+    their first row, as in build_clusters.
+
+    Returns:
+        labels as a read-only memory-mapped array.
+    """
+    dt = np.int32 if n < 2**31 else np.int64
+    half = memory_limit // 2
+    chunk_edges = max(MIN_EDGES, half // EDGE_BYTES)
+    block = max(MIN_EDGES, half // (4 * np.dtype(dt).itemsize))
+    on_disk = 2 * n * np.dtype(dt).itemsize > half
+
+    with tempfile.TemporaryDirectory(prefix="er_cc_", dir=workdir) as tmp:
+        if on_disk:
+            parent = np.lib.format.open_memmap(Path(tmp) / "parent.npy", 'w+', dt, (n,))
+            for lo in range(0, n, block):
+                parent[lo:min(lo + block, n)] = np.arange(lo, min(lo + block, n), dtype=dt)
+        else:
+            parent = np.arange(n, dtype=dt)
+
+        for u, v in iter_edge_chunks(sources, chunk_edges, index):
+            u, v = u.astype(dt, copy=False), v.astype(dt, copy=False)
+            if on_disk:
+                order = np.argsort(np.minimum(u, v), kind='stable')
+                u, v = u[order], v[order]
+            union_edges(parent, u, v)
+
+        labels = np.lib.format.open_memmap(labels_path, 'w+', dt, (n,))
+        _resolve_labels(parent, labels, block)
+        labels.flush()
+        del labels, parent
+    return np.load(labels_path, mmap_mode='r')
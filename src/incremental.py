@@ -0,0 +1,327 @@
+# incremental.py
+from __future__ import annotations
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+import json
+import numpy as np
+import pandas as pd
+
+from blocking import MAX_BLOCK_SIZE, block_keys
+from canonicalize import CANON_RULES, canonicalize_labels
+from cluster import find_roots, union_edges
+from parallel import CHUNK_SIZE, match_chunk, split_pairs
+from rules import prepare_aux_cols
+from simcache import similarity_caches
+from storage import write_table
+from store import RecordStore
+
+# Parameters
+BUCKETS      = 64        # hash buckets of the key index and of the cluster membership lists
+RECORD_GROUP = 10_000    # rows per Parquet row group of a records part (unit of record reads)
+LAYOUT       = 3         # state directory layout version
+
+ROW_COL  = '_row'    # global row id: position of the record over all batches
+NAME_COL = '_name'   # Name_norm kept next to the block keys, orders oversized blocks
+ROOT_COL = '_root'   # cluster root (smallest row of the cluster)
+
+def _read_parquet(path, row_groups: Optional[List[int]] = None) -> pd.DataFrame:
+    # every stored part is read through here (whole file or only some row groups)
+    import pyarrow.parquet as pq
+    pf = pq.ParquetFile(path)
+    table = pf.read() if row_groups is None else pf.read_row_groups(list(row_groups))
+    return table.to_pandas()
+
+def _bucket(values, buckets: int) -> np.ndarray:
+    """Stable hash bucket of each key value (pandas' fixed-key hash)."""
+    return (pd.util.hash_array(np.asarray(values, dtype=object)) % np.uint64(buckets)).astype(np.int64)
+
+class IncrementalState:
+    """
+    Persisted entity-resolution state for resolving records batch by batch.
+
+    <path>/ holds, per added batch k:
+      records/part-k.parquet                the records with their global row ids,
+                                            in row groups of record_group rows
+      index/<key>/bucket-b/part-k.parquet   block key values hashed to bucket b (the block index)
+      clusters/bucket-b/part-k.parquet      (root, row) cluster memberships, root % buckets == b
+      entities/bucket-b/part-k.parquet      entities (re)built by the batch, with their root,
+                                            root % buckets == b
+      changes/part-k.parquet                rows of the clusters the batch changed, with
+                                            their new and previous entity_id
+      pairs/part-k.npy                      matched pairs found for the batch
+    plus parent.i64 (raw int64 parent forest, appended and updated in place,
+    roots are the smallest row of their cluster) and meta.json.
+
+    add() reads only the index buckets of the batch's key values, the row
+    groups holding the stored records it compares with or canonicalizes again,
+    and the membership and entity buckets of the clusters it changes;
+    everything it writes is appended, and delta() returns what a batch changed. An entity is current while its root is a root and no later
+    batch rebuilt it. For data without oversized blocks the state equals a full
+    run over all batches; in blocks above max_block_size a new record is
+    compared with the max_block_size members nearest to it in Name_norm order,
+    as the full run's sub-blocks do.
+    """
+    def __init__(self, path, max_block_size: int = MAX_BLOCK_SIZE, buckets: int = BUCKETS,
+                 record_group: int = RECORD_GROUP):
+        self.path = Path(path)
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            self.meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if self.meta.get('layout') != LAYOUT:
+                raise ValueError(f"{self.path}: state written by an older version, rebuild it")
+        else:
+            self.meta = {'layout': LAYOUT, 'rows': 0, 'batches': 0, 'offsets': [],
+                         'max_block_size': max_block_size, 'buckets': buckets,
+                         'record_group': record_group}
+        for sub in ("records", "index", "clusters", "entities", "changes", "pairs"):
+            (self.path / sub).mkdir(parents=True, exist_ok=True)
+
+    def __len__(self) -> int:
+        return self.meta['rows']
+
+    def _part(self, sub: str, k: int, ext: str = ".parquet") -> Path:
+        return self.path / sub / f"part-{k:05d}{ext}"
+
+    def _parts(self, sub: str, ext: str = ".parquet"):
+        return [self._part(sub, k, ext) for k in range(self.meta['batches'])]
+
+    def _bucket_parts(self, sub: str, buckets) -> List[Path]:
+        return [p for b in np.unique(buckets) for p in sorted((self.path / sub / f"bucket-{b:03d}").glob("part-*.parquet"))]
+
+    def _write_buckets(self, df: pd.DataFrame, sub: str, buckets: np.ndarray, k: int) -> None:
+        for b, part in df.groupby(buckets, sort=True):
+            write_table(part, self.path / sub / f"bucket-{b:03d}" / f"part-{k:05d}.parquet")
+
+    def _parent_map(self, extend: int = 0) -> np.ndarray:
+        # parent forest memory-mapped read/write; `extend` new rows are appended as their own roots
+        f = self.path / "parent.i64"
+        n = len(self) + extend
+        if extend:
+            with open(f, "ab") as out:
+                out.write(np.arange(len(self), n, dtype=np.int64).tobytes())
+        if not n:
+            return np.empty(0, dtype=np.int64)
+        return np.memmap(f, dtype=np.int64, mode="r+", shape=(n,))
+
+    # --- stored state ---
+    def records(self, rows: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Stored records indexed by global row id (only `rows`, ascending, when given)."""
+        if rows is None:
+            parts = [_read_parquet(p) for p in self._parts("records")]
+        else:
+            rows = np.unique(np.asarray(rows, dtype=np.int64))
+            starts = np.asarray(self.meta['offsets'], dtype=np.int64)
+            part = np.searchsorted(starts, rows, side="right") - 1
+            parts = []
+            for k in np.unique(part):
+                r = rows[part == k]
+                groups = np.unique((r - starts[k]) // self.meta['record_group'])
+                df = _read_parquet(self._part("records", k), groups.tolist())
+                parts.append(df[df[ROW_COL].isin(r)])
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat(parts, ignore_index=True).set_index(ROW_COL).rename_axis(None)
+
+    def pairs(self) -> np.ndarray:
+        parts = [np.load(p) for p in self._parts("pairs", ".npy")]
+        pairs = np.concatenate(parts) if parts else np.empty((0, 2), dtype=np.int64)
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+    def parent(self) -> np.ndarray:
+        """Cluster root of every row (the smallest row of its cluster)."""
+        parent = np.array(self._parent_map())
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                return parent
+            parent = jumped
+
+    def _entity_log(self, roots: Optional[np.ndarray] = None) -> pd.DataFrame:
+        # latest stored entity of each root (only the buckets of `roots` when given)
+        buckets = np.arange(self.meta['buckets']) if roots is None else roots % self.meta['buckets']
+        parts = [_read_parquet(p) for p in self._bucket_parts("entities", buckets)]
+        if not parts:
+            return pd.DataFrame()
+        ent = pd.concat(parts, ignore_index=True).drop_duplicates(ROOT_COL, keep="last")
+        return ent if roots is None else ent[ent[ROOT_COL].isin(roots)]
+
+    def entities(self, roots: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Current entities; `roots` is the parent() of the state when already at hand."""
+        ent = self._entity_log()
+        if not len(ent):
+            return ent
+        roots = self.parent() if roots is None else roots
+        ent = ent[roots[ent[ROOT_COL].to_numpy()] == ent[ROOT_COL].to_numpy()]
+        return (ent.drop(columns=ROOT_COL)
+                   .sort_values(["support_size", "entity_id"], ascending=[False, True])
+                   .reset_index(drop=True))
+
+    def entity_ids(self) -> np.ndarray:
+        roots = self.parent()
+        ent = self._entity_log()
+        if not len(ent):
+            return np.empty(0, dtype=object)
+        by_root = np.empty(len(roots), dtype=object)
+        by_root[ent[ROOT_COL].to_numpy()] = ent["entity_id"].to_numpy(dtype=object)
+        return by_root[roots]
+
+    def labels(self) -> np.ndarray:
+        """Cluster label per row, clusters numbered by their first row (as cluster.union_find)."""
+        return pd.factorize(self.parent())[0]
+
+    def rows_with_entity_id(self) -> pd.DataFrame:
+        df = self.records()
+        df["entity_id"] = self.entity_ids().tolist()
+        return df
+
+    def delta(self, k: int = -1):
+        """
+        What batch k (the last by default) changed: (pairs, rows, entities, retired)
+        with the matched pairs it found, the rows of the clusters it changed (stored
+        records indexed by global row id, with entity_id and prev_entity_id), the entities
+        it (re)built and the entity ids it retired. Reads only the batch's parts and
+        the record row groups of its rows.
+        """
+        k = range(self.meta['batches'])[k]
+        changes = _read_parquet(self._part("changes", k))
+        rows = self.records(changes[ROW_COL].to_numpy())
+        rows["entity_id"] = changes["entity_id"].tolist()
+        rows["prev_entity_id"] = pd.Series(changes["prev_entity_id"].to_numpy(dtype=object, na_value=None),
+                                           index=rows.index, dtype=object)   # None for new rows
+        parts = [_read_parquet(p) for p in sorted((self.path / "entities").glob(f"bucket-*/part-{k:05d}.parquet"))]
+        entities = pd.DataFrame()
+        if parts:
+            entities = (pd.concat(parts, ignore_index=True).drop(columns=ROOT_COL)
+                          .sort_values(["support_size", "entity_id"], ascending=[False, True])
+                          .reset_index(drop=True))
+        prev = changes["prev_entity_id"].dropna().unique()
+        retired = np.sort(prev[~np.isin(prev, changes["entity_id"].to_numpy(dtype=object))]).astype(object)
+        return np.load(self._part("pairs", k, ".npy")), rows, entities, retired
+
+    # --- delta ---
+    def _index_entries(self, key: str, values: np.ndarray) -> pd.DataFrame:
+        # stored (row, name, key value) entries for the given key values: their buckets only
+        parts = self._bucket_parts(f"index/{key}", _bucket(values, self.meta['buckets']))
+        if not parts:
+            return pd.DataFrame(columns=[ROW_COL, NAME_COL, key])
+        old = pd.concat([_read_parquet(p) for p in parts], ignore_index=True)
+        return old[old[key].isin(values)]
+
+    def _members(self, roots: np.ndarray) -> pd.DataFrame:
+        # stored (root, row) memberships of the given roots: their buckets only
+        parts = self._bucket_parts("clusters", roots % self.meta['buckets'])
+        if not parts:
+            return pd.DataFrame({ROOT_COL: [], ROW_COL: []}, dtype=np.int64)
+        m = pd.concat([_read_parquet(p) for p in parts], ignore_index=True)
+        return m[m[ROOT_COL].isin(roots)]
+
+    def _candidates(self, new_keys: pd.DataFrame) -> np.ndarray:
+        # pairs (new, stored) and (new, new) sharing a block key value
+        limit = self.meta['max_block_size']
+        out = []
+        for key in new_keys.columns.drop([ROW_COL, NAME_COL]):
+            new = new_keys[[ROW_COL, NAME_COL, key]].dropna(subset=[key])
+            if not len(new):
+                continue
+            old = self._index_entries(key, new[key].unique()) if len(self) else new.iloc[:0]
+            members = pd.concat([old, new], ignore_index=True)
+            sizes = members[key].map(members[key].value_counts())
+            small = members[sizes <= limit]
+            m = small[small[ROW_COL] >= len(self)].merge(small, on=key, suffixes=("_a", "_b"))
+            m = m[m[f"{ROW_COL}_a"] != m[f"{ROW_COL}_b"]]
+            out.append(m[[f"{ROW_COL}_a", f"{ROW_COL}_b"]].to_numpy(dtype=np.int64))
+            for _, block in members[sizes > limit].groupby(key, sort=False):
+                out.append(_window_pairs(block, limit, len(self)))
+        if not out:
+            return np.empty((0, 2), dtype=np.int64)
+        pairs = np.concatenate(out)
+        pairs = np.column_stack([pairs.min(axis=1), pairs.max(axis=1)])
+        return np.unique(pairs, axis=0)
+
+    def add(self, df_new: pd.DataFrame, model=None) -> Counter:
+        """
+        Resolve a batch of normalized records against the state and persist it.
+        model = (clf, feat_cols, threshold) or None for the rules. The batch gets
+        global row ids len(self) .. len(self) + len(df_new) - 1.
+        """
+        n_old, m = len(self), len(df_new)
+        new_rows = np.arange(n_old, n_old + m, dtype=np.int64)
+        df_new = prepare_aux_cols(df_new.reset_index(drop=True).copy())
+        df_new.index = new_rows
+        keys = pd.DataFrame(block_keys(df_new))
+        keys.insert(0, NAME_COL, df_new['Name_norm'])
+        keys.insert(0, ROW_COL, df_new.index)
+
+        # candidates and matching only over the rows involved
+        cand = self._candidates(keys)
+        stats = Counter(rows=m, candidates=len(cand))
+        old_rows = np.unique(cand[cand < n_old])
+        sub = pd.concat([self.records(old_rows), df_new]) if len(old_rows) else df_new
+        store = RecordStore.from_frame(sub)
+        sim_cache = similarity_caches(store)
+        masks = []
+        for chunk in split_pairs(cand, CHUNK_SIZE):
+            mask, st = match_chunk(store, chunk, model, sim_cache)
+            masks.append(mask)
+            stats.update(st)
+        pred = cand[np.concatenate(masks)] if masks else cand
+        stats['matches'] = len(pred)
+
+        # union-find on the memory-mapped parent forest: only the rows of the pairs are touched
+        parent = self._parent_map(extend=m)
+        old_ends = np.unique(pred[pred < n_old])
+        old_roots = np.unique(find_roots(parent, old_ends)) if len(old_ends) else old_ends
+        union_edges(parent, pred[:, 0].copy(), pred[:, 1].copy())
+
+        # clusters that gained rows or merged: all their members, canonicalized again
+        members = self._members(old_roots)
+        rows = np.r_[members[ROW_COL].to_numpy(dtype=np.int64), new_rows]
+        listed = np.r_[members[ROOT_COL].to_numpy(dtype=np.int64), np.full(m, -1)]
+        roots = find_roots(parent, rows) if len(rows) else rows
+        parent[rows] = roots                         # compress the touched clusters
+        if isinstance(parent, np.memmap):
+            parent.flush()
+        stats['touched_rows'] = len(rows)
+        order = np.argsort(rows, kind="stable")
+        rows, roots, listed = rows[order], roots[order], listed[order]
+        t_old = rows[rows < n_old]
+        recs = pd.concat([self.records(t_old), df_new]) if len(t_old) else df_new
+        t_rows, t_entities = canonicalize_labels(recs, pd.factorize(roots)[0], CANON_RULES)
+        root_of = dict(zip(t_rows["entity_id"], roots))
+        t_entities.insert(0, ROOT_COL, t_entities["entity_id"].map(root_of).astype(np.int64))
+        stats['entities_updated'] = len(t_entities)
+        prev = self._entity_log(old_roots) if len(old_roots) else pd.DataFrame({ROOT_COL: [], "entity_id": []})
+        prev = pd.Series(prev["entity_id"].to_numpy(dtype=object), index=prev[ROOT_COL].to_numpy())
+        changes = pd.DataFrame({ROW_COL: rows, "entity_id": t_rows["entity_id"].to_numpy(dtype=object),
+                                "prev_entity_id": prev.reindex(listed).to_numpy(dtype=object)})
+
+        # persist: append the batch parts; parent.i64 was appended and updated in place
+        k, nb = self.meta['batches'], self.meta['buckets']
+        df_new.reset_index(names=ROW_COL).to_parquet(self._part("records", k), index=False,
+                                                     row_group_size=self.meta['record_group'])
+        for key in keys.columns.drop([ROW_COL, NAME_COL]):
+            entries = keys[[ROW_COL, NAME_COL, key]].dropna(subset=[key])
+            self._write_buckets(entries, f"index/{key}", _bucket(entries[key], nb), k)
+        moved = listed != roots                     # new rows and rows of merged-away roots
+        joined = pd.DataFrame({ROOT_COL: roots[moved], ROW_COL: rows[moved]})
+        self._write_buckets(joined, "clusters", joined[ROOT_COL].to_numpy() % nb, k)
+        self._write_buckets(t_entities, "entities", t_entities[ROOT_COL].to_numpy() % nb, k)
+        write_table(changes, self._part("changes", k))
+        np.save(self._part("pairs", k, ".npy"), pred)
+        self.meta.update(rows=n_old + m, batches=k + 1, offsets=self.meta['offsets'] + [n_old])
+        (self.path / "meta.json").write_text(json.dumps(self.meta, indent=2), encoding="utf-8")
+        return stats
+
+def _window_pairs(block: pd.DataFrame, limit: int, n_old: int) -> np.ndarray:
+    # oversized block: each new row against the `limit` members around it in Name_norm order
+    block = block.sort_values([NAME_COL, ROW_COL], kind="stable")
+    rows = block[ROW_COL].to_numpy(dtype=np.int64)
+    half = limit // 2
+    out = []
+    for p in np.flatnonzero(rows >= n_old):
+        lo = min(max(p - half, 0), max(len(rows) - limit, 0))
+        window = rows[lo:lo + limit]
+        window = window[window != rows[p]]
+        out.append(np.column_stack([np.full(len(window), rows[p]), window]))
+    return np.concatenate(out) if out else np.empty((0, 2), dtype=np.int64)
@@ -0,0 +1,163 @@
+# instrument.py
+from __future__ import annotations
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional
+import cProfile
+import json
+import pstats
+import resource
+import time
+import numpy as np
+
+# Parameters
+REPORT_NAME = "run_report.json"   # written next to the pipeline outputs
+PROFILE_TOP = 30                  # functions (by cumulative time) listed per profiled stage
+
+# --- 1) Peak memory ---
+def reset_peak() -> None:
+    # Linux: reset the RSS high-water mark (VmHWM) so each stage gets its own peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+def peak_rss_mb(pid="self") -> Optional[float]:
+    """VmHWM of a process in MB (since the last reset_peak); ru_maxrss of the run as a fallback."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if pid == "self":
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return None
+
+# --- 2) Run report ---
+class RunReport:
+    """
+    Timers, counters, histograms and peak memory of one pipeline run.
+    Top-level stages are laps (begin() ends the previous one, as the '>> stage'
+    banners do); timer() adds substages '<stage>/<name>'. Stages listed in
+    `profile` run under cProfile: <profile_dir>/profile_<stage>.prof and the
+    top functions in the report. While the report is entered (with ...), the
+    module-level begin / timer / count / add / histogram record into it.
+    """
+    def __init__(self, profile: Iterable[str] = (), profile_dir: Optional[Path] = None):
+        self.meta: Dict[str, object] = {}
+        self.stages: Dict[str, dict] = {}
+        self.counters: Counter = Counter()
+        self.histograms: Dict[str, Dict[str, int]] = {}
+        self.profiles: Dict[str, dict] = {}
+        self.profile = set(profile or ())
+        self.profile_dir = Path(profile_dir) if profile_dir else Path(".")
+        self._stage: Optional[str] = None
+        self._substages: List[str] = []
+        self._t0 = self._start = time.perf_counter()
+        self._prof: Optional[cProfile.Profile] = None
+
+    def __enter__(self) -> "RunReport":
+        _ACTIVE.append(self)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.end()
+        _ACTIVE.remove(self)
+
+    def _record(self, name: str, seconds: float, **extra) -> None:
+        rec = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        rec['seconds'] = round(rec['seconds'] + seconds, 6)
+        rec['calls'] += 1
+        rec.update(extra)
+
+    def begin(self, name: str) -> None:
+        self.end()
+        self._stage, self._start = name, time.perf_counter()
+        reset_peak()
+        if name in self.profile:
+            self._prof = cProfile.Profile()
+            self._prof.enable()
+
+    def end(self) -> None:
+        if self._stage is None:
+            return
+        if self._prof is not None:
+            self._prof.disable()
+            self._save_profile(self._stage, self._prof)
+            self._prof = None
+        self._record(self._stage, time.perf_counter() - self._start, peak_rss_mb=round(peak_rss_mb(), 1))
+        self._stage = None
+
+    @contextmanager
+    def timer(self, name: str):
+        path = "/".join(([self._stage] if self._stage else []) + self._substages + [name])
+        self._substages.append(name)
+        t0 = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self._substages.pop()
+            self._record(path, time.perf_counter() - t0)
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += int(n)
+
+    def add(self, counts: Mapping[str, int], prefix: str = "") -> None:
+        for k, v in counts.items():
+            self.counters[prefix + k] += int(v)
+
+    def histogram(self, name: str, values) -> None:
+        v, c = np.unique(np.asarray(values), return_counts=True)
+        self.histograms[name] = {str(a): int(b) for a, b in zip(v.tolist(), c.tolist())}
+
+    def _save_profile(self, stage: str, prof: cProfile.Profile) -> None:
+        path = self.profile_dir / f"profile_{stage.replace('/', '.')}.prof"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        prof.dump_stats(path)
+        st = pstats.Stats(prof)
+        rows = sorted(st.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:PROFILE_TOP]
+        self.profiles[stage] = {'file': str(path), 'top': [
+            {'function': f"{Path(f).name}:{line}({fn})", 'calls': nc,
+             'tottime': round(tt, 6), 'cumtime': round(ct, 6)}
+            for (f, line, fn), (cc, nc, tt, ct, _) in rows]}
+
+    def report(self) -> dict:
+        return {'meta': self.meta,
+                'total_seconds': round(time.perf_counter() - self._t0, 6),
+                'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+                'stages': self.stages, 'counters': dict(self.counters),
+                'histograms': self.histograms, 'profiles': self.profiles}
+
+    def write(self, path) -> Path:
+        path = Path(path)
+        path.write_text(json.dumps(self.report(), indent=2, default=str), encoding="utf-8")
+        return path
+
+# --- 3) Recording into the active report (no-ops without one) ---
+_ACTIVE: List[RunReport] = []
+
+def current() -> Optional[RunReport]:
+    return _ACTIVE[-1] if _ACTIVE else None
+
+def begin(name: str) -> None:
+    if _ACTIVE:
+        _ACTIVE[-1].begin(name)
+
+def timer(name: str):
+    return _ACTIVE[-1].timer(name) if _ACTIVE else nullcontext()
+
+def count(name: str, n: int = 1) -> None:
+    if _ACTIVE:
+        _ACTIVE[-1].count(name, n)
+
+def add(counts: Mapping[str, int], prefix: str = "") -> None:
+    if _ACTIVE:
+        _ACTIVE[-1].add(counts, prefix)
+
+def histogram(name: str, values) -> None:
+    if _ACTIVE:
+        _ACTIVE[-1].histogram(name, values)
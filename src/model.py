@@ -1,23 +1,107 @@
 # src/model.py
-import joblib, numpy as np
+import json
+from pathlib import Path
+import numpy as np
+import pandas as pd
 from typing import Iterable, Tuple, Set
-from rules import pair_features, is_match
+from rules import (pair_features, pair_features_batch, is_match, LazyFeatures,
+                   lazy_pair_features, fill_fuzzy, match_rules)
+from scorer import LinearScorer, load_compiled
 
 def load_pair_model(path: str):
     # Load trained model bundle: classifier, feature column names, and decision threshold
+    import joblib
     blob = joblib.load(path)
     return blob['clf'], blob['feat_cols'], blob['threshold']
 
-def model_score_pair(df, i, j, clf, feat_cols):
-    # Compute pairwise features and return the model's match probability for (i, j)
-    f = pair_features(df, i, j)
+def load_model_bundle(model_path, meta_path=None, compiled=True):
+    """
+    Load (clf, feat_cols, threshold). Supports two bundle formats:
+    1) dict with keys {'clf','feat_cols','threshold'}
+    2) raw estimator in joblib + external meta JSON with features/threshold
+    With compiled=True a scorer.LinearScorer is returned instead of the sklearn
+    estimator when model_path is a compiled artifact or has an up-to-date one
+    next to it (python src/scorer.py); joblib/sklearn are then never imported.
+    """
+    scorer = load_compiled(model_path, meta_path) if compiled else None
+    if scorer is not None:
+        return scorer, scorer.feat_cols, scorer.threshold
+
+    import joblib
+    bundle = joblib.load(model_path)
+
+    # --- Unpack model/metadata from either supported format ---
+    if isinstance(bundle, dict) and "clf" in bundle:
+        clf = bundle["clf"]
+        feat_cols = bundle.get("feat_cols")
+        thr = float(bundle.get("threshold"))
+    else:
+        clf = bundle
+        if meta_path is None or not Path(meta_path).exists():
+            raise RuntimeError(
+                "pair_model.joblib contains only an estimator, "
+                "and the meta file with features/threshold is missing: "
+                f"{meta_path}"
+            )
+        meta = json.loads(Path(meta_path).read_text(encoding="utf-8"))
+        feat_cols = meta["features"]
+        thr = float(meta["threshold"])
+
+    if not feat_cols:
+        raise ValueError("Failed to obtain model feature list (feat_cols).")
+    return clf, feat_cols, thr
+
+def model_matrix(F: pd.DataFrame, feat_cols) -> pd.DataFrame:
+    # Feature frame -> model input, with the type alignment used in the training notebooks
+    X = pd.DataFrame({c: F[c] if c in F else 0 for c in feat_cols}, index=F.index)
+    for c in X.columns:
+        if X[c].dtype == bool:
+            X[c] = X[c].astype(int)
+    if "street_sim" in X.columns:
+        X["street_sim"] = X["street_sim"] / 100.0  # same scale as in training
+    return X
+
+def model_match(df, pairs, clf, feat_cols, thr, sim_cache=None) -> np.ndarray:
+    # Batch model decision: bool mask over an (n, 2) array of candidate pairs
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    if not len(pairs):
+        return np.zeros(0, dtype=bool)
+    F = pair_features_batch(df, pairs[:, 0], pairs[:, 1], sim_cache=sim_cache)
+    return model_proba(F, clf, feat_cols) >= thr
+
+def model_proba(F: pd.DataFrame, clf, feat_cols) -> np.ndarray:
+    # Match probabilities for a precomputed feature frame (e.g. one loaded from the stage cache)
+    if not len(F):
+        return np.zeros(0)
+    if isinstance(clf, LinearScorer) and list(feat_cols) == clf.feat_cols:
+        return clf.proba_frame(F)
+    return clf.predict_proba(model_matrix(F, feat_cols))[:, 1]
+
+def model_score_pair(df, i, j, clf, feat_cols, feats=None):
+    # Compute pairwise features and return the model's match probability for (i, j);
+    # pass `feats` (e.g. the LazyFeatures is_match already used) to reuse computed values
+    f = feats if feats is not None else pair_features(df, i, j)
     x = np.array([[f.get(c,0) for c in feat_cols]])
     return float(clf.predict_proba(x)[0,1])
 
-def hybrid_predict_pairs(df, cand_pairs: Iterable[Tuple[int,int]], clf, feat_cols, thr) -> Set[Tuple[int,int]]:
-    # Hybrid decision: accept a pair if rule-based is_match is True OR model score >= threshold
-    out=set()
-    for i,j in cand_pairs:
-        if is_match(df, i, j) or model_score_pair(df, i, j, clf, feat_cols) >= thr:
-            out.add((i,j))
-    return out
+def hybrid_is_match(df, i, j, clf, feat_cols, thr, stats=None) -> bool:
+    # Rules first on lazily computed features; the model reuses whatever they computed
+    f = LazyFeatures(df, i, j, stats)
+    return is_match(df, i, j, feats=f) or model_score_pair(df, i, j, clf, feat_cols, feats=f) >= thr
+
+def hybrid_predict_pairs(df, cand_pairs: Iterable[Tuple[int,int]], clf, feat_cols, thr,
+                         stats=None, sim_cache=None) -> Set[Tuple[int,int]]:
+    # Hybrid decision: accept a pair if rule-based is_match is True OR model score >= threshold.
+    # Rules run on lazy batch features; only the pairs they reject are completed and scored.
+    pairs = list(cand_pairs)
+    if not pairs:
+        return set()
+    ij = np.asarray(pairs)
+    F = lazy_pair_features(df, ij[:, 0], ij[:, 1], stats=stats, sim_cache=sim_cache)
+    rest = match_rules(F) == 0
+    if rest.any():
+        F = fill_fuzzy(df, ij[:, 0], ij[:, 1], F, rest, stats=stats, sim_cache=sim_cache)
+        X = np.column_stack([F[c].to_numpy(dtype=float) if c in F else np.zeros(len(F))
+                             for c in feat_cols])
+        rest[rest] = clf.predict_proba(X[rest])[:, 1] < thr
+    return {p for p, r in zip(pairs, rest) if not r}
@@ -0,0 +1,258 @@
+# normalize.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+import argparse
+import re
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from storage import table_format
+
+# Parameters
+CHUNK_ROWS = 1_000_000   # rows per normalized chunk (read, normalize, append)
+PHONE_LEN  = 10          # normalize_phone length
+ZIP_LEN    = 5           # normalize_zip length (not applied, as in data_normalize.ipynb)
+
+# normalized column -> raw column, in the order of clear_data.csv
+RAW_COLS  = {'Name_norm': 'name', 'City_norm': 'city', 'Street_norm': 'street',
+             'Email_norm': 'email', 'Zip_norm': 'zip', 'Phone_norm': 'phone'}
+KEEP_COLS = ['row_id', 'uid']
+
+# --- 1) Per-value functions (tests/Normalize_functions.py, data_normalize.ipynb) ---
+def clean_text(text):
+    if pd.isnull(text):
+        return text
+    text = text.lower()
+    text = re.sub(r'[^\w\s]', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def normalize_phone(phone, length=PHONE_LEN):
+    if pd.isnull(phone):
+        return None
+    digits = re.sub(r'\D', '', str(phone))
+    if len(digits) < length:
+        digits = digits.zfill(length)
+    elif len(digits) > length:
+        digits = digits[:length]
+    return digits
+
+def normalize_zip(zip, length=ZIP_LEN):
+    if pd.isnull(zip):
+        return None
+    return re.sub(r'\D', '', str(zip))
+
+def clean_email(email):
+    if pd.isnull(email):
+        return None
+    email = str(email).lower().strip()
+    return re.sub(r'[^\w@.\-]', '', email)
+
+# --- 2) Byte kernels on Arrow string buffers (ASCII values) ---
+def _lut(chars: str) -> np.ndarray:
+    t = np.zeros(256, dtype=bool)
+    t[np.frombuffer(chars.encode(), dtype=np.uint8)] = True
+    return t
+
+_LOWER = np.arange(256, dtype=np.uint8)
+_LOWER[65:91] += 32
+_SPACE = _lut("\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f ")     # str.isspace() / re \s on ASCII
+_DIGIT = _lut("0123456789")
+_WORD  = _lut("abcdefghijklmnopqrstuvwxyz0123456789_")
+_EMAIL = _WORD | _lut("@.-")
+
+class _Strings:
+    """A large_string array as one byte buffer + row of every byte (nulls are empty)."""
+    def __init__(self, arr: pa.Array):
+        arr = arr.cast(pa.large_string())
+        self.n = len(arr)
+        self.valid = ~np.asarray(arr.is_null(), dtype=bool) if arr.null_count else np.ones(self.n, dtype=bool)
+        off = np.frombuffer(arr.buffers()[1], dtype=np.int64)[arr.offset:arr.offset + self.n + 1]
+        data = arr.buffers()[2]
+        data = np.frombuffer(data, dtype=np.uint8) if data is not None else np.zeros(0, dtype=np.uint8)
+        self.data = data[off[0]:off[-1]]
+        self.row = np.repeat(np.arange(self.n, dtype=np.int32), np.diff(off))
+
+    def keep(self, mask: np.ndarray) -> None:
+        self.data, self.row = self.data[mask], self.row[mask]
+
+    def offsets(self) -> np.ndarray:
+        return np.searchsorted(self.row, np.arange(self.n + 1, dtype=np.int32)).astype(np.int64)
+
+    def array(self) -> pa.Array:
+        off = self.offsets()
+        mask = pa.array(self.valid).buffers()[1] if not self.valid.all() else None
+        return pa.LargeStringArray.from_buffers(self.n, pa.py_buffer(off), pa.py_buffer(self.data),
+                                                mask, int((~self.valid).sum()))
+
+def _text_kernel(s: _Strings) -> _Strings:
+    # lower -> drop [^\w\s] -> whitespace runs to one ' ' -> strip
+    s.data = _LOWER[s.data]
+    s.keep(_WORD[s.data] | _SPACE[s.data])
+    ws = _SPACE[s.data]
+    new_row = s.row[1:] != s.row[:-1]
+    first, last = np.r_[True, new_row], np.r_[new_row, True]
+    start = ws & (first | ~np.r_[False, ws[:-1]])             # first byte of each whitespace run
+    end = ws & (last | ~np.r_[ws[1:], False])                 # its last byte, in the same order
+    lead_or_trail = first[start] | last[end]
+    start[np.flatnonzero(start)[lead_or_trail]] = False
+    s.keep(~ws | start)
+    s.data[_SPACE[s.data]] = 32
+    return s
+
+def _email_kernel(s: _Strings) -> _Strings:
+    s.data = _LOWER[s.data]
+    s.keep(_EMAIL[s.data])
+    return s
+
+def _digits_kernel(s: _Strings, length: Optional[int] = None) -> _Strings:
+    s.keep(_DIGIT[s.data])
+    if length is None:
+        return s
+    # zfill to length / cut to the first `length` digits: every value is `length` bytes
+    L = np.diff(s.offsets())
+    pos = np.arange(len(s.data)) - np.repeat(np.cumsum(L) - L, L)
+    col = pos + np.maximum(length - L, 0)[s.row]
+    M = np.full((s.n, length), 48, dtype=np.uint8)
+    ok = col < length
+    M[s.row[ok], col[ok]] = s.data[ok]
+    s.data = M[s.valid].ravel()
+    s.row = np.repeat(np.flatnonzero(s.valid).astype(np.int32), length)
+    return s
+
+def _arrow(s: pd.Series) -> pa.Array:
+    arr = pa.array(s, from_pandas=True)          # str columns may be chunked Arrow already
+    return arr.combine_chunks() if isinstance(arr, pa.ChunkedArray) else arr
+
+def _as_strings(s: pd.Series) -> pa.Array:
+    # values as str(value) (the per-value functions call str()), nulls kept
+    if s.dtype.kind in "fbcmM" or s.dtype == object:
+        vals = s.to_numpy(dtype=object)
+        return pa.array([None if pd.isnull(v) else str(v) for v in vals], type=pa.large_string())
+    return _arrow(s).cast(pa.large_string())
+
+def _apply(s: pd.Series, kernel: Callable, scalar: Callable) -> pd.Series:
+    """kernel on the ASCII values, scalar (exact Unicode semantics) on the others."""
+    arr = _as_strings(s)
+    out = kernel(_Strings(arr)).array()
+    other = np.flatnonzero(~np.asarray(pc.fill_null(pc.string_is_ascii(arr), True), dtype=bool))
+    if len(other):
+        fixed = [scalar(v) for v in arr.take(pa.array(other)).to_pylist()]
+        mask = np.zeros(len(arr), dtype=bool)
+        mask[other] = True
+        out = pc.replace_with_mask(out, pa.array(mask), pa.array(fixed, type=pa.large_string()))
+    return out.to_pandas().set_axis(s.index).rename(s.name)
+
+def _email_user(email: pd.Series) -> pd.Series:
+    # rules.prepare_aux_cols: Email_norm.str.split('@').str[0] (bytes before the first '@')
+    s = _Strings(_arrow(email))
+    at = np.flatnonzero(s.data == 64)
+    cut = np.full(s.n, np.iinfo(np.int64).max)
+    rows, first = np.unique(s.row[at], return_index=True)
+    cut[rows] = at[first]
+    s.keep(np.arange(len(s.data)) < cut[s.row])
+    return s.array().to_pandas().set_axis(email.index)
+
+# --- 3) Frames, chunks and files ---
+KERNELS = {
+    'Name_norm':   (_text_kernel, clean_text),
+    'City_norm':   (_text_kernel, clean_text),
+    'Street_norm': (_text_kernel, clean_text),
+    'Email_norm':  (_email_kernel, clean_email),
+    'Zip_norm':    (_digits_kernel, normalize_zip),
+    'Phone_norm':  (lambda s: _digits_kernel(s, PHONE_LEN), normalize_phone),
+}
+
+def normalize_frame(raw: pd.DataFrame, aux: bool = True) -> pd.DataFrame:
+    """
+    Raw records (name, street, city, zip, email, phone) -> row_id / uid and the
+    *_norm columns of data_normalize.ipynb, value for value; with aux, also
+    rules.prepare_aux_cols' email_user and phone_last4.
+    """
+    out = raw[[c for c in KEEP_COLS if c in raw]].copy()
+    for col, src in RAW_COLS.items():
+        if src in raw:
+            out[col] = _apply(raw[src], *KERNELS[col])
+    if aux and 'Email_norm' in out:
+        out['email_user'] = _email_user(out['Email_norm'])
+    if aux and 'Phone_norm' in out:
+        last4 = pc.utf8_slice_codeunits(_arrow(out['Phone_norm']), -4)
+        out['phone_last4'] = last4.to_pandas().set_axis(out.index)
+    return out
+
+def _csv_dtypes(path: Path) -> Dict[str, object]:
+    # zip / phone typed as pandas infers them over the whole file (the notebook reads
+    # raw.csv whole: integer zips lose leading zeros), text columns as str
+    head = pd.read_csv(path, nrows=0).columns
+    num = [c for c in ('zip', 'phone') if c in head]
+    inferred = pd.read_csv(path, usecols=num).dtypes if num else {}
+    dtypes = {c: str for c in head if c not in KEEP_COLS}
+    for c in num:
+        dtypes[c] = inferred[c] if inferred[c].kind in "iuf" else str
+    return dtypes
+
+def iter_raw(path, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Raw CSV / Parquet / Arrow IPC records, chunk_rows at a time."""
+    path = Path(path)
+    fmt = table_format(path)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_rows, dtype=_csv_dtypes(path))
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            yield batch.to_pandas()
+
+def _file_schema(table: pa.Table) -> pa.Schema:
+    # string columns as strings whatever a chunk inferred (an all-null chunk is type null);
+    # the other columns keep the first chunk's types, later chunks are cast to them
+    fields = [f.with_type(pa.large_string()) if f.name not in KEEP_COLS or pa.types.is_null(f.type) else f
+              for f in table.schema]
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+def normalize_file(src, dst, chunk_rows: int = CHUNK_ROWS, aux: bool = False) -> int:
+    """Normalize src into dst (CSV / Parquet / Arrow IPC) chunk by chunk; returns the row count."""
+    dst = Path(dst)
+    fmt = table_format(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    rows, writer = 0, None
+    try:
+        for raw in iter_raw(src, chunk_rows):
+            df = normalize_frame(raw, aux)
+            if fmt == 'csv':
+                df.to_csv(dst, mode="a" if rows else "w", header=not rows, index=False)
+            else:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    import pyarrow.parquet as pq
+                    schema = _file_schema(table)
+                    writer = (pq.ParquetWriter(dst, schema) if fmt == 'parquet'
+                              else pa.ipc.new_file(str(dst), schema))
+                writer.write_table(table.cast(schema))
+            rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Normalize raw records (data/raw.csv -> data/clear_data.csv)")
+    ap.add_argument("--raw", type=Path, default=Path("data/raw.csv"))
+    ap.add_argument("--out", type=Path, default=Path("data/clear_data.csv"), help=".csv, .parquet or .arrow")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    ap.add_argument("--aux", action="store_true", help="also write email_user / phone_last4")
+    args = ap.parse_args(argv)
+    t0 = time.perf_counter()
+    rows = normalize_file(args.raw, args.out, args.chunk_rows, args.aux)
+    seconds = time.perf_counter() - t0
+    print(f"[normalize] {rows} rows -> {args.out} ({seconds:.1f} s, {rows / max(seconds, 1e-9):,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
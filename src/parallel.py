@@ -0,0 +1,118 @@
+# parallel.py
+from __future__ import annotations
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Iterator, List, Optional, Tuple
+import tempfile
+import numpy as np
+import pandas as pd
+
+from rules import rules_fired, rule_counts, pair_features_batch
+from model import model_match
+from simcache import similarity_caches
+from store import RecordStore
+
+CHUNK_SIZE = 200_000   # candidate pairs per task
+
+# Per-process state, filled once by _init_worker
+_WORKER = {}
+
+def _init_worker(store_dir: str, model, max_entries: Optional[int] = None):
+    # open the shared store memory-mapped: no DataFrame is pickled to the workers
+    store = RecordStore.load(store_dir, mmap=True)
+    _WORKER.update(store=store, sim_cache=similarity_caches(store, max_entries), model=model)
+
+def _run_task(task: Callable, pairs: np.ndarray):
+    return task(_WORKER['store'], pairs, _WORKER['model'], _WORKER['sim_cache'])
+
+def _cache_stats(stats: Counter, sim_cache, before: dict) -> None:
+    for f, (hits, misses) in before.items():
+        stats[f'{f}_cache_hits'] += sim_cache[f].hits - hits
+        stats[f'{f}_cache_misses'] += sim_cache[f].misses - misses
+
+def match_chunk(store, pairs: np.ndarray, model=None, sim_cache=None) -> Tuple[np.ndarray, Counter]:
+    """
+    Match one chunk of (n, 2) pairs. model=None runs the rules, otherwise
+    model = (clf, feat_cols, threshold). Returns (bool mask, stats Counter).
+    """
+    stats = Counter()
+    before = {f: (c.hits, c.misses) for f, c in (sim_cache or {}).items()}
+    if model is None:
+        fired = rules_fired(store, pairs[:, 0], pairs[:, 1], stats=stats, sim_cache=sim_cache)
+        stats.update(rule_counts(fired))
+        mask = fired > 0
+    else:
+        clf, feat_cols, thr = model
+        stats['pairs'] += len(pairs)
+        mask = model_match(store, pairs, clf, feat_cols, thr, sim_cache=sim_cache)
+    _cache_stats(stats, sim_cache, before)
+    return mask, stats
+
+def feature_chunk(store, pairs: np.ndarray, model=None, sim_cache=None) -> Tuple[pd.DataFrame, Counter]:
+    """Full feature matrix (all FEATURES) for one chunk of pairs; `model` is unused."""
+    stats = Counter(pairs=len(pairs))
+    before = {f: (c.hits, c.misses) for f, c in (sim_cache or {}).items()}
+    F = pair_features_batch(store, pairs[:, 0], pairs[:, 1], sim_cache=sim_cache)
+    _cache_stats(stats, sim_cache, before)
+    return F, stats
+
+@contextmanager
+def chunk_runner(store: RecordStore, workers: int = 1, model=None,
+                 max_entries: Optional[int] = None) -> Iterator[Callable]:
+    """
+    Yield run(task, chunks) -> list of task results in chunk order. Serial for
+    workers <= 1; otherwise the store is saved once and every chunk goes to a
+    process pool that lives as long as the context, so a stream of chunks
+    reuses the same workers. max_entries bounds each similarity cache.
+    """
+    if workers <= 1:
+        sim_cache = similarity_caches(store, max_entries)
+        yield lambda task, chunks: [task(store, c, model, sim_cache) for c in chunks]
+        return
+    with tempfile.TemporaryDirectory(prefix="er_store_") as tmp:
+        store.save(tmp)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(tmp, model, max_entries)) as pool:
+            yield lambda task, chunks: list(pool.map(partial(_run_task, task), chunks))
+
+def split_pairs(pairs, chunk_size: int = CHUNK_SIZE) -> List[np.ndarray]:
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    return [pairs[s:s + chunk_size] for s in range(0, len(pairs), chunk_size)]
+
+def merge_results(results) -> Tuple[List, Counter]:
+    stats = Counter()
+    for _, st in results:
+        stats.update(st)
+    return [r for r, _ in results], stats
+
+def _map_chunks(store: RecordStore, pairs, task: Callable, workers: int, model,
+                chunk_size: int) -> Tuple[List, Counter]:
+    # Shard pairs into chunks and run `task` on each, serially or in a process pool
+    chunks = split_pairs(pairs, chunk_size)
+    with chunk_runner(store, workers if len(chunks) > 1 else 1, model) as run:
+        return merge_results(run(task, chunks))
+
+def parallel_match(store: RecordStore, pairs, workers: int = 1, model=None,
+                   chunk_size: int = CHUNK_SIZE) -> Tuple[np.ndarray, Counter]:
+    """
+    Match candidate pairs in a process pool. The store is saved once to a temp
+    directory and memory-mapped by every worker; pairs are sharded into chunks
+    and results are merged back in chunk order, so the output is the same for
+    any number of workers.
+
+    Returns:
+        (mask, stats): bool mask aligned with `pairs`, and summed worker counters.
+    """
+    masks, stats = _map_chunks(store, pairs, match_chunk, workers, model, chunk_size)
+    mask = np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+    return mask, stats
+
+def parallel_features(store: RecordStore, pairs, workers: int = 1,
+                      chunk_size: int = CHUNK_SIZE) -> Tuple[pd.DataFrame, Counter]:
+    """Feature matrix for all pairs (rows in pair order), sharded like parallel_match."""
+    frames, stats = _map_chunks(store, pairs, feature_chunk, workers, None, chunk_size)
+    if not frames:
+        return pair_features_batch(store, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)), stats
+    return pd.concat(frames, ignore_index=True), stats
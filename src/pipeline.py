@@ -1,18 +1,36 @@
 # src/pipline.py
 from __future__ import annotations
 
+from collections import Counter
 from pathlib import Path
+import argparse
 import json
-import joblib
+import time
+import numpy as np
 import pandas as pd
 
 
 # Project-local utilities
-from rules import prepare_aux_cols, pair_features, is_match  # your functions from rules.py
-from cluster import build_clusters, summarize_clusters
-from canonicalize import (
-    canonicalize_all, majority, longest, most_frequent_valid
-)
+from rules import (RULES, FUZZY, FEATURES, NAME_THR, STREET_THR, HARD_NAME,
+                   prepare_aux_cols, rules_fired, rule_counts, match_rules)  # your functions from rules.py
+from model import load_model_bundle, model_match, model_proba
+from normalize import normalize_file
+from blocking import MAX_BLOCK_SIZE, blocking_metrics, candidate_pairs, iter_candidate_pairs
+from blocking_lsh import BANDS, ROWS, lsh_candidate_pairs
+from blocking_snm import WINDOW, snm_candidate_pairs
+from blocking_tfidf import CUTOFF, TOP_K, tfidf_candidate_pairs
+from blockmatch import block_match
+from store import RecordStore
+from parallel import CHUNK_SIZE, parallel_match, parallel_features
+from stagecache import StageCache
+from storage import PairWriter, read_table, write_table, read_pairs, write_pairs, with_format
+from streaming import EdgeSpool, chunk_size_for, stream_match
+from sharding import SHARD_KEY, sharded_run
+from incremental import IncrementalState
+from instrument import REPORT_NAME, RunReport, add, begin, count, histogram, timer
+from cluster import Clusters, cluster_pairs, summarize_labels
+from canonicalize import CANON_RULES, canonicalize_labels
+import tempfile
 
 # --- Paths / constants ---
 ROOT = Path(__file__).resolve().parents[1]
@@ -28,29 +46,101 @@ ENTITIES_PATH      = OUT / "entities.csv"
 
 MODEL_PATH  = DATA / "pair_model.joblib"
 META_PATH   = DATA / "pair_model_meta.json"  # {'features': [...], 'threshold': float}
+CACHE_DIR   = OUT  / ".cache"                 # stage cache, see stagecache.py
+FORMAT      = "parquet"                       # output format: csv / parquet / arrow (see storage.py)
 
 
-def load_data() -> pd.DataFrame:
+# --------- Stage cache ---------
+
+def cached(cache: StageCache | None, stage: str, key: str | None, compute):
+    """compute() -> dict of arrays, or the stored result of an earlier run with the same key."""
+    if cache is None:
+        return compute()
+    arrays = cache.get(stage, key)
+    if arrays is None:
+        arrays = compute()
+        cache.put(stage, key, arrays)
+    else:
+        print(f"[cache] {stage}: hit")
+    return arrays
+
+
+def start_stage(name: str, title: str | None = None) -> None:
+    """Print the '>> stage' banner and start the stage's timer in the run report (instrument.py)."""
+    print(f">> {title or name}")
+    begin(name)
+
+
+def load_data(path: Path = CLEAR_DATA_PATH, cache: StageCache | None = None,
+              columns: list[str] | None = None) -> pd.DataFrame:
     """
-    Read normalized data; ensure Phone_norm/Zip_norm are strings.
-    Also generate auxiliary *_norm fields if required by rules/model.
+    Read normalized data (CSV, Parquet or Arrow IPC by extension, only `columns`
+    when given); ensure Phone_norm/Zip_norm are strings.
+    Also generate auxiliary *_norm fields if required by rules/model (kept when
+    the input already has them, e.g. normalize.py --aux).
     """
-    df = pd.read_csv(
-        CLEAR_DATA_PATH,
-        dtype={"Phone_norm": str, "Zip_norm": str}
-    )
+    with timer("read"):
+        df = read_table(
+            path, columns=columns,
+            dtype={"Phone_norm": str, "Zip_norm": str, "email_user": str, "phone_last4": str}
+        )
+    count("rows", len(df))
     # Create auxiliary normalized fields and helper columns if needed by rules/model
-    df = prepare_aux_cols(df)
+    with timer("aux"):
+        key = cache.key("aux", Path(path), columns) if cache else None
+        aux = cached(cache, "aux", key, lambda: {
+            c: s.to_numpy() for c, s in prepare_aux_cols(df.copy())[["email_user", "phone_last4"]].items()})
+        for c, values in aux.items():
+            df[c] = pd.Series(values, index=df.index)
     return df
 
 
-def load_candidates() -> list[tuple[int, int]]:
+def load_candidates(path: Path = CAND_PAIRS_PATH) -> np.ndarray:
+    """
+    Load candidate pairs for matching as an (n, 2) int64 array. Expects
+    columns 'i' and 'j' with row indices of the source DataFrame.
+    """
+    return read_pairs(path)
+
+
+# blocking method -> candidate generator (df, report=..., **params) -> (n, 2) pairs
+BLOCKERS = {
+    "keys":     candidate_pairs,
+    "lsh":      lsh_candidate_pairs,
+    "keys+lsh": lambda df, **kw: lsh_candidate_pairs(df, with_keys=True, **kw),
+    "snm":      lambda df, report=None, **kw: snm_candidate_pairs(df, **kw),
+    "tfidf":    tfidf_candidate_pairs,
+}
+
+
+def generate_candidates(df: pd.DataFrame, cache: StageCache | None = None,
+                        out_path: Path = CAND_PAIRS_PATH,
+                        data_path: Path = CLEAR_DATA_PATH,
+                        blocking: str = "keys", **params) -> np.ndarray:
     """
-    Load candidate pairs for matching. Expects columns 'i' and 'j'
-    with row indices of the source DataFrame.
+    Blocking on the loaded data with one of BLOCKERS (exact keys, see
+    blocking.py; MinHash LSH, see blocking_lsh.py; sorted neighbourhood, see
+    blocking_snm.py; TF-IDF top-k, see blocking_tfidf.py), `params` going to it.
+    Returns an (n, 2) array of row index pairs and also saves it to `out_path`
+    for the notebooks. `data_path` (the loaded file) keys the stage cache.
+    With a `uid` column, the PC / RR / PQ of the candidates are printed.
     """
-    cand_df = pd.read_csv(CAND_PAIRS_PATH)
-    pairs = list(map(tuple, cand_df[["i", "j"]].to_numpy()))
+    def compute():
+        report = []
+        pairs = BLOCKERS[blocking](df, report=report, **params)
+        if report:
+            print(f"[blocking] oversized blocks sub-blocked: {len(report)}")
+        return {"pairs": pairs}
+
+    key = cache.key("candidates", Path(data_path), MAX_BLOCK_SIZE, blocking, params) if cache else None
+    with timer(blocking):
+        pairs = cached(cache, "candidates", key, compute)["pairs"]
+    count("candidates", len(pairs))
+    if "uid" in df:
+        m = blocking_metrics(df, pairs)
+        print(f"[blocking] {blocking}: PC={m['PC']:.4f} RR={m['RR']:.4f} PQ={m['PQ']:.4f}")
+    with timer("write"):
+        write_pairs(pairs, out_path)
     return pairs
 
 
@@ -59,154 +149,445 @@ def load_candidates() -> list[tuple[int, int]]:
 def predict_with_model(df: pd.DataFrame,
                        pairs: list[tuple[int, int]],
                        model_path: Path,
-                       meta_path: Path) -> set[tuple[int, int]]:
+                       meta_path: Path,
+                       sim_cache=None) -> set[tuple[int, int]]:
     """
-    Predict matches with a trained model. Supports two bundle formats:
-    1) dict with keys {'clf','feat_cols','threshold'}
-    2) raw estimator in joblib + external meta JSON with features/threshold
+    Predict matches with a trained model (see model.load_model_bundle for the
+    two supported bundle formats). `df` may also be a store.RecordStore.
     """
-    bundle = joblib.load(model_path)
-
-    # --- Unpack model/metadata from either supported format ---
-    if isinstance(bundle, dict) and "clf" in bundle:
-        clf = bundle["clf"]
-        feat_cols = bundle.get("feat_cols")
-        thr = float(bundle.get("threshold"))
-    else:
-        clf = bundle
-        if not meta_path.exists():
-            raise RuntimeError(
-                "pair_model.joblib contains only an estimator, "
-                "and the meta file with features/threshold is missing: "
-                f"{meta_path}"
-            )
-        meta = json.loads(meta_path.read_text(encoding="utf-8"))
-        feat_cols = meta["features"]
-        thr = float(meta["threshold"])
-
-    if not feat_cols:
-        raise ValueError("Failed to obtain model feature list (feat_cols).")
-
-    # --- Build feature matrix ---
-    rows, idx = [], []
-    for (i, j) in pairs:
-        f = pair_features(df, i, j)
-        rows.append({c: f.get(c, 0) for c in feat_cols})
-        idx.append((i, j))
-
-    X = pd.DataFrame(rows)
-
-    # Type alignment as in training notebooks
-    for c in X.columns:
-        if X[c].dtype == bool:
-            X[c] = X[c].astype(int)
-    if "street_sim" in X.columns:
-        X["street_sim"] = X["street_sim"] / 100.0  # same scale as in training
-
-    # --- Inference ---
-    proba = clf.predict_proba(X)[:, 1]
-    pred = {ij for ij, p in zip(idx, proba) if p >= thr}
+    clf, feat_cols, thr = load_model_bundle(model_path, meta_path)
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    hit = pairs[model_match(df, pairs, clf, feat_cols, thr, sim_cache=sim_cache)]
+    pred = set(zip(hit[:, 0].tolist(), hit[:, 1].tolist()))
     return pred
 
 
 def predict_with_rules(df: pd.DataFrame,
-                       pairs: list[tuple[int, int]]) -> set[tuple[int, int]]:
-    """Simple baseline using the rule-based is_match()."""
-    return {(i, j) for (i, j) in pairs if is_match(df, i, j)}
+                       pairs: list[tuple[int, int]],
+                       sim_cache=None) -> set[tuple[int, int]]:
+    """Simple baseline: the is_match() rules evaluated as masks over all pairs."""
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    stats = Counter()
+    fired = rules_fired(df, pairs[:, 0], pairs[:, 1], stats=stats, sim_cache=sim_cache)
+    print(f"[matching] rules fired: {rule_counts(fired)}")
+    print(f"[matching] fuzzy scores computed: {stats['fuzzy_computed']}, "
+          f"skipped: {stats['fuzzy_skipped']}")
+    hit = pairs[fired > 0]
+    return set(zip(hit[:, 0].tolist(), hit[:, 1].tolist()))
+
+
+def match_pairs(df: pd.DataFrame, cand_pairs: list[tuple[int, int]],
+                workers: int = 1, model_path: Path = MODEL_PATH,
+                meta_path: Path = META_PATH) -> set[tuple[int, int]]:
+    """
+    Auto-select matcher: use model if present, otherwise fall back to rules.
+    Features are computed from a RecordStore (int32 codes, see store.py) with
+    similarity caches; workers > 1 shards the pairs over a process pool
+    (see parallel.py). Results do not depend on the number of workers.
+    """
+    with timer("store"):
+        store = RecordStore.from_frame(df)
+    model = None
+    if model_path.exists() and meta_path.exists():
+        print(f"[matching] using model: {model_path.name}")
+        with timer("load_model"):
+            model = load_model_bundle(model_path, meta_path)
+    else:
+        print("[matching] using rules (fallback)")
+
+    pairs = np.asarray(cand_pairs, dtype=np.int64).reshape(-1, 2)
+    with timer("score"):
+        mask, stats = parallel_match(store, pairs, workers=workers, model=model)
+    add(stats, "matching.")
+    if model is None:
+        print(f"[matching] rules fired: { {r: stats[r] for r in RULES} }")
+        print(f"[matching] fuzzy scores computed: {stats['fuzzy_computed']}, "
+              f"skipped: {stats['fuzzy_skipped']}")
+    for feature in FUZZY:
+        hits, misses = stats[f"{feature}_cache_hits"], stats[f"{feature}_cache_misses"]
+        print(f"[matching] {feature} cache hit rate: {hits / max(hits + misses, 1):.1%}")
+    hit = pairs[mask]
+    return set(zip(hit[:, 0].tolist(), hit[:, 1].tolist()))
+
+
+def match_blocks(df: pd.DataFrame, workers: int = 1, model_path: Path = MODEL_PATH,
+                 meta_path: Path = META_PATH) -> set[tuple[int, int]]:
+    """
+    Blocking and matching fused per block (see blockmatch.py): medium blocks
+    are scored as cdist similarity matrices with `workers` threads, the rest
+    as pair lists. Same predictions as generate_candidates + match_pairs with
+    the exact keys; candidate pairs are not materialized.
+    """
+    model = None
+    if model_path.exists() and meta_path.exists():
+        print(f"[matching] using model: {model_path.name}")
+        model = load_model_bundle(model_path, meta_path)
+    else:
+        print("[matching] using rules (fallback)")
+    pred, stats = block_match(df, model, workers=workers)
+    add(stats, "matching.")
+    print(f"candidates: {stats['candidates']} ({stats['matrix_pairs']} in "
+          f"{stats['matrix_blocks']} block matrices, {stats['list_pairs']} as pair lists)")
+    return set(zip(pred[:, 0].tolist(), pred[:, 1].tolist()))
 
 
-def match_pairs(df: pd.DataFrame, cand_pairs: list[tuple[int, int]]) -> set[tuple[int, int]]:
+def match_pairs_cached(df: pd.DataFrame, cand_pairs, cache: StageCache,
+                       workers: int = 1, model_path: Path = MODEL_PATH,
+                       meta_path: Path = META_PATH,
+                       data_path: Path = CLEAR_DATA_PATH) -> set[tuple[int, int]]:
     """
-    Auto-select matcher: use model if present, otherwise fall back to rules.
+    match_pairs split into two cached stages: the full feature matrix, keyed by
+    data + candidates + feature list, and the decisions, keyed by the features
+    and the model bundle (or rule thresholds). A new threshold re-scores the
+    cached features without recomputing fuzzy similarities.
     """
-    if MODEL_PATH.exists() and META_PATH.exists():
-        print(f"[matching] using model: {MODEL_PATH.name}")
-        return predict_with_model(df, cand_pairs, MODEL_PATH, META_PATH)
+    pairs = np.asarray(cand_pairs, dtype=np.int64).reshape(-1, 2)
+    feat_key = cache.key("features", Path(data_path), pairs, FEATURES)
+
+    def compute_features():
+        F, stats = parallel_features(RecordStore.from_frame(df), pairs, workers=workers)
+        add(stats, "matching.")
+        for feature in FUZZY:
+            hits, misses = stats[f"{feature}_cache_hits"], stats[f"{feature}_cache_misses"]
+            print(f"[matching] {feature} cache hit rate: {hits / max(hits + misses, 1):.1%}")
+        return {c: F[c].to_numpy() for c in FEATURES}
+
+    def features():
+        with timer("features"):
+            return pd.DataFrame(cached(cache, "features", feat_key, compute_features))
+
+    if model_path.exists() and meta_path.exists():
+        print(f"[matching] using model: {model_path.name}")
+        pred_key = cache.key("pred", feat_key, model_path, meta_path)
+
+        def decide():
+            clf, feat_cols, thr = load_model_bundle(model_path, meta_path)
+            return {"mask": model_proba(features(), clf, feat_cols) >= thr}
     else:
         print("[matching] using rules (fallback)")
-        return predict_with_rules(df, cand_pairs)
+        pred_key = cache.key("pred", feat_key, RULES, NAME_THR, STREET_THR, HARD_NAME)
+
+        def decide():
+            fired = match_rules(features())
+            print(f"[matching] rules fired: {rule_counts(fired)}")
+            add(rule_counts(fired), "matching.")
+            return {"mask": fired > 0}
+
+    with timer("decide"):
+        hit = pairs[cached(cache, "pred", pred_key, decide)["mask"]]
+    return set(zip(hit[:, 0].tolist(), hit[:, 1].tolist()))
+
+
+def cluster_stage(pred_pairs, index, cache: StageCache | None = None) -> Clusters:
+    """cluster_pairs, cached on the predicted pairs and the row index."""
+    pairs = np.array(sorted(pred_pairs), dtype=np.int64).reshape(-1, 2)
+    key = cache.key("clusters", pairs, index.to_numpy()) if cache else None
+    arrays = cached(cache, "clusters", key, lambda: cluster_pairs(pairs, index)._asdict())
+    return Clusters(**arrays)
 
 # --------- Clustering + Canonicalization ---------
 
-def make_entity_id(df: pd.DataFrame, pred_pairs: set[tuple[int, int]]) -> pd.Series:
+def make_entity_id(df: pd.DataFrame, clusters: Clusters) -> pd.Series:
     """
-    Build transitive clusters from predicted pairs, then map row index -> cluster id.
-    Rows not present in any pair receive entity_id = -1.
+    Map row index -> cluster id from the clusters computed once per run
+    (see cluster.cluster_pairs). Rows in no pair are singleton clusters.
     """
-    clusters = build_clusters(pred_pairs, df.index)  # -> list[list[int]]
-    # index -> cluster id mapping
-    eid = {}
-    for cid, idxs in enumerate(clusters):
-        for idx in idxs:
-            eid[idx] = cid
-    # if a row is a singleton (in no pairs), entity_id becomes -1
-    return df.index.map(eid).fillna(-1).astype(int)
+    return pd.Series(clusters.labels.astype(int), index=df.index)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="Entity resolution pipeline")
+    ap.add_argument("--workers", type=int, default=1,
+                    help="processes used for matching (default: 1)")
+    ap.add_argument("--data", type=Path, default=CLEAR_DATA_PATH,
+                    help="normalized input: .csv, .parquet or .arrow (default: data/clear_data.csv)")
+    ap.add_argument("--raw", type=Path, default=None,
+                    help="raw records (data/raw.csv layout): normalized first (normalize.py) "
+                         "into out/clear_data.<format>, which replaces --data")
+    ap.add_argument("--model", type=Path, default=MODEL_PATH,
+                    help="pair model bundle (default: data/pair_model.joblib)")
+    ap.add_argument("--meta", type=Path, default=META_PATH,
+                    help="model meta JSON (default: data/pair_model_meta.json)")
+    ap.add_argument("--out-dir", type=Path, default=OUT,
+                    help="output directory (default: out/)")
+    ap.add_argument("--format", choices=["parquet", "arrow", "csv"], default=FORMAT,
+                    help=f"format of candidate pairs and outputs (default: {FORMAT})")
+    ap.add_argument("--cache-dir", type=Path, default=None,
+                    help="stage cache directory (default: <out-dir>/.cache)")
+    ap.add_argument("--cache-max-mb", type=int, default=2048,
+                    help="size cap of the stage cache; least recently used entries are evicted")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="recompute every stage and leave the cache untouched")
+    ap.add_argument("--blocking", choices=list(BLOCKERS), default="keys",
+                    help="candidate generation: exact keys, MinHash LSH, both, sorted "
+                         "neighbourhood or TF-IDF top-k (default: keys)")
+    ap.add_argument("--lsh-bands", type=int, default=BANDS,
+                    help=f"LSH bands per field: more -> higher recall (default: {BANDS})")
+    ap.add_argument("--lsh-rows", type=int, default=ROWS,
+                    help=f"LSH rows per band: more -> fewer candidates (default: {ROWS})")
+    ap.add_argument("--snm-window", type=int, default=WINDOW,
+                    help=f"sorted-neighbourhood window size (default: {WINDOW})")
+    ap.add_argument("--tfidf-k", type=int, default=TOP_K,
+                    help=f"TF-IDF blocking: neighbours per record (default: {TOP_K})")
+    ap.add_argument("--tfidf-cutoff", type=float, default=CUTOFF,
+                    help=f"TF-IDF blocking: minimum cosine similarity (default: {CUTOFF})")
+    ap.add_argument("--block-matrix", action="store_true",
+                    help="fuse blocking and matching: score medium blocks as similarity "
+                         "matrices (exact keys only, see blockmatch.py)")
+    ap.add_argument("--incremental", type=Path, default=None, metavar="STATE_DIR",
+                    help="incremental mode: resolve --data as a new batch against the state in STATE_DIR")
+    ap.add_argument("--materialize", action="store_true",
+                    help="incremental mode: also write the full outputs of the state "
+                         "(reads every stored part)")
+    ap.add_argument("--shards", type=int, default=None,
+                    help="sharded mode: hash-partition records into N shards (see sharding.py)")
+    ap.add_argument("--shard-key", default=SHARD_KEY,
+                    help=f"column the shards are partitioned by (default: {SHARD_KEY})")
+    ap.add_argument("--shard-dir", type=Path, default=None,
+                    help="shared directory for shard files (default: a temporary directory)")
+    ap.add_argument("--chunk-size", type=int, default=None,
+                    help="streaming mode: candidate pairs matched per chunk")
+    ap.add_argument("--memory-limit", type=int, default=None,
+                    help="streaming mode: memory budget in MB for records and in-flight chunks; caps the chunk size")
+    ap.add_argument("--profile", action="append", default=[], metavar="STAGE",
+                    help="run STAGE (load, blocking, matching, clustering, canonicalization, save, ...) "
+                         "under cProfile: out/profile_STAGE.prof + top functions in the run report")
+    args = ap.parse_args(argv)
+    if args.block_matrix and args.blocking != "keys":
+        ap.error("--block-matrix works on the exact blocking keys only")
+    return args
+
+
+def main_streaming(args: argparse.Namespace, paths: dict) -> None:
+    """
+    Bounded-memory variant of main: candidate pairs are generated, matched and
+    written chunk by chunk, predicted edges are spooled to disk as row positions,
+    and only clustering reads them back (two int32 arrays, or chunk by chunk
+    under --memory-limit, see extcluster.py). Peak memory is the
+    records plus one chunk; the stage cache is not used.
+    """
+    start_stage("load", "load data")
+    df = load_data(args.data)
+    store = RecordStore.from_frame(df)
+
+    chunk = args.chunk_size or CHUNK_SIZE
+    reserved = 0
+    if args.memory_limit:
+        reserved = int(df.memory_usage(deep=True).sum()) + store.nbytes
+        chunk = min(chunk, chunk_size_for(args.memory_limit * 2**20, reserved))
+    print(f"[streaming] chunk size: {chunk}")
+
+    model = None
+    if args.model.exists() and args.meta.exists():
+        print(f"[matching] using model: {args.model.name}")
+        model = load_model_bundle(args.model, args.meta)
+    else:
+        print("[matching] using rules (fallback)")
+
+    start_stage("blocking+matching", "blocking + matching")
+    dtype = np.int32 if len(df) and df.index.max() < 2**31 else np.int64
+    with tempfile.TemporaryDirectory(prefix="er_edges_", dir=args.out_dir) as tmp, \
+         PairWriter(paths["cand_pairs"], dtype) as cand_w, \
+         PairWriter(paths["pairs_pred"], dtype) as pred_w:
+        spool = EdgeSpool(tmp, len(df))
+        n_cand, stats = stream_match(store, iter_candidate_pairs(df, chunk_size=chunk), spool,
+                                     model=model, workers=args.workers, cand_writer=cand_w,
+                                     pred_writer=pred_w, task_size=-(-chunk // max(args.workers, 1)))
+        print(f"candidates: {n_cand}")
+        print(f"predicted matches: {len(spool)}")
+        count("candidates", n_cand)
+        count("matches", len(spool))
+        add(stats, "matching.")
+
+        start_stage("clustering")
+        # under --memory-limit, components are computed out of core from the spool
+        budget = max(args.memory_limit * 2**20 - reserved, 0) if args.memory_limit else None
+        clusters = spool.clusters(budget)
+    histogram("cluster_size", clusters.sizes)
+    print(pd.Series(clusters.sizes).describe())
+
+    start_stage("canonicalization")
+    df_eid, entities = canonicalize_labels(df, clusters.labels, CANON_RULES, copy=False)
+    df_eid.drop(columns=['uid'], errors='ignore', inplace=True)
+
+    start_stage("save", "save outputs")
+    write_table(df_eid, paths["rows_with_entity_id"])
+    write_table(entities, paths["entities"])
+
+    print("done.")
+    for name in ("pairs_pred", "rows_with_entity_id", "entities"):
+        print(f"  {name} -> {paths[name]}")
 
 
-def run_canonicalization(df: pd.DataFrame, entity_id_col: str = "entity_id") -> pd.DataFrame:
+def main_sharded(args: argparse.Namespace, paths: dict) -> None:
     """
-    Canonicalization rules for entity 'passport' fields.
-    NOTE: Uses the helper available in your canonicalize.py.
+    Sharded variant of main: blocking, matching, clustering and canonicalization
+    run per shard in worker processes, then cross-shard edges are merged by the
+    coordinator (see sharding.sharded_run). Outputs equal those of main;
+    candidate pairs are not collected, only counted.
     """
-    canon_rules = {
-        "Name_norm":  longest,              # choose the longest normalized string
-        "Street_norm": majority,
-        "City_norm":   majority,
-        "Zip_norm":    majority,
-        "Email_norm":  most_frequent_valid, # most frequent valid value
-        "Phone_norm":  most_frequent_valid, # most frequent valid value
-    }
-    # canonicalize_all expects the source df and a clusters list; here we call the
-    # convenient wrapper available in your canonicalize.py
-    df_eid, entities = canonicalize_all(df, build_clusters, canon_rules, entity_id_col=entity_id_col)
-    # NB: canonicalize_all in your version returns (df_eid, entities)
-    return df_eid, entities
+    start_stage("load", "load data")
+    df = load_data(args.data)
+
+    start_stage("sharded", f"sharded run: {args.shards} shards by {args.shard_key}")
+    with tempfile.TemporaryDirectory(prefix="er_shards_", dir=args.out_dir) as tmp:
+        pred, labels, df_eid, entities, stats = sharded_run(
+            df, args.shards, args.shard_dir or tmp, key=args.shard_key, workers=args.workers,
+            model_path=args.model, meta_path=args.meta)
+    print(f"candidates: {stats['candidates'] + stats['cross_candidates']} "
+          f"(cross-shard: {stats['cross_candidates']})")
+    print(f"predicted matches: {len(pred)} (cross-shard: {stats['cross_matches']})")
+    add(stats, "sharded.")
+    count("matches", len(pred))
+    histogram("cluster_size", np.bincount(labels))
+    print(pd.Series(np.bincount(labels)).describe())
+    df_eid = df_eid.drop(columns=['uid'], errors='ignore')
+
+    start_stage("save", "save outputs")
+    write_pairs(pred, paths["pairs_pred"])
+    write_table(df_eid, paths["rows_with_entity_id"])
+    write_table(entities, paths["entities"])
+
+    print("done.")
+    for name in ("pairs_pred", "rows_with_entity_id", "entities"):
+        print(f"  {name} -> {paths[name]}")
 
 
-def main():
-    print(">> load data")
-    df = load_data()
+def main_incremental(args: argparse.Namespace, paths: dict) -> None:
+    """
+    Incremental variant of main: --data is a new batch that is blocked against
+    the stored block index, matched, merged into the stored clusters and
+    canonicalized only where clusters changed (see incremental.py). The outputs
+    hold what the batch changed: its new pairs, the rows of the changed clusters
+    (with row id and previous entity_id), the (re)built and the retired entities;
+    with --materialize the full outputs of the state are written too.
+    """
+    start_stage("load", "load batch")
+    df = load_data(args.data)
+    state = IncrementalState(args.incremental)
+    print(f"state: {len(state)} rows, {state.meta['batches']} batches")
+
+    model = None
+    if args.model.exists() and args.meta.exists():
+        print(f"[matching] using model: {args.model.name}")
+        model = load_model_bundle(args.model, args.meta)
+    else:
+        print("[matching] using rules (fallback)")
 
-    print(">> load candidate pairs")
-    cand_pairs = load_candidates()
-    print(f"candidates: {len(cand_pairs)}")
+    start_stage("resolve", "resolve batch")
+    stats = state.add(df, model)
+    add(stats, "incremental.")
+    print(f"new rows: {stats['rows']}, candidates: {stats['candidates']}, "
+          f"matches: {stats['matches']}, entities updated: {stats['entities_updated']}")
+
+    start_stage("save", "save outputs")
+    pairs, rows, entities, retired = state.delta()
+    delta = {name: with_format(args.out_dir / name, args.format)
+             for name in ("pairs_new", "rows_changed", "entities_changed", "entities_retired")}
+    write_pairs(pairs, delta["pairs_new"])
+    write_table(rows.drop(columns=['uid'], errors='ignore').reset_index(names='row'), delta["rows_changed"])
+    write_table(entities, delta["entities_changed"])
+    write_table(pd.DataFrame({'entity_id': retired}), delta["entities_retired"])
+    if args.materialize:
+        write_pairs(state.pairs(), paths["pairs_pred"])
+        write_table(state.rows_with_entity_id().drop(columns=['uid'], errors='ignore'),
+                    paths["rows_with_entity_id"])
+        write_table(state.entities(), paths["entities"])
+        delta.update((name, paths[name]) for name in ("pairs_pred", "rows_with_entity_id", "entities"))
 
-    print(">> matching")
-    pred_pairs = match_pairs(df, cand_pairs)
+    print("done.")
+    for name, path in delta.items():
+        print(f"  {name} -> {path}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    out, fmt = args.out_dir, args.format
+    out.mkdir(parents=True, exist_ok=True)
+    paths = {name: with_format(out / name, fmt)
+             for name in ("cand_pairs", "pairs_pred", "rows_with_entity_id", "entities")}
+    run = main_batch
+    if args.incremental:
+        run = main_incremental
+    elif args.shards:
+        run = main_sharded
+    elif args.chunk_size or args.memory_limit:
+        run = main_streaming
+    # stage timers, counters and peak memory of the run -> out/run_report.json
+    with RunReport(args.profile, out) as report:
+        report.meta.update(mode=run.__name__, time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+                           args={k: str(v) if isinstance(v, Path) else v for k, v in vars(args).items()})
+        if args.raw:
+            start_stage("normalize", "normalize raw input")
+            args.data = with_format(out / "clear_data", fmt)
+            count("raw_rows", normalize_file(args.raw, args.data, aux=True))
+        run(args, paths)
+    print(f"  run_report -> {report.write(out / REPORT_NAME)}")
+
+
+def main_batch(args: argparse.Namespace, paths: dict) -> None:
+    """In-memory run: blocking, matching, clustering and canonicalization on the whole input."""
+    out = args.out_dir
+    cache = None
+    if not args.no_cache:
+        cache = StageCache(args.cache_dir or out / ".cache", args.cache_max_mb * 2**20)
+
+    start_stage("load", "load data")
+    df = load_data(args.data, cache)
+
+    if args.block_matrix:
+        start_stage("blocking+matching", "blocking + matching (block similarity matrices)")
+        pred_pairs = match_blocks(df, args.workers, args.model, args.meta)
+    else:
+        start_stage("blocking")
+        params = {}
+        if "lsh" in args.blocking:
+            params = dict(bands=args.lsh_bands, rows=args.lsh_rows)
+        elif args.blocking == "snm":
+            params = dict(window=args.snm_window)
+        elif args.blocking == "tfidf":
+            params = dict(k=args.tfidf_k, cutoff=args.tfidf_cutoff, workers=args.workers)
+        cand_pairs = generate_candidates(df, cache, paths["cand_pairs"], data_path=args.data,
+                                         blocking=args.blocking, **params)
+        print(f"candidates: {len(cand_pairs)}")
+
+        start_stage("matching")
+        model = dict(workers=args.workers, model_path=args.model, meta_path=args.meta)
+        if cache is None:
+            pred_pairs = match_pairs(df, cand_pairs, **model)
+        else:
+            pred_pairs = match_pairs_cached(df, cand_pairs, cache, data_path=args.data, **model)
     print(f"predicted matches: {len(pred_pairs)}")
+    count("matches", len(pred_pairs))
     # save predicted pairs
-    pd.DataFrame(sorted(pred_pairs), columns=["i", "j"]).to_csv(PAIRS_PRED_PATH, index=False)
-
-    print(">> clustering")
-    df["entity_id"] = make_entity_id(df, pred_pairs)
+    with timer("write"):
+        write_pairs(np.array(sorted(pred_pairs), dtype=np.int64), paths["pairs_pred"])
+
+    start_stage("clustering")
+    # union-find once; labels/lists are shared by the steps below
+    with timer("union_find"):
+        clusters = cluster_stage(pred_pairs, df.index, cache)
+    histogram("cluster_size", clusters.sizes)
+    df["entity_id"] = make_entity_id(df, clusters)
     # quick sanity metrics over clusters
-    clust_df = summarize_clusters(df, build_clusters(pred_pairs, df.index))
+    with timer("summary"):
+        clust_df = summarize_labels(df, clusters.labels)
     print(clust_df["size"].describe())
 
-    print(">> canonicalization")
-    # canonicalization based on entity_id from df
-    from canonicalize import canonicalize_cluster, canonicalize_all  # use your functions
-    canon_rules = {
-        "Name_norm":  longest,
-        "Street_norm": majority,
-        "City_norm":   majority,
-        "Zip_norm":    majority,
-        "Email_norm":  most_frequent_valid,
-        "Phone_norm":  most_frequent_valid,
-    }
-    # canonicalize_all(df, clusters, rules) in your notebook accepted an explicit list of cluster indices
-    clusters = build_clusters(pred_pairs, df.index)
-    df_eid, entities = canonicalize_all(df, clusters, canon_rules)
+    start_stage("canonicalization")
+    # grouped canonicalization straight from the cluster labels
+    df_eid, entities = canonicalize_labels(df, clusters.labels, CANON_RULES)
     df_eid = df_eid.drop(columns=['uid'], errors='ignore')
 
-    print(">> save outputs")
-    df_eid.to_csv(ROWS_WITH_EID_PATH, index=False)
-    entities.to_csv(ENTITIES_PATH, index=False)
+    start_stage("save", "save outputs")
+    with timer("rows_with_entity_id"):
+        write_table(df_eid, paths["rows_with_entity_id"])
+    with timer("entities"):
+        write_table(entities, paths["entities"])
 
     print("done.")
-    print(f"  pairs_pred -> {PAIRS_PRED_PATH}")
-    print(f"  rows_with_entity_id -> {ROWS_WITH_EID_PATH}")
-    print(f"  entities -> {ENTITIES_PATH}")
+    for name in ("pairs_pred", "rows_with_entity_id", "entities"):
+        print(f"  {name} -> {paths[name]}")
 
 
 if __name__ == "__main__":
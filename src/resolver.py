@@ -0,0 +1,360 @@
+# resolver.py
+from __future__ import annotations
+from collections import deque
+from pathlib import Path
+from typing import List, Optional
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+import pandas as pd
+
+from blocking import MAX_BLOCK_SIZE, block_keys
+from model import load_model_bundle, model_proba
+from rules import FEATURES, RULES, match_rules, name_scores, prepare_aux_cols, street_scores
+from incremental import IncrementalState
+from pipeline import FORMAT, META_PATH, MODEL_PATH, OUT
+from storage import read_table, with_format
+
+FIELDS = ['Name_norm', 'Street_norm', 'City_norm', 'Zip_norm', 'Email_norm', 'Phone_norm']
+MAX_BATCH = 64        # queries resolved together
+MAX_WAIT_MS = 0.0     # extra wait for more queries; 0 batches what queued during the last batch
+LATENCY_WINDOW = 10_000
+MAX_BODY = 8 << 20    # bytes per request body; larger requests get 413
+
+def _load_model(model_path, meta_path):
+    if model_path and meta_path and Path(model_path).exists() and Path(meta_path).exists():
+        return load_model_bundle(model_path, meta_path)
+    return None
+
+# --- 1) In-memory entity index ---
+class EntityIndex:
+    """
+    Records with their entity_id plus an inverted index per blocking key
+    (key value -> row positions), for resolving new records one by one.
+
+    resolve() takes normalized records (the *_norm fields of clear_data),
+    collects the rows sharing a blocking key with each of them (blocks above
+    max_block_size are skipped), and scores the pairs with the features of
+    rules.pair_features_batch:
+    the model when one is given, the rules otherwise.
+    """
+    def __init__(self, df: pd.DataFrame, model=None, max_block_size: int = MAX_BLOCK_SIZE):
+        # aux columns are derived again: tables may have read phone_last4 back as numbers
+        df = df.reset_index(drop=True).drop(columns=['email_user', 'phone_last4'], errors='ignore')
+        self.df = prepare_aux_cols(df)
+        self.entity_ids = self.df['entity_id'].to_numpy(dtype=object)
+        self.values = {c: self.df[c].to_numpy(dtype=object, na_value=None) if c in self.df
+                       else np.full(len(self.df), None, dtype=object)
+                       for c in FIELDS + ['email_user', 'phone_last4']}
+        self.model = model
+        self.max_block_size = max_block_size
+        self.blocks = {}
+        for name, ser in block_keys(self.df).items():
+            groups = ser.groupby(ser, sort=False).indices
+            self.blocks[name] = {k: v for k, v in groups.items() if len(v) <= max_block_size}
+
+    @classmethod
+    def load(cls, rows_path, model_path=None, meta_path=None, **kw) -> 'EntityIndex':
+        """From a rows_with_entity_id table written by the pipeline (.csv/.parquet/.arrow)."""
+        df = read_table(rows_path, dtype={"Phone_norm": str, "Zip_norm": str})
+        return cls(df, _load_model(model_path, meta_path), **kw)
+
+    @classmethod
+    def from_state(cls, state_dir, model=None, **kw) -> 'EntityIndex':
+        """From an incremental.IncrementalState directory."""
+        return cls(IncrementalState(state_dir).rows_with_entity_id(), model, **kw)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def candidates(self, keys: List[dict]) -> np.ndarray:
+        """(query position, row position) pairs sharing at least one blocking key."""
+        out = []
+        for q, k in enumerate(keys):
+            for name, value in k.items():
+                rows = self.blocks.get(name, {}).get(value)
+                if rows is not None:
+                    out.append(np.column_stack([np.full(len(rows), q), rows]))
+        if not out:
+            return np.empty((0, 2), dtype=np.int64)
+        return np.unique(np.concatenate(out), axis=0)
+
+    def features(self, queries: List[dict], pairs: np.ndarray) -> pd.DataFrame:
+        """pair_features_batch for (query, stored row) pairs, without building a frame of the queries."""
+        q, r = pairs[:, 0], pairs[:, 1]
+        def cols(col):
+            a = np.array([x.get(col) for x in queries], dtype=object)[q]
+            return a, self.values[col][r]
+        def eq(col):
+            a, b = cols(col)
+            return (a == b) & pd.notna(a)
+        return pd.DataFrame({
+            'name_sim': name_scores(*cols('Name_norm')),
+            'street_sim': street_scores(*cols('Street_norm')),
+            'zip_eq': eq('Zip_norm'), 'city_eq': eq('City_norm'),
+            'email_eq': eq('Email_norm'), 'phone_eq': eq('Phone_norm'),
+            'email_user_eq': eq('email_user'), 'phone_last4_eq': eq('phone_last4'),
+        }, columns=FEATURES)
+
+    def resolve(self, records: List[dict]) -> List[dict]:
+        """
+        For every record: {'entity_id': best match or None, 'matches': [{'entity_id',
+        'row', 'score', 'rule'}, ...]} with matches sorted by score.
+        """
+        queries = [_query_record(r) for r in records]
+        pairs = self.candidates([_query_keys(r) for r in queries])
+        results = [{'entity_id': None, 'matches': []} for _ in records]
+        if not len(pairs):
+            return results
+
+        F = self.features(queries, pairs)
+        fired = match_rules(F)
+        if self.model is not None:
+            clf, feat_cols, thr = self.model
+            score = model_proba(F, clf, feat_cols)
+            hit = score >= thr
+        else:
+            score = F['name_sim'].to_numpy()
+            hit = fired > 0
+
+        for (q, r), s, rule, h in zip(pairs.tolist(), score.tolist(), fired.tolist(), hit.tolist()):
+            if h:
+                results[q]['matches'].append({'entity_id': self.entity_ids[r], 'row': r,
+                                              'score': round(s, 4),
+                                              'rule': RULES[rule - 1] if rule else None})
+        for res in results:
+            res['matches'].sort(key=lambda m: -m['score'])
+            if res['matches']:
+                res['entity_id'] = res['matches'][0]['entity_id']
+        return results
+
+# Query side in plain Python: a pandas frame per request costs milliseconds.
+# Same definitions as rules.prepare_aux_cols and blocking.block_keys.
+def _field(v):
+    # JSON integers (zip, phone) are taken as their digits; other non-strings as missing
+    if isinstance(v, int) and not isinstance(v, bool):
+        return str(v)
+    return v if isinstance(v, str) else None
+
+def _query_record(rec: dict) -> dict:
+    r = {c: _field(rec.get(c)) for c in FIELDS}
+    email, phone = r['Email_norm'], r['Phone_norm']
+    r['email_user'] = email.split('@')[0] if email is not None else None
+    r['phone_last4'] = phone[-4:] if phone is not None else None
+    return r
+
+def _query_keys(r: dict) -> dict:
+    zip_ = r['Zip_norm']
+    if zip_ is None:
+        return {}
+    parts = {'domain_zip': r['Email_norm'] and r['Email_norm'].split('@')[-1],
+             'pl4_zip': r['phone_last4'],
+             'name0_zip': r['Name_norm'] and r['Name_norm'][:1],
+             'city_zip': r['City_norm']}
+    return {name: f"{v}_{zip_}" for name, v in parts.items() if v is not None}
+
+# --- 2) Micro-batching service ---
+class Resolver:
+    """
+    Async front of an EntityIndex: concurrent resolve() calls are queued and
+    resolved together, up to max_batch queries: those that arrived while the
+    previous batch was scored, plus any arriving within max_wait_ms.
+    Per-query latencies (queueing included) are kept for p50/p99 reporting.
+    """
+    def __init__(self, index: EntityIndex, max_batch: int = MAX_BATCH,
+                 max_wait_ms: float = MAX_WAIT_MS):
+        self.index = index
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.batches = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def resolve(self, record: dict) -> dict:
+        fut = asyncio.get_running_loop().create_future()
+        await self._queue.put((record, fut, time.perf_counter()))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                results = self.index.resolve([rec for rec, _, _ in batch])
+            except Exception as e:          # fail the requests, keep the service up
+                for _, fut, _ in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            self.batches += 1
+            now = time.perf_counter()
+            for (_, fut, t0), res in zip(batch, results):
+                self.latencies.append(now - t0)
+                if not fut.done():
+                    fut.set_result(res)
+
+    def stats(self) -> dict:
+        lat = np.array(self.latencies) * 1000
+        return {'queries': len(lat), 'batches': self.batches, 'records': len(self.index),
+                'p50_ms': float(np.percentile(lat, 50)) if len(lat) else None,
+                'p99_ms': float(np.percentile(lat, 99)) if len(lat) else None}
+
+# --- 3) HTTP on asyncio streams ---
+class BadRequest(ValueError):
+    """Malformed request: answered with 400."""
+
+def _response(status: int, body: dict) -> bytes:
+    data = json.dumps(body, default=str).encode()
+    reason = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+              500: 'Internal Server Error'}.get(status, 'Error')
+    return (f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n").encode() + data
+
+def _parse_head(head: bytes):
+    """Request line and headers -> (method, path, headers, content length)."""
+    lines = head.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3 or not parts[0] or not parts[1] or not parts[2].startswith("HTTP/"):
+        raise BadRequest("malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        if ":" not in line:
+            raise BadRequest("malformed header")
+        k, v = line.split(":", 1)
+        headers[k.strip().lower()] = v.strip()
+    length = headers.get("content-length", "0")
+    if not length.isdigit():
+        raise BadRequest("invalid Content-Length")
+    return parts[0], parts[1], headers, int(length)
+
+def _parse_records(body: bytes):
+    """POST /resolve body -> (records, batch): {record} or {"records": [{record}, ...]}."""
+    try:
+        req = json.loads(body or b"{}")
+    except ValueError:
+        raise BadRequest("invalid JSON")
+    if not isinstance(req, dict):
+        raise BadRequest("body must be a JSON object")
+    batch = "records" in req
+    records = req["records"] if batch else [req]
+    if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+        raise BadRequest('"records" must be a list of objects')
+    for rec in records:                 # field values: strings, integers (zip / phone) or null
+        for c in FIELDS:
+            v = rec.get(c)
+            if not (v is None or isinstance(v, str) or (isinstance(v, int) and not isinstance(v, bool))):
+                raise BadRequest(f"{c} must be a string, an integer or null")
+    return records, batch
+
+async def _handle(resolver: Resolver, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                  max_body: int = MAX_BODY):
+    # minimal HTTP/1.1 with keep-alive: POST /resolve {record} or {"records": [...]}, GET /stats.
+    # Bad requests get 400 (and close the connection when the framing itself is broken),
+    # bodies above max_body 413 (unread, the connection is closed), resolve failures 500;
+    # the service keeps running either way.
+    try:
+        while True:
+            try:
+                method, path, headers, length = _parse_head(await reader.readuntil(b"\r\n\r\n"))
+            except (BadRequest, asyncio.LimitOverrunError) as e:
+                writer.write(_response(400, {'error': str(e) or 'request head too large'}))
+                await writer.drain()
+                break
+            if length > max_body:
+                writer.write(_response(413, {'error': f'body of {length} bytes, limit {max_body}'}))
+                await writer.drain()
+                break
+            body = await reader.readexactly(length)
+
+            if method == "GET" and path == "/stats":
+                out = _response(200, resolver.stats())
+            elif method == "POST" and path == "/resolve":
+                try:
+                    records, batch = _parse_records(body)
+                    res = await asyncio.gather(*(resolver.resolve(r) for r in records))
+                except BadRequest as e:
+                    out = _response(400, {'error': str(e)})
+                except Exception as e:
+                    out = _response(500, {'error': f'{type(e).__name__}: {e}'})
+                else:
+                    out = _response(200, {'results': list(res)} if batch else res[0])
+            else:
+                out = _response(404, {'error': f'{method} {path}'})
+            writer.write(out)
+            await writer.drain()
+            if headers.get("connection", "").lower() == "close":
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(index: EntityIndex, host: str = "127.0.0.1", port: int = 8765,
+                max_body: int = MAX_BODY, **kw):
+    """Start the resolver; returns (server, resolver). port=0 picks a free port."""
+    if len(index):
+        index.resolve(index.df.iloc[:1].to_dict("records"))   # warm up scorers and model
+    resolver = Resolver(index, **kw)
+    await resolver.start()
+    server = await asyncio.start_server(lambda r, w: _handle(resolver, r, w, max_body), host, port)
+    return server, resolver
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Online entity resolver (HTTP)")
+    ap.add_argument("--rows", type=Path, default=with_format(OUT / "rows_with_entity_id", FORMAT),
+                    help=f"rows_with_entity_id written by the pipeline (default: out/rows_with_entity_id.{FORMAT})")
+    ap.add_argument("--state", type=Path, default=None,
+                    help="serve an incremental state directory instead of --rows")
+    ap.add_argument("--model", type=Path, default=MODEL_PATH)
+    ap.add_argument("--meta", type=Path, default=META_PATH)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    ap.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    ap.add_argument("--max-body", type=int, default=MAX_BODY,
+                    help=f"largest request body in bytes, larger ones get 413 (default: {MAX_BODY})")
+    args = ap.parse_args(argv)
+
+    if args.state is not None:
+        index = EntityIndex.from_state(args.state, _load_model(args.model, args.meta))
+    else:
+        index = EntityIndex.load(args.rows, args.model, args.meta)
+
+    async def run():
+        server, _ = await serve(index, args.host, args.port, args.max_body,
+                                max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+        print(f"resolver: {len(index)} records on http://{args.host}:{args.port}")
+        async with server:
+            await server.serve_forever()
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@
 from typing import Dict, Tuple, Set, Iterable
 from itertools import combinations
 from rapidfuzz.distance import JaroWinkler
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+import numpy as np
 import pandas as pd
 
 # 1) Parameters (you can override thresholds via function args if needed)
@@ -10,6 +11,10 @@ NAME_THR   = 0.92
 STREET_THR = 88
 HARD_NAME  = 0.95
 
+# Feature names produced by pair_features / pair_features_batch (column order)
+FEATURES = ['name_sim', 'street_sim', 'zip_eq', 'city_eq',
+            'email_eq', 'phone_eq', 'email_user_eq', 'phone_last4_eq']
+
 # Helper to prepare auxiliary fields (in case this wasn't done earlier)
 def prepare_aux_cols(df: pd.DataFrame) -> pd.DataFrame:
     if 'email_user' not in df:
@@ -32,30 +37,223 @@ def pair_features(df: pd.DataFrame, i: int, j: int) -> Dict[str, float]:
         'phone_last4_eq': a['phone_last4'] == b['phone_last4'],
     }
 
+# 2b) Batch pairwise features: one row per (i, j), same values as pair_features
+# df may also be a store.RecordStore: equality is then compared on integer codes
+def _values(df: pd.DataFrame, col: str) -> np.ndarray:
+    if not isinstance(df, pd.DataFrame):
+        return df.values(col)
+    return df[col].to_numpy(dtype=object, na_value=None)
+
+def _eq(df: pd.DataFrame, col: str, pi: np.ndarray, pj: np.ndarray) -> np.ndarray:
+    if col not in df.columns:
+        return np.zeros(len(pi), dtype=bool)
+    if not isinstance(df, pd.DataFrame):
+        return df.equal(col, pi, pj)
+    v = _values(df, col)
+    a, b = v[pi], v[pj]
+    # NaN never equals NaN in pair_features, so missing values don't match
+    return (a == b) & pd.notna(a)
+
+def _positions(df: pd.DataFrame, i) -> np.ndarray:
+    pos = df.index.get_indexer(np.asarray(i))
+    if (pos < 0).any():
+        raise KeyError("pair indices not found in df.index")
+    return pos
+
+def name_scores(a: np.ndarray, b: np.ndarray, workers: int = 1) -> np.ndarray:
+    # cpdist's Jaro-Winkler differs from the scalar call in the last ulp, so map it
+    return np.fromiter(map(JaroWinkler.normalized_similarity, a, b),
+                       dtype=np.float64, count=len(a))
+
+def street_scores(a: np.ndarray, b: np.ndarray, workers: int = 1) -> np.ndarray:
+    return process.cpdist(a, b, scorer=fuzz.token_set_ratio, dtype=np.float64, workers=workers)
+
+# fuzzy feature -> (source column, batch scorer over two string arrays)
+FUZZY_SCORERS = {'name_sim': ('Name_norm', name_scores),
+                 'street_sim': ('Street_norm', street_scores)}
+
+def _fuzzy(df: pd.DataFrame, feature: str, pi: np.ndarray, pj: np.ndarray,
+           workers: int = 1, sim_cache=None) -> np.ndarray:
+    # sim_cache: optional {feature: simcache.SimilarityCache} built over df's rows
+    if sim_cache and feature in sim_cache:
+        return sim_cache[feature].score_rows(pi, pj, workers=workers)
+    col, scorer = FUZZY_SCORERS[feature]
+    v = _values(df, col)
+    return scorer(v[pi], v[pj], workers)
+
+def _eq_features(df: pd.DataFrame, pi: np.ndarray, pj: np.ndarray) -> Dict[str, np.ndarray]:
+    return {
+        'zip_eq': _eq(df, 'Zip_norm', pi, pj),
+        'city_eq': _eq(df, 'City_norm', pi, pj),
+        'email_eq': _eq(df, 'Email_norm', pi, pj),
+        'phone_eq': _eq(df, 'Phone_norm', pi, pj),
+        'email_user_eq': _eq(df, 'email_user', pi, pj),
+        'phone_last4_eq': _eq(df, 'phone_last4', pi, pj),
+    }
+
+def pair_features_batch(df: pd.DataFrame, i, j, workers: int = 1,
+                        sim_cache=None) -> pd.DataFrame:
+    """
+    Vectorized pair_features for index arrays i, j (labels of df.index).
+    Returns a DataFrame with FEATURES columns, row k describing pair (i[k], j[k]).
+    """
+    pi, pj = _positions(df, i), _positions(df, j)
+    return pd.DataFrame({
+        'name_sim': _fuzzy(df, 'name_sim', pi, pj, workers, sim_cache),
+        'street_sim': _fuzzy(df, 'street_sim', pi, pj, workers, sim_cache),
+        **_eq_features(df, pi, pj),
+    }, columns=FEATURES)
+
+# 2c) Lazy features: equality first, fuzzy scores only where they can change the outcome
+FUZZY = ['name_sim', 'street_sim']
+
+def _count_fuzzy(stats, pairs: int = 0, computed: int = 0):
+    # stats: Counter with pairs / fuzzy_computed / fuzzy_skipped (skipped = 2*pairs - computed)
+    if stats is not None:
+        stats['pairs'] += pairs
+        stats['fuzzy_skipped'] += len(FUZZY) * pairs - computed
+        stats['fuzzy_computed'] += computed
+
+class LazyFeatures(dict):
+    """
+    pair_features(df, i, j) computed key by key on first access and then kept,
+    so a rule path and a model path can share one instance.
+    """
+    _EQ_COLS = {'zip_eq': 'Zip_norm', 'city_eq': 'City_norm', 'email_eq': 'Email_norm',
+                'phone_eq': 'Phone_norm', 'email_user_eq': 'email_user',
+                'phone_last4_eq': 'phone_last4'}
+
+    def __init__(self, df: pd.DataFrame, i: int, j: int, stats=None):
+        super().__init__()
+        self.df, self.i, self.j, self.stats = df, i, j, stats
+        _count_fuzzy(stats, pairs=1)
+
+    def _pair(self, col):
+        return self.df.at[self.i, col], self.df.at[self.j, col]
+
+    def __missing__(self, key):
+        if key == 'name_sim':
+            value = JaroWinkler.normalized_similarity(*self._pair('Name_norm'))
+        elif key == 'street_sim':
+            value = fuzz.token_set_ratio(*self._pair('Street_norm'))
+        elif key == 'city_eq' and 'City_norm' not in self.df.columns:
+            value = False
+        elif key in self._EQ_COLS:
+            a, b = self._pair(self._EQ_COLS[key])
+            value = a == b
+        else:
+            raise KeyError(key)
+        if key in FUZZY:
+            _count_fuzzy(self.stats, computed=1)
+        self[key] = value
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in FEATURES else default
+
+def lazy_pair_features(df: pd.DataFrame, i, j, workers: int = 1, stats=None,
+                       sim_cache=None, name_thr: float = NAME_THR, **thr) -> pd.DataFrame:
+    """
+    pair_features_batch for the rule matcher. Equality features are computed for
+    every pair; name_sim / street_sim only for pairs where a rule can still fire
+    and NaN elsewhere (NaN fails every threshold, so match_rules gives the same
+    answer as on the full frame). fill_fuzzy completes the frame for the model.
+    """
+    pi, pj = _positions(df, i), _positions(df, j)
+    F = pd.DataFrame({'name_sim': np.nan, 'street_sim': np.nan, **_eq_features(df, pi, pj)},
+                     index=pd.RangeIndex(len(pi)), columns=FEATURES)
+    zip_eq, city_eq = F['zip_eq'].to_numpy(), F['city_eq'].to_numpy()
+    open_ = ~(F['email_eq'].to_numpy() | F['phone_eq'].to_numpy())
+    # every rule reading name_sim also needs zip/city or the email user to agree
+    need = open_ & (zip_eq | city_eq | F['email_user_eq'].to_numpy())
+    name = np.full(len(F), np.nan)
+    name[need] = _fuzzy(df, 'name_sim', pi[need], pj[need], workers, sim_cache)
+    # street_sim only matters with zip_eq, and only if name + zip/city didn't match already
+    need_street = open_ & zip_eq & ~((name >= name_thr) & (zip_eq | city_eq))
+    street = np.full(len(F), np.nan)
+    street[need_street] = _fuzzy(df, 'street_sim', pi[need_street], pj[need_street],
+                                 workers, sim_cache)
+    F['name_sim'], F['street_sim'] = name, street
+    _count_fuzzy(stats, pairs=len(F), computed=int(need.sum() + need_street.sum()))
+    return F
+
+def fill_fuzzy(df: pd.DataFrame, i, j, F: pd.DataFrame, rows: np.ndarray,
+               workers: int = 1, stats=None, sim_cache=None) -> pd.DataFrame:
+    """Compute the fuzzy features lazy_pair_features skipped, for the selected rows."""
+    pi, pj = _positions(df, i), _positions(df, j)
+    for feature in FUZZY:
+        v = F[feature].to_numpy().copy()
+        todo = rows & np.isnan(v)
+        v[todo] = _fuzzy(df, feature, pi[todo], pj[todo], workers, sim_cache)
+        F[feature] = v
+        _count_fuzzy(stats, computed=int(todo.sum()))
+    return F
+
 # 3) Rule-based matcher
 def is_match(df: pd.DataFrame, i: int, j: int,
              name_thr: float = NAME_THR,
              street_thr: float = STREET_THR,
-             hard_name: float = HARD_NAME) -> bool:
-    f = pair_features(df, i, j)
+             hard_name: float = HARD_NAME,
+             feats: Dict[str, float] = None) -> bool:
+    # Cheap equality checks come first in every rule, so with LazyFeatures the
+    # fuzzy scores are only computed when a rule still needs them
+    f = feats if feats is not None else LazyFeatures(df, i, j)
     if f['email_eq'] or f['phone_eq']:
         return True
-    if f['name_sim'] >= name_thr and (f['zip_eq'] or f['city_eq']):
+    if (f['zip_eq'] or f['city_eq']) and f['name_sim'] >= name_thr:
         return True
-    if f['street_sim'] >= street_thr and f['zip_eq']:
+    if f['zip_eq'] and f['street_sim'] >= street_thr:
         return True
     if f['email_user_eq'] and (f['zip_eq'] or f['name_sim'] >= hard_name):
         return True
-    if f['phone_last4_eq'] and f['name_sim'] >= hard_name and (f['zip_eq'] or f['city_eq']):
+    if f['phone_last4_eq'] and (f['zip_eq'] or f['city_eq']) and f['name_sim'] >= hard_name:
         return True
     # Safety rule for rare typos in name+street just before returning False
     if (f['zip_eq'] and f['city_eq']) and \
-       (f['name_sim'] >= 0.88 and f['street_sim'] >= 82) and \
-       (f['phone_last4_eq'] or f['email_user_eq']):
+       (f['phone_last4_eq'] or f['email_user_eq']) and \
+       (f['name_sim'] >= 0.88 and f['street_sim'] >= 82):
         return True
 
     return False
 
+# 3b) Vectorized matcher: the same rules as boolean masks over a feature frame
+# Rule names in is_match order; match_rules reports k for RULES[k-1], 0 for no match
+RULES = ['email_phone_eq', 'name_zip_city', 'street_zip',
+         'email_user', 'phone_last4', 'safety']
+
+def match_rules(F: pd.DataFrame,
+                name_thr: float = NAME_THR,
+                street_thr: float = STREET_THR,
+                hard_name: float = HARD_NAME) -> np.ndarray:
+    name, street = F['name_sim'].to_numpy(), F['street_sim'].to_numpy()
+    zip_eq, city_eq = F['zip_eq'].to_numpy(bool), F['city_eq'].to_numpy(bool)
+    email_user_eq = F['email_user_eq'].to_numpy(bool)
+    phone_last4_eq = F['phone_last4_eq'].to_numpy(bool)
+    masks = [
+        F['email_eq'].to_numpy(bool) | F['phone_eq'].to_numpy(bool),
+        (name >= name_thr) & (zip_eq | city_eq),
+        (street >= street_thr) & zip_eq,
+        email_user_eq & (zip_eq | (name >= hard_name)),
+        phone_last4_eq & (name >= hard_name) & (zip_eq | city_eq),
+        (zip_eq & city_eq) & (name >= 0.88) & (street >= 82) & (phone_last4_eq | email_user_eq),
+    ]
+    # np.select picks the first mask that holds, like the if-chain in is_match
+    return np.select(masks, np.arange(1, len(masks) + 1, dtype=np.int8), 0).astype(np.int8)
+
+def rules_fired(df: pd.DataFrame, i, j, workers: int = 1,
+                lazy: bool = True, stats=None, sim_cache=None, **thr) -> np.ndarray:
+    """Rule id (see RULES) that matched each pair (i[k], j[k]); 0 where none did."""
+    if lazy:
+        F = lazy_pair_features(df, i, j, workers=workers, stats=stats, sim_cache=sim_cache, **thr)
+    else:
+        F = pair_features_batch(df, i, j, workers=workers, sim_cache=sim_cache)
+        _count_fuzzy(stats, pairs=len(F), computed=len(FUZZY) * len(F))
+    return match_rules(F, **thr)
+
+def rule_counts(fired: np.ndarray) -> Dict[str, int]:
+    counts = np.bincount(fired, minlength=len(RULES) + 1)
+    return {name: int(c) for name, c in zip(RULES, counts[1:])}
+
 # --- Utilities for evaluation ---
 def true_pairs(df: pd.DataFrame, uid_col: str = 'uid') -> Set[Tuple[int,int]]:
     S = set()
@@ -67,7 +265,12 @@ def true_pairs(df: pd.DataFrame, uid_col: str = 'uid') -> Set[Tuple[int,int]]:
 
 def predict_pairs(df: pd.DataFrame, cand_pairs: Iterable[Tuple[int,int]],
                   **thr) -> Set[Tuple[int,int]]:
-    return {p for p in cand_pairs if is_match(df, *p, **thr)}
+    pairs = list(cand_pairs)
+    if not pairs:
+        return set()
+    ij = np.asarray(pairs)
+    fired = rules_fired(df, ij[:, 0], ij[:, 1], **thr)
+    return {p for p, k in zip(pairs, fired) if k}
 
 def evaluate_pairwise(T: Set[Tuple[int,int]], P: Set[Tuple[int,int]]) -> Dict[str, float]:
     tp = len(P & T); fp = len(P - T); fn = len(T - P)
@@ -0,0 +1,129 @@
+# scorer.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Optional
+import argparse
+import json
+import numpy as np
+import pandas as pd
+
+from stagecache import file_hash
+
+# Parameters
+SUFFIX     = ".scorer.json"         # pair_model.joblib -> pair_model.scorer.json
+SCALING    = {'street_sim': 100.0}  # divisors applied in training (model.ipynb, model.model_matrix)
+CHUNK_ROWS = 1_000_000              # rows per matrix-vector product (bounds temporaries)
+
+# --- 1) Compiled logistic regression ---
+class LinearScorer:
+    """
+    A binary logistic regression as plain coefficients: p = 1 / (1 + exp(-(X @ coef + b))).
+    predict_proba is a drop-in for the sklearn estimator on the same inputs;
+    proba_frame goes straight from a feature frame, with the training scaling.
+    """
+    def __init__(self, coef, intercept: float, feat_cols, threshold: float,
+                 scaling: Optional[Dict[str, float]] = None, source: Optional[dict] = None):
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(intercept)
+        self.feat_cols = list(feat_cols)
+        self.threshold = float(threshold)
+        self.scaling = dict(SCALING if scaling is None else scaling)
+        self.source = source or {}
+        if len(self.coef) != len(self.feat_cols):
+            raise ValueError(f"{len(self.coef)} coefficients for {len(self.feat_cols)} features")
+
+    def decision_function(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        out = np.empty(len(X))
+        for lo in range(0, len(X), CHUNK_ROWS):
+            out[lo:lo + CHUNK_ROWS] = X[lo:lo + CHUNK_ROWS] @ self.coef + self.intercept
+        return out
+
+    def predict_proba(self, X) -> np.ndarray:
+        p = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack([1.0 - p, p])
+
+    def proba_frame(self, F: pd.DataFrame) -> np.ndarray:
+        # feature frame -> P(match), as predict_proba(model.model_matrix(F)) without the frame copy
+        X = np.zeros((len(F), len(self.feat_cols)))
+        for k, c in enumerate(self.feat_cols):
+            if c in F:
+                X[:, k] = F[c].to_numpy(dtype=np.float64)
+                if c in self.scaling:
+                    X[:, k] /= self.scaling[c]
+        return self.predict_proba(X)[:, 1]
+
+    def to_dict(self) -> dict:
+        return {'kind': 'logistic', 'feat_cols': self.feat_cols, 'coef': self.coef.tolist(),
+                'intercept': self.intercept, 'threshold': self.threshold,
+                'scaling': self.scaling, 'source': self.source}
+
+    def save(self, path) -> Path:
+        path = Path(path)
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+        return path
+
+    @classmethod
+    def load(cls, path) -> "LinearScorer":
+        d = json.loads(Path(path).read_text(encoding="utf-8"))
+        if d.get('kind') != 'logistic':
+            raise ValueError(f"{path}: not a compiled logistic scorer")
+        return cls(d['coef'], d['intercept'], d['feat_cols'], d['threshold'],
+                   d.get('scaling'), d.get('source'))
+
+# --- 2) Compile step and lookup ---
+def scorer_path(model_path) -> Path:
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + SUFFIX)
+
+def _sources(model_path, meta_path=None) -> dict:
+    meta = meta_path is not None and Path(meta_path).exists()
+    return {'model': file_hash(model_path), 'meta': file_hash(meta_path) if meta else None}
+
+def compile_model(model_path, meta_path=None, out_path=None) -> Path:
+    """
+    Export the logistic regression of a model bundle (model.load_model_bundle
+    formats) to a JSON coefficient artifact, by default next to the bundle.
+    The artifact records the hashes of its sources, see load_compiled.
+    """
+    from model import load_model_bundle
+    clf, feat_cols, thr = load_model_bundle(model_path, meta_path, compiled=False)
+    coef = getattr(clf, 'coef_', None)
+    if coef is None or coef.shape[0] != 1 or list(clf.classes_) != [0, 1]:
+        raise ValueError(f"{model_path}: only binary linear models with classes [0, 1] can be compiled")
+    scorer = LinearScorer(coef[0], clf.intercept_[0], feat_cols, thr,
+                          source=_sources(model_path, meta_path))
+    return scorer.save(out_path or scorer_path(model_path))
+
+def load_compiled(model_path, meta_path=None) -> Optional[LinearScorer]:
+    """
+    A compiled scorer for model_path: the file itself if it is an artifact,
+    else the artifact next to it when it was compiled from the current bundle
+    (and meta file); None otherwise.
+    """
+    model_path = Path(model_path)
+    if model_path.name.endswith(SUFFIX):
+        return LinearScorer.load(model_path)
+    path = scorer_path(model_path)
+    if not path.exists() or not model_path.exists():
+        return None
+    scorer = LinearScorer.load(path)
+    src = scorer.source
+    if src.get('model') != file_hash(model_path):
+        return None
+    if src.get('meta') is not None and src['meta'] != _sources(model_path, meta_path)['meta']:
+        return None
+    return scorer
+
+def main(argv=None):
+    from pipeline import META_PATH, MODEL_PATH
+    ap = argparse.ArgumentParser(description="Compile the pair model into a NumPy coefficient artifact")
+    ap.add_argument("--model", default=MODEL_PATH)
+    ap.add_argument("--meta", default=META_PATH)
+    ap.add_argument("--out", default=None, help=f"default: <model stem>{SUFFIX} next to the model")
+    args = ap.parse_args(argv)
+    path = compile_model(args.model, args.meta, args.out)
+    print(f"[scorer] {args.model} -> {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# sharding.py
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import argparse
+import json
+import numpy as np
+import pandas as pd
+
+from blocking import MAX_BLOCK_SIZE, block_keys, encode_blocks, iter_block_pairs
+from cluster import union_find
+from canonicalize import CANON_RULES, canonicalize_labels
+from model import load_model_bundle
+from parallel import CHUNK_SIZE, match_chunk, merge_results, split_pairs
+from simcache import similarity_caches
+from storage import read_table, write_table
+from store import RecordStore
+
+SHARD_KEY = 'Zip_norm'   # every blocking key contains the zip, so zip shards share no pairs
+ROW_COL   = '_row'       # original index label of a record inside shard files
+
+# --- 1) Partitioning ---
+def shard_ids(df: pd.DataFrame, n_shards: int, key: str = SHARD_KEY) -> np.ndarray:
+    """Stable hash partition of the rows by `key` (same shard for equal values, on any machine)."""
+    values = df[key].astype(object).where(df[key].notna(), '').astype(str).to_numpy(dtype=object)
+    return (pd.util.hash_array(values) % np.uint64(n_shards)).astype(np.int32)
+
+def _load_model(model_path, meta_path):
+    if model_path and meta_path and Path(model_path).exists() and Path(meta_path).exists():
+        return load_model_bundle(model_path, meta_path)
+    return None
+
+def _match(store, pairs: np.ndarray, model, sim_cache) -> Tuple[np.ndarray, dict]:
+    results = [match_chunk(store, c, model, sim_cache) for c in split_pairs(pairs, CHUNK_SIZE)]
+    masks, stats = merge_results(results)
+    mask = np.concatenate(masks) if masks else np.zeros(0, dtype=bool)
+    return pairs[mask], dict(stats)
+
+def _label_pairs(pos: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    i, j = labels[pos[:, 0]], labels[pos[:, 1]]
+    return np.column_stack([np.minimum(i, j), np.maximum(i, j)]).astype(np.int64)
+
+def prepare_shards(df: pd.DataFrame, n_shards: int, shard_dir, key: str = SHARD_KEY,
+                   max_block_size: int = MAX_BLOCK_SIZE):
+    """
+    Encode the blocking keys once over all rows, hash-partition the rows and
+    write shard k to <shard_dir>/shard-k/: its records (records.parquet,
+    original index in ROW_COL) and their global block codes (codes.npz).
+    Everything is deterministic, so a coordinator may recompute it.
+
+    Returns:
+        (codes, shard, dirs)
+    """
+    codes, _ = encode_blocks(block_keys(df), max_block_size, sort_by=df['Name_norm'])
+    shard = shard_ids(df, n_shards, key)
+    dirs = []
+    for k in range(n_shards):
+        d = Path(shard_dir) / f"shard-{k:03d}"
+        d.mkdir(parents=True, exist_ok=True)
+        rows = np.flatnonzero(shard == k)
+        write_table(df.iloc[rows].reset_index(names=ROW_COL), d / "records.parquet")
+        np.savez(d / "codes.npz", **{name: c[rows] for name, c in codes.items()})
+        dirs.append(d)
+    return codes, shard, dirs
+
+# --- 2) One shard: blocking, matching, local clustering, canonicalization ---
+def run_shard(shard_dir, model_path=None, meta_path=None) -> dict:
+    """
+    Process one shard directory written by prepare_shards. Blocking runs on the
+    global block codes of the shard's rows, so its candidates are exactly the
+    within-shard pairs of a single-process run. Writes pred.npy (matched index
+    pairs), labels.npy (local cluster per row), rows/entities.parquet and stats.json.
+    """
+    d = Path(shard_dir)
+    df = read_table(d / "records.parquet", dtype={"Phone_norm": str, "Zip_norm": str})
+    df = df.set_index(ROW_COL).rename_axis(None)
+    with np.load(d / "codes.npz") as z:
+        codes = {name: z[name] for name in z.files}
+
+    model = _load_model(model_path, meta_path)
+    store = RecordStore.from_frame(df)
+    chunks = list(iter_block_pairs(codes))
+    cand = _label_pairs(np.concatenate(chunks), df.index.to_numpy()) if chunks \
+        else np.empty((0, 2), dtype=np.int64)
+    pred, stats = _match(store, cand, model, similarity_caches(store))
+    stats.update(candidates=len(cand), matches=len(pred), rows=len(df))
+
+    pos = df.index.get_indexer(pred.reshape(-1)).reshape(-1, 2)
+    clusters = union_find(pos[:, 0], pos[:, 1], len(df))
+    rows, entities = canonicalize_labels(df, clusters.labels, CANON_RULES, copy=False)
+
+    np.save(d / "pred.npy", pred)
+    np.save(d / "labels.npy", clusters.labels)
+    write_table(rows.reset_index(names=ROW_COL), d / "rows.parquet")
+    write_table(entities, d / "entities.parquet")
+    (d / "stats.json").write_text(json.dumps({k: int(v) for k, v in stats.items()}), encoding="utf-8")
+    return stats
+
+# --- 3) Coordinator ---
+def run_shards(dirs, workers: int = 1, model_path=None, meta_path=None) -> None:
+    """run_shard for every shard directory, in a process pool when workers > 1."""
+    if workers > 1 and len(dirs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run_shard, dirs, [model_path] * len(dirs), [meta_path] * len(dirs)))
+    else:
+        for d in dirs:
+            run_shard(d, model_path, meta_path)
+
+def merge_shards(df: pd.DataFrame, codes: Dict[str, np.ndarray], shard: np.ndarray, dirs,
+                 model_path=None, meta_path=None):
+    """
+    Combine finished shards. Candidate pairs whose rows fall in different
+    shards are matched here (only blocks spanning several shards are expanded);
+    a union-find over the shard-local cluster labels, linked by these
+    cross-shard edges, gives the global clusters, and only clusters it merged
+    are canonicalized again.
+
+    Returns:
+        (pred_pairs, labels, df_with_eid, entities, stats)
+    """
+    store = RecordStore.from_frame(df)
+    chunks = list(iter_block_pairs(codes, groups=shard))
+    cross = _label_pairs(np.concatenate(chunks), df.index.to_numpy()) if chunks \
+        else np.empty((0, 2), dtype=np.int64)
+    cross_pred, stats = _match(store, cross, _load_model(model_path, meta_path),
+                               similarity_caches(store))
+    stats = {f"cross_{k}": v for k, v in stats.items()}
+    stats.update(cross_candidates=len(cross), cross_matches=len(cross_pred))
+
+    # shard-local labels -> one global node per local cluster
+    node = np.empty(len(df), dtype=np.int64)
+    preds, rows, entities, offset = [cross_pred], [], [], 0
+    for k, d in enumerate(dirs):
+        local = np.load(d / "labels.npy")
+        node[shard == k] = offset + local
+        offset += int(local.max()) + 1 if len(local) else 0
+        preds.append(np.load(d / "pred.npy"))
+        rows.append(read_table(d / "rows.parquet"))
+        entities.append(read_table(d / "entities.parquet"))
+        for name, v in json.loads((d / "stats.json").read_text(encoding="utf-8")).items():
+            stats[name] = stats.get(name, 0) + v
+
+    pos = df.index.get_indexer(cross_pred.reshape(-1)).reshape(-1, 2)
+    merged = union_find(node[pos[:, 0]], node[pos[:, 1]], offset)
+    root = merged.labels[node]
+    labels = pd.factorize(root)[0]                     # clusters numbered by first row
+
+    # re-canonicalize clusters that cross-shard edges merged
+    touched = np.flatnonzero(merged.sizes[root] > 1)
+    rows = pd.concat(rows, ignore_index=True).set_index(ROW_COL).rename_axis(None).loc[df.index]
+    entities = pd.concat(entities, ignore_index=True)
+    if len(touched):
+        sub_rows, sub_entities = canonicalize_labels(df.iloc[touched], labels[touched], CANON_RULES)
+        stale = rows["entity_id"].iloc[touched].unique()
+        rows.iloc[touched, rows.columns.get_loc("entity_id")] = sub_rows["entity_id"].to_numpy()
+        entities = pd.concat([entities[~entities["entity_id"].isin(stale)], sub_entities],
+                             ignore_index=True)
+    entities = (entities.sort_values(["support_size", "entity_id"], ascending=[False, True])
+                        .reset_index(drop=True))
+
+    pred = np.concatenate(preds)
+    pred = pred[np.lexsort((pred[:, 1], pred[:, 0]))]
+    return pred, labels, rows, entities, stats
+
+def sharded_run(df: pd.DataFrame, n_shards: int, shard_dir, key: str = SHARD_KEY,
+                workers: int = 1, model_path=None, meta_path=None,
+                max_block_size: int = MAX_BLOCK_SIZE):
+    """
+    Whole-pipeline run split into n_shards hash partitions of `key`:
+    prepare_shards, run_shards (blocking, matching, local clustering and
+    canonicalization per shard), merge_shards. Results are identical to a
+    single-process run. To use other machines, share shard_dir, run
+    `python src/sharding.py <shard-dir>` there for every shard, then call
+    merge_shards with the output of prepare_shards.
+    """
+    codes, shard, dirs = prepare_shards(df, n_shards, shard_dir, key, max_block_size)
+    run_shards(dirs, workers, model_path, meta_path)
+    return merge_shards(df, codes, shard, dirs, model_path, meta_path)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Run one shard written by sharded_run")
+    ap.add_argument("shard_dir", type=Path)
+    ap.add_argument("--model", type=Path, default=None)
+    ap.add_argument("--meta", type=Path, default=None)
+    args = ap.parse_args(argv)
+    print(run_shard(args.shard_dir, args.model, args.meta))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# simcache.py
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import numpy as np
+import pandas as pd
+
+from rules import FUZZY_SCORERS
+
+class SimilarityCache:
+    """
+    Memoized string similarity over a dictionary-encoded column.
+
+    Rows are mapped to codes into `vocab`; a batch of pairs is reduced to its
+    unique (code_a, code_b) pairs, each unique pair is scored once (or served
+    from the cache) and the scores are broadcast back to the batch. The scorer
+    must be symmetric: (a, b) and (b, a) share one entry.
+
+    Args:
+        vocab: distinct strings; rows with code -1 (missing) score as None.
+        scorer: batch scorer f(a_strings, b_strings, workers) -> float array.
+        codes: per-row codes into vocab, for score_rows().
+        max_entries: keep at most this many scored pairs, evicting the least
+            recently used (0 caches nothing); None keeps everything.
+    """
+    def __init__(self, vocab, scorer: Callable, codes=None, max_entries: Optional[int] = None):
+        # missing values get the extra last slot, which holds None
+        self.vocab = np.append(np.asarray(vocab, dtype=object), None)
+        self.scorer = scorer
+        self.codes = None if codes is None else np.where(np.asarray(codes) < 0, len(vocab), codes)
+        self.max_entries = max_entries
+        self._scores = OrderedDict() if max_entries is not None else {}
+        self.hits = self.misses = self.evictions = 0
+
+    @classmethod
+    def from_values(cls, values, scorer: Callable, max_entries: Optional[int] = None):
+        codes, vocab = pd.factorize(np.asarray(values, dtype=object))
+        return cls(vocab, scorer, codes, max_entries)
+
+    def score_rows(self, pi, pj, workers: int = 1) -> np.ndarray:
+        return self.score_codes(self.codes[pi], self.codes[pj], workers)
+
+    def score_codes(self, a, b, workers: int = 1) -> np.ndarray:
+        a, b = np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64)
+        a, b = np.minimum(a, b), np.maximum(a, b)          # symmetric scorers: one key per pair
+        keys, inverse = np.unique(a * len(self.vocab) + b, return_inverse=True)
+        scores = np.empty(len(keys))
+        todo = []
+        lru = self.max_entries is not None
+        for k, key in enumerate(keys.tolist()):
+            s = self._scores.get(key)
+            if s is None:
+                todo.append(k)
+            else:
+                scores[k] = s
+                if lru:
+                    self._scores.move_to_end(key)
+
+        if todo:
+            todo = np.array(todo)
+            ka, kb = np.divmod(keys[todo], len(self.vocab))
+            scores[todo] = self.scorer(self.vocab[ka], self.vocab[kb], workers)
+            self._scores.update(zip(keys[todo].tolist(), scores[todo].tolist()))
+            if lru:
+                while len(self._scores) > self.max_entries:
+                    self._scores.popitem(last=False)
+                    self.evictions += 1
+
+        self.misses += len(todo)
+        self.hits += len(a) - len(todo)
+        return scores[inverse.reshape(-1)]
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate,
+                'evictions': self.evictions, 'entries': len(self._scores),
+                'vocab': len(self.vocab) - 1}
+
+def similarity_caches(df: pd.DataFrame, max_entries: Optional[int] = None) -> Dict[str, SimilarityCache]:
+    """
+    One SimilarityCache per fuzzy feature, to pass as `sim_cache` to the rules/model
+    matchers. For a store.RecordStore its codes and shared vocabulary are reused.
+    """
+    if not isinstance(df, pd.DataFrame):
+        return {feature: SimilarityCache(df.vocab, scorer, df.codes[col], max_entries)
+                for feature, (col, scorer) in FUZZY_SCORERS.items()}
+    return {feature: SimilarityCache.from_values(df[col], scorer, max_entries)
+            for feature, (col, scorer) in FUZZY_SCORERS.items()}
@@ -0,0 +1,110 @@
+# stagecache.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Optional
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+
+# Bump when a stage's computation changes, so old entries stop matching
+CACHE_VERSION = 2
+MAX_BYTES = 2 * 1024**3
+
+def file_hash(path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+class StageCache:
+    """
+    On-disk cache for pipeline stage results, keyed by content hashes.
+
+    A key hashes everything a stage depends on: input files by content,
+    parameters (thresholds, feature lists, ...) as JSON and the keys of the
+    stages it consumes. Entries are stored column-wise, one .npy file per
+    column in <root>/<stage>-<key>/ plus columns.json (column names and which
+    columns were pickled); reading an entry marks it as recently used, and
+    writing evicts least recently used entries above max_bytes.
+    """
+    def __init__(self, root, max_bytes: int = MAX_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._file_hashes = {}
+
+    # --- keys ---
+    def key(self, *parts) -> str:
+        h = hashlib.sha1(f"v{CACHE_VERSION}".encode())
+        for part in parts:
+            if isinstance(part, Path):
+                part = ("file", self._hash_file(part))
+            elif isinstance(part, np.ndarray):
+                part = ("array", hashlib.sha1(np.ascontiguousarray(part).tobytes()).hexdigest())
+            h.update(json.dumps(part, sort_keys=True, default=str).encode())
+        return h.hexdigest()[:20]
+
+    def _hash_file(self, path: Path) -> str:
+        # content hash, memoized per (path, size, mtime) within this process
+        st = path.stat()
+        sig = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+        if sig not in self._file_hashes:
+            self._file_hashes[sig] = file_hash(path)
+        return self._file_hashes[sig]
+
+    # --- entries ---
+    def _dir(self, stage: str, key: str) -> Path:
+        return self.root / f"{stage}-{key}"
+
+    def get(self, stage: str, key: str) -> Optional[Dict[str, np.ndarray]]:
+        d = self._dir(stage, key)
+        if not (d / "columns.json").exists():
+            self.misses += 1
+            return None
+        manifest = json.loads((d / "columns.json").read_text(encoding="utf-8"))
+        # only object columns were written pickled
+        out = {c: np.load(d / f"{k}.npy", allow_pickle=pickled)
+               for k, (c, pickled) in enumerate(zip(manifest['columns'], manifest['pickled']))}
+        os.utime(d)                      # recently used
+        self.hits += 1
+        return out
+
+    def put(self, stage: str, key: str, arrays: Dict[str, np.ndarray]) -> None:
+        d = self._dir(stage, key)
+        tmp = d.with_name(d.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        pickled = []
+        for k, arr in enumerate(arrays.values()):
+            arr = np.asarray(arr)
+            pickled.append(arr.dtype == object)
+            np.save(tmp / f"{k}.npy", arr, allow_pickle=pickled[-1])
+        manifest = {'columns': list(arrays), 'pickled': pickled}
+        (tmp / "columns.json").write_text(json.dumps(manifest), encoding="utf-8")
+        shutil.rmtree(d, ignore_errors=True)
+        tmp.rename(d)                    # entry appears complete or not at all
+        self.evict()
+
+    # --- size cap ---
+    def entries(self):
+        return [d for d in self.root.iterdir() if d.is_dir() and not d.name.endswith(".tmp")]
+
+    def size(self, d: Path) -> int:
+        return sum(f.stat().st_size for f in d.iterdir())
+
+    def evict(self) -> list:
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self.entries(), key=lambda d: d.stat().st_mtime)
+        sizes = {d: self.size(d) for d in entries}
+        total, dropped = sum(sizes.values()), []
+        for d in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(d, ignore_errors=True)
+            total -= sizes[d]
+            dropped.append(d.name)
+        return dropped
@@ -0,0 +1,135 @@
+# storage.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+# File extension -> backend
+FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+
+def table_format(path) -> str:
+    ext = Path(path).suffix.lower()
+    if ext not in FORMATS:
+        raise ValueError(f"unsupported table format {ext!r} ({path}); use one of {sorted(FORMATS)}")
+    return FORMATS[ext]
+
+def with_format(path, fmt: str) -> Path:
+    """path with the extension of the given backend ('csv', 'parquet' or 'arrow')."""
+    return Path(path).with_suffix(EXTENSIONS[fmt])
+
+# --- 1) Tables ---
+def read_table(path, columns: Optional[Sequence[str]] = None,
+               dtype: Optional[Dict[str, str]] = None, mmap: bool = True) -> pd.DataFrame:
+    """
+    Read a CSV / Parquet / Arrow IPC file, loading only `columns` (all when None).
+
+    Arrow IPC files are memory-mapped when mmap=True: numeric columns are then
+    zero-copy views of the file. `dtype` is applied to the CSV parser, and cast
+    afterwards for the typed formats.
+    """
+    fmt = table_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path, usecols=columns, dtype=dtype)
+    if fmt == 'parquet':
+        df = pd.read_parquet(path, columns=list(columns) if columns is not None else None)
+    else:
+        import pyarrow as pa
+        source = pa.memory_map(str(path)) if mmap else pa.OSFile(str(path))
+        with source:
+            table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(list(columns))
+        df = table.to_pandas()
+    for col, t in (dtype or {}).items():
+        if col in df and df[col].dtype != t:
+            df[col] = df[col].astype(t)
+    return df
+
+def write_table(df: pd.DataFrame, path) -> Path:
+    """Write df (without its index) in the format given by the file extension."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fmt = table_format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+# --- 2) Pair arrays ---
+def pair_dtype(pairs: np.ndarray):
+    # int32 when all labels fit, int64 otherwise
+    if not len(pairs) or (pairs.min() >= np.iinfo(np.int32).min and pairs.max() <= np.iinfo(np.int32).max):
+        return np.int32
+    return np.int64
+
+def write_pairs(pairs, path) -> Path:
+    """Save an (n, 2) array of index pairs as integer columns i, j."""
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    pairs = pairs.astype(pair_dtype(pairs))
+    return write_table(pd.DataFrame({'i': pairs[:, 0], 'j': pairs[:, 1]}), path)
+
+def read_pairs(path) -> np.ndarray:
+    """Load pairs written by write_pairs (or any table with i, j columns) as an (n, 2) int64 array."""
+    df = read_table(path, columns=['i', 'j'])
+    return np.column_stack([df['i'].to_numpy(dtype=np.int64), df['j'].to_numpy(dtype=np.int64)])
+
+class PairWriter:
+    """
+    Append (n, 2) pair chunks to one CSV / Parquet / Arrow IPC file without
+    holding them all: CSV is appended, Parquet gets one row group and Arrow one
+    record batch per chunk. dtype is fixed up front so every chunk shares the schema.
+    """
+    def __init__(self, path, dtype=np.int64):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fmt = table_format(self.path)
+        self.dtype = np.dtype(dtype)
+        self.rows = 0
+        self._writer = self._sink = None
+        if self.fmt == 'csv':
+            self.path.write_text("i,j\n")
+        else:
+            import pyarrow as pa
+            schema = pa.schema([('i', pa.from_numpy_dtype(self.dtype)),
+                                ('j', pa.from_numpy_dtype(self.dtype))])
+            if self.fmt == 'parquet':
+                import pyarrow.parquet as pq
+                self._writer = pq.ParquetWriter(str(self.path), schema)
+            else:
+                self._sink = pa.OSFile(str(self.path), 'wb')
+                self._writer = pa.ipc.new_file(self._sink, schema)
+
+    def write(self, pairs) -> None:
+        pairs = np.asarray(pairs).reshape(-1, 2).astype(self.dtype, copy=False)
+        if not len(pairs):
+            return
+        self.rows += len(pairs)
+        if self.fmt == 'csv':
+            with open(self.path, 'a') as f:
+                np.savetxt(f, pairs, fmt='%d', delimiter=',')
+        else:
+            import pyarrow as pa
+            table = pa.table({'i': pairs[:, 0], 'j': pairs[:, 1]})
+            self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def __enter__(self) -> 'PairWriter':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
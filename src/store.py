@@ -0,0 +1,91 @@
+# store.py
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+import json
+import numpy as np
+import pandas as pd
+
+from rules import prepare_aux_cols
+
+# Columns kept in the store: the *_norm fields plus the auxiliary match columns
+STORE_COLS = ['Name_norm', 'Street_norm', 'City_norm', 'Zip_norm',
+              'Email_norm', 'Phone_norm', 'email_user', 'phone_last4']
+
+class RecordStore:
+    """
+    Compact record store for matching: every column is an int32 array of codes
+    into one vocabulary shared by all columns (-1 = missing value).
+
+    Equality features become integer comparisons on contiguous arrays, and the
+    store can be saved as .npy files and opened memory-mapped, so worker
+    processes share the pages instead of unpickling DataFrame copies. The rules
+    batch functions (pair_features_batch, rules_fired, ...) accept a store in
+    place of the DataFrame.
+    """
+    def __init__(self, codes: Dict[str, np.ndarray], vocab: np.ndarray, index):
+        self.codes = codes
+        self.vocab = vocab
+        self.index = pd.Index(index)
+        self.columns = list(codes)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, columns: Iterable[str] = STORE_COLS) -> 'RecordStore':
+        # aux columns are added to a copy of the needed columns, not to the caller's frame
+        needed = set(columns) | {'Email_norm', 'Phone_norm'}
+        df = prepare_aux_cols(df[[c for c in df.columns if c in needed]].copy())
+        cols = [c for c in columns if c in df]
+        stacked = np.concatenate([df[c].to_numpy(dtype=object) for c in cols]) if cols else []
+        codes, vocab = pd.factorize(stacked)
+        parts = np.split(codes.astype(np.int32), len(cols)) if cols else []
+        return cls(dict(zip(cols, parts)), np.asarray(vocab, dtype=object), df.index)
+
+    # --- access used by the rules batch functions ---
+    def values(self, col: str) -> np.ndarray:
+        """Decoded column as an object array, None for missing values."""
+        c = self.codes[col]
+        return np.where(c >= 0, self.vocab[c], None)
+
+    def equal(self, col: str, pi: np.ndarray, pj: np.ndarray) -> np.ndarray:
+        a = self.codes[col][pi]
+        return (a == self.codes[col][pj]) & (a >= 0)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.codes.values())
+
+    # --- persistence ---
+    def save(self, path) -> Path:
+        """
+        Write <path>/<column>.npy code arrays, the vocabulary as UTF-8 bytes plus
+        offsets (vocab_data.npy / vocab_offsets.npy), the index and meta.json.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        for col, c in self.codes.items():
+            np.save(path / f"{col}.npy", np.ascontiguousarray(c, dtype=np.int32))
+        encoded = [str(v).encode('utf-8') for v in self.vocab]
+        offsets = np.r_[0, np.cumsum([len(b) for b in encoded])].astype(np.int64)
+        np.save(path / "vocab_data.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+        np.save(path / "vocab_offsets.npy", offsets)
+        np.save(path / "index.npy", self.index.to_numpy(dtype=np.int64))
+        meta = {'columns': self.columns, 'rows': len(self), 'vocab': len(self.vocab)}
+        (path / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        return path
+
+    @classmethod
+    def load(cls, path, mmap: bool = True) -> 'RecordStore':
+        """Open a saved store; code arrays are memory-mapped read-only when mmap=True."""
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        mode: Optional[str] = 'r' if mmap else None
+        codes = {col: np.load(path / f"{col}.npy", mmap_mode=mode) for col in meta['columns']}
+        data = np.load(path / "vocab_data.npy", mmap_mode=mode).tobytes()
+        offsets = np.load(path / "vocab_offsets.npy")
+        vocab = np.array([data[a:b].decode('utf-8') for a, b in zip(offsets[:-1], offsets[1:])],
+                         dtype=object)
+        index = np.load(path / "index.npy", mmap_mode=mode)
+        return cls(codes, vocab, index)
@@ -0,0 +1,104 @@
+# streaming.py
+from __future__ import annotations
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+import numpy as np
+
+from cluster import Clusters, union_find
+from extcluster import external_components
+from parallel import CHUNK_SIZE, chunk_runner, match_chunk, merge_results, split_pairs
+from storage import PairWriter
+from store import RecordStore
+
+# Working memory per candidate pair of a matching chunk: ~400 B peak for the
+# pair arrays, decoded strings, feature frame and model input (tracemalloc),
+# plus two LRU similarity caches of up to one entry per pair
+BYTES_PER_PAIR = 1000
+MIN_CHUNK = 1_000
+
+def chunk_size_for(memory_limit: int, reserved: int = 0) -> int:
+    """
+    Largest candidate chunk whose matching working set fits in memory_limit bytes
+    after `reserved` bytes (records, store). With several workers the chunk is
+    split into one task per worker, so the working set stays the same.
+    """
+    budget = max(memory_limit - reserved, 0)
+    return max(MIN_CHUNK, int(budget // BYTES_PER_PAIR))
+
+class EdgeSpool:
+    """
+    Predicted edges spooled to disk as chunks of row positions
+    (<dir>/edges-00000.npy, ...), int32 while the row count allows it.
+    Nothing but the chunk being written is kept in memory.
+    """
+    def __init__(self, path, n_rows: int):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.n_rows = n_rows
+        self.dtype = np.int32 if n_rows < 2**31 else np.int64
+        self.files = sorted(self.path.glob("edges-*.npy"))
+        self.n_edges = sum(np.load(f, mmap_mode='r').shape[0] for f in self.files)
+
+    def append(self, edges: np.ndarray) -> None:
+        edges = np.asarray(edges).reshape(-1, 2)
+        if not len(edges):
+            return
+        f = self.path / f"edges-{len(self.files):05d}.npy"
+        np.save(f, edges.astype(self.dtype, copy=False))
+        self.files.append(f)
+        self.n_edges += len(edges)
+
+    def __len__(self) -> int:
+        return self.n_edges
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for f in self.files:
+            yield np.load(f, mmap_mode='r')
+
+    def clusters(self, memory_limit: Optional[int] = None) -> Clusters:
+        """
+        union_find over all spooled edges, read into two compact position arrays;
+        with memory_limit (bytes), the edges are unioned chunk by chunk from disk
+        instead (see extcluster.external_components).
+        """
+        if memory_limit is not None:
+            labels = external_components(self.files, self.n_rows, self.path / "labels.npy",
+                                         memory_limit, workdir=self.path)
+            return Clusters.from_labels(np.array(labels))
+        i = np.empty(self.n_edges, dtype=self.dtype)
+        j = np.empty(self.n_edges, dtype=self.dtype)
+        s = 0
+        for e in self:
+            i[s:s + len(e)], j[s:s + len(e)] = e[:, 0], e[:, 1]
+            s += len(e)
+        return union_find(i, j, self.n_rows)
+
+def stream_match(store: RecordStore, pair_chunks: Iterable[np.ndarray], spool: EdgeSpool,
+                 model=None, workers: int = 1, cand_writer: Optional[PairWriter] = None,
+                 pred_writer: Optional[PairWriter] = None,
+                 task_size: int = CHUNK_SIZE) -> Tuple[int, Counter]:
+    """
+    Match a stream of candidate chunks (index labels, as from
+    blocking.iter_candidate_pairs) chunk by chunk: every chunk is written to
+    cand_writer, matched (split into tasks of task_size pairs for the workers),
+    and its matches go to pred_writer and, as row positions, to the spool.
+    Similarity caches are bounded by task_size entries.
+
+    Returns:
+        (n_candidates, stats) with the summed match_chunk counters.
+    """
+    stats, n_cand = Counter(), 0
+    with chunk_runner(store, workers, model, max_entries=task_size) as run:
+        for chunk in pair_chunks:
+            n_cand += len(chunk)
+            if cand_writer is not None:
+                cand_writer.write(chunk)
+            masks, st = merge_results(run(match_chunk, split_pairs(chunk, task_size)))
+            stats.update(st)
+            hit = chunk[np.concatenate(masks)] if masks else chunk[:0]
+            if pred_writer is not None:
+                pred_writer.write(hit)
+            spool.append(np.column_stack([store.index.get_indexer(hit[:, 0]),
+                                          store.index.get_indexer(hit[:, 1])]))
+    return n_cand, stats
@@ -0,0 +1,35 @@
+# tests/test_benchmark.py
+import copy
+import pandas as pd
+from src.benchmark import compare, dataset, run
+
+def test_dataset_cached_with_ground_truth(tmp_path):
+    path = dataset(300, data_dir=tmp_path)
+    df = pd.read_parquet(path)
+    assert len(df) == 300 and df["row_id"].tolist() == list(range(1, 301))
+    assert df["uid"].nunique() < 300                       # есть дубли
+    assert {"Name_norm", "Zip_norm", "Phone_norm"} <= set(df.columns)
+    mtime = path.stat().st_mtime_ns
+    assert dataset(300, data_dir=tmp_path) == path and path.stat().st_mtime_ns == mtime
+
+def test_run_and_compare(tmp_path):
+    res = run([300], data_dir=tmp_path)                    # правила + end_to_end
+    by_stage = {r["stage"]: r for r in res["results"]}
+    assert {"blocking", "parallel_features", "match_rules", "clusters", "canonicalize",
+            "end_to_end"} <= set(by_stage)
+    assert "parallel_match" not in by_stage
+    assert by_stage["blocking"]["candidates"] > 0 and by_stage["blocking"]["PC"] > 0.9
+    # конвейер целиком = отдельные стадии по качеству
+    assert by_stage["end_to_end"]["f1"] == by_stage["match_rules"]["f1"] > 0.9
+    assert all(r["seconds"] > 0 and r["peak_rss_mb"] > 0 for r in res["results"])
+
+    assert not compare(res, res)["regression"].any()
+    worse = copy.deepcopy(res)
+    for r in worse["results"]:
+        if r["stage"] == "end_to_end":
+            r["seconds"] *= 2
+        if r["stage"] == "match_rules":
+            r["f1"] -= 0.1
+    m = compare(res, worse).set_index("stage")
+    assert m.loc["end_to_end", "regression"] and m.loc["match_rules", "regression"]
+    assert not m.loc["blocking", "regression"]
@@ -0,0 +1,54 @@
+# tests/test_blocking.py
+from itertools import combinations
+import numpy as np
+import pandas as pd
+from src.blocking import block_keys, encode_blocks, candidate_pairs, blocking_metrics
+
+def notebook_pairs(df):
+    # эталон: candidate_pairs_from_blocks из blocking.ipynb
+    C = set()
+    for ser in block_keys(df).values():
+        for idxs in ser.groupby(ser).groups.values():
+            C.update(combinations(sorted(map(int, idxs)), 2))
+    return C
+
+def make_df(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "uid": rng.integers(0, 20, n),
+        "Name_norm": rng.choice(["ann lee", "bob ray", "al kim", "bo li"], n),
+        "Street_norm": "main st 1",
+        "City_norm": rng.choice(["austin", "dallas"], n),
+        "Zip_norm": rng.choice(["11111", "22222", "33333"], n),
+        "Email_norm": rng.choice(["a@x.com", "b@y.com", "c@x.com"], n),
+        "Phone_norm": rng.choice(["5550001111", "5550002222", "5550003333"], n),
+    })
+
+def test_candidate_pairs_same_as_notebook():
+    df = make_df()
+    cand = candidate_pairs(df, chunk_size=50)
+    got = list(map(tuple, cand.tolist()))
+    # без дублей, i < j, и ровно то же множество, что в ноутбуке
+    assert len(got) == len(set(got))
+    assert all(i < j for i, j in got)
+    assert set(got) == notebook_pairs(df)
+
+def test_oversized_blocks_subblock_and_skip():
+    df = make_df()
+    report = []
+    cand = candidate_pairs(df, max_block_size=5, report=report)
+    assert report and {r["action"] for r in report} == {"subblock"}
+    assert set(map(tuple, cand.tolist())) <= notebook_pairs(df)
+
+    codes, rep = encode_blocks(block_keys(df), max_block_size=5)
+    for c in codes.values():
+        assert np.bincount(c[c >= 0]).max() <= 5
+
+    codes, rep = encode_blocks(block_keys(df), max_block_size=5, oversize="skip")
+    assert len(rep) and all((c == -1).any() for c in codes.values())
+
+def test_blocking_metrics(small_df):
+    cand = np.array([[0, 1], [0, 2]])
+    m = blocking_metrics(small_df, cand)
+    assert m["true_pairs"] == 1 and m["cand_pairs"] == 2
+    assert m["PC"] == 1.0 and m["PQ"] == 0.5
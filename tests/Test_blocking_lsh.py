@@ -0,0 +1,50 @@
+# tests/test_blocking_lsh.py
+import numpy as np
+import pandas as pd
+from src.rules import prepare_aux_cols
+from src.blocking import candidate_pairs
+from src.blocking_lsh import qgrams, minhash_signatures, lsh_codes, lsh_candidate_pairs
+
+def typo_df():
+    # 0/1 — один человек, но опечатка в zip: точные ключи (все содержат zip) пару не дают
+    return prepare_aux_cols(pd.DataFrame([
+        dict(Name_norm="john doe", Street_norm="main street 10", City_norm="austin",
+             Zip_norm="12345", Email_norm="john.doe@example.com", Phone_norm="5550012345"),
+        dict(Name_norm="john doe", Street_norm="main street 10", City_norm="austin",
+             Zip_norm="12354", Email_norm="john.doe@example.com", Phone_norm="5550012345"),
+        dict(Name_norm="mary smith", Street_norm="oak ave 5", City_norm="dallas",
+             Zip_norm="54321", Email_norm="mary@example.com", Phone_norm="5558877000"),
+        dict(Name_norm=None, Street_norm=None, City_norm="plano",
+             Zip_norm="54321", Email_norm=None, Phone_norm="5558877001"),
+    ], index=[10, 11, 12, 13]))
+
+def test_qgrams():
+    assert qgrams("ab") == {" ab", "ab "}
+    assert qgrams("") == {"  "}
+
+def test_signature_estimates_jaccard():
+    a, b = "jonathan johnson", "jonathon jonson"
+    ga, gb = qgrams(a), qgrams(b)
+    jac = len(ga & gb) / len(ga | gb)
+    sig, valid = minhash_signatures([a, b, a, None], 512)
+    assert valid.tolist() == [True, True, True, False]
+    assert (sig[0] == sig[2]).all()                      # детерминированно
+    assert abs((sig[0] == sig[1]).mean() - jac) < 0.08
+
+def test_lsh_finds_zip_typo():
+    df = typo_df()
+    assert len(candidate_pairs(df)) == 0
+    pairs = lsh_candidate_pairs(df)
+    assert [10, 11] in pairs.tolist()
+    assert not np.isin(pairs, 13).any()                  # пустые поля не попадают в корзины
+    # keys+lsh: надмножество точных ключей, без повторов, i < j
+    both = lsh_candidate_pairs(df, with_keys=True)
+    assert len(np.unique(both, axis=0)) == len(both) and (both[:, 0] < both[:, 1]).all()
+
+def test_more_rows_fewer_candidates(small_df):
+    df = prepare_aux_cols(small_df)
+    codes, _ = lsh_codes(df, bands=4, rows=2)
+    assert len(codes) == 3 * 4 and all(len(c) == len(df) for c in codes.values())
+    loose = lsh_candidate_pairs(df, bands=32, rows=1)
+    strict = lsh_candidate_pairs(df, bands=32, rows=8)
+    assert set(map(tuple, strict.tolist())) <= set(map(tuple, loose.tolist()))
@@ -0,0 +1,36 @@
+# tests/test_blocking_snm.py
+import numpy as np
+import pandas as pd
+from src.blocking import blocking_metrics
+from src.blocking_snm import window_pairs, snm_candidate_pairs
+
+def test_fixed_window():
+    keys = pd.Series(["d", "a", None, "c", "b", "e"])
+    pairs = window_pairs(keys, window=3, max_window=3)
+    # порядок: a(1) b(4) c(3) d(0) e(5); пустой ключ (2) не участвует
+    expect = {(1, 4), (1, 3), (3, 4), (0, 4), (0, 3), (0, 5), (3, 5)}
+    assert set(map(tuple, pairs.tolist())) == expect
+
+def test_window_grows_over_similar_keys():
+    keys = pd.Series(["smith"] * 8 + ["zzz", "zzy"])
+    fixed = window_pairs(keys, window=3, max_window=3)
+    grown = window_pairs(keys, window=3, max_window=20)
+    # все 28 пар внутри серии одинаковых ключей, а дальше окно не растёт
+    assert {(i, j) for i, j in grown.tolist() if j < 8} == {(i, j) for i in range(8) for j in range(i + 1, 8)}
+    assert len(grown) - len(fixed) == 28 - len({(i, j) for i, j in fixed.tolist() if j < 8})
+
+def test_candidates_linear_in_window():
+    rng = np.random.default_rng(0)
+    n = 400
+    df = pd.DataFrame({
+        "uid": np.arange(n) // 2,
+        "Name_norm": [f"name{k // 2}" for k in range(n)],
+        "City_norm": "bigcity",                      # один огромный блок city_zip
+        "Street_norm": rng.choice(["main st 1", "oak ave 5"], n),
+        "Zip_norm": "11111",
+        "Phone_norm": [f"555{k // 2:07d}" for k in range(n)],
+    }, index=np.arange(n) + 1000)
+    cand = snm_candidate_pairs(df, window=4, max_window=4)
+    assert len(cand) <= 4 * n * 3                       # проходы * n * (w - 1)
+    assert len(np.unique(cand, axis=0)) == len(cand) and (cand[:, 0] < cand[:, 1]).all()
+    assert blocking_metrics(df, cand)["PC"] == 1.0
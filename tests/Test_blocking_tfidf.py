@@ -0,0 +1,37 @@
+# tests/test_blocking_tfidf.py
+import numpy as np
+import pandas as pd
+from src.blocking_tfidf import tfidf_matrix, top_k_pairs, tfidf_candidate_pairs
+
+def make_df(n=80, seed=4):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Name_norm": rng.choice(["ann lee", "ann le", "anne lee", "bob ray", "bobby ray", None], n),
+        "Street_norm": rng.choice(["main st 1", "main street 1", "oak ave 5"], n),
+        "City_norm": rng.choice(["austin", "austn", "dallas"], n),
+    }, index=np.arange(n) * 3)
+
+def brute_force(X, k, cutoff):
+    # эталон: плотная матрица косинусов, k лучших соседей (при равенстве — меньший номер)
+    S = (X @ X.T).toarray()
+    np.fill_diagonal(S, -1)
+    out = set()
+    for r in range(len(S)):
+        order = np.lexsort((np.arange(len(S)), -S[r]))
+        out.update((r, c) for c in order[:k] if S[r, c] >= cutoff)
+    return out
+
+def test_top_k_same_as_dense():
+    X = tfidf_matrix(make_df())
+    got = np.concatenate(list(top_k_pairs(X, k=3, cutoff=0.6, chunk_rows=7)))
+    assert set(map(tuple, got.tolist())) == brute_force(X, 3, 0.6)
+    assert np.bincount(got[:, 0]).max() <= 3
+
+def test_candidates_bounded_and_parallel_equal():
+    df = make_df()
+    one = tfidf_candidate_pairs(df, k=4, cutoff=0.5)
+    par = tfidf_candidate_pairs(df, k=4, cutoff=0.5, chunk_rows=10, workers=2, chunk_size=50)
+    assert np.array_equal(one, par)
+    assert len(one) <= 4 * len(df)
+    assert (one[:, 0] < one[:, 1]).all() and len(np.unique(one, axis=0)) == len(one)
+    assert np.isin(one, df.index).all()                  # метки индекса, а не позиции
@@ -0,0 +1,50 @@
+# tests/test_blockmatch.py
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from src.rules import FEATURES, RULES, prepare_aux_cols
+from src.blocking import candidate_pairs
+from src.store import RecordStore
+from src.parallel import match_chunk
+from src.blockmatch import block_match
+
+def make_df(n=150, seed=5):
+    rng = np.random.default_rng(seed)
+    return prepare_aux_cols(pd.DataFrame({
+        "Name_norm": rng.choice(["ann lee", "ann le", "anne lee", "bob ray", "bobby ray"], n),
+        "Street_norm": rng.choice(["main st 1", "main street 1", "oak ave 5", None], n),
+        "City_norm": rng.choice(["austin", "dallas"], n),
+        "Zip_norm": rng.choice(["11111", "22222", "33333", "44444", "55555"], n),
+        "Email_norm": rng.choice(["a@x.com", "b@y.com", "c@x.com", None], n),
+        "Phone_norm": rng.choice(["5550001111", "5550002222", "5550003333"], n),
+    }, index=np.arange(n) * 2 + 7))
+
+def toy_model():
+    rng = np.random.default_rng(0)
+    X = pd.DataFrame(rng.random((200, len(FEATURES))), columns=FEATURES)
+    clf = LogisticRegression().fit(X, (X["name_sim"] + X["street_sim"] > 1).astype(int))
+    return clf, FEATURES, 0.5
+
+@pytest.mark.parametrize("model", [None, toy_model()])
+@pytest.mark.parametrize("matrix_min, matrix_max", [(2, 1000), (8, 20), (1000, 2000)])
+def test_same_as_pair_lists(model, matrix_min, matrix_max):
+    df = make_df()
+    # эталон: blocking.candidate_pairs + match_chunk
+    cand = candidate_pairs(df)
+    mask, _ = match_chunk(RecordStore.from_frame(df), cand, model)
+    ref = cand[mask]
+    ref = ref[np.lexsort((ref[:, 1], ref[:, 0]))]
+    # матрицы, смешанный режим и только списки пар; мелкие пачки решений
+    pred, stats = block_match(df, model, matrix_min=matrix_min, matrix_max=matrix_max,
+                              max_block_size=25, chunk_size=100)
+    assert np.array_equal(pred, ref)
+    assert stats["candidates"] == len(cand)            # каждая пара оценена один раз
+    assert (stats["matrix_blocks"] > 0) == (matrix_min < 1000)
+    # счётчики оценки пар не теряются: как у match_chunk
+    assert stats["pairs"] == len(cand)
+    if model is None:
+        assert sum(stats[r] for r in RULES) == len(ref)
+    if stats["list_pairs"]:
+        assert any(k.endswith("_cache_misses") for k in stats)
+        assert model is not None or stats["fuzzy_computed"] + stats["fuzzy_skipped"] > 0
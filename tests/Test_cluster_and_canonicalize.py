@@ -1,8 +1,9 @@
 # tests/test_cluster_and_canonicalize.py
 import pandas as pd
 from src.rules import prepare_aux_cols
-from src.cluster import build_clusters, summarize_clusters
-from src.canonicalize import canonicalize_all
+from src.cluster import build_clusters, summarize_clusters, summarize_labels, union_find
+import numpy as np
+from src.canonicalize import canonicalize_all, canonicalize_labels
 
 def test_build_clusters_and_summary(small_df):
     df = prepare_aux_cols(small_df.copy())
@@ -34,3 +35,32 @@ def test_canonicalize_all_simple(small_df, canon_rules):
 
     # zip берём по большинству
     assert e0["Zip_norm"] == "12345"
+
+def test_canonicalize_labels_same_as_canonicalize_all(canon_rules):
+    rng = np.random.default_rng(0)
+    n = 40
+    df = pd.DataFrame({c: rng.choice(["a", "bb", "cc", None], n) for c in canon_rules})
+    df.index = rng.permutation(n) * 2
+    df = prepare_aux_cols(df)
+    labels = rng.integers(0, 15, n)
+    clusters = [sorted(df.index[labels == c]) for c in np.unique(labels)]
+    # плюс пользовательское правило — идёт через запасной путь
+    rules = dict(canon_rules, City_norm=lambda s: s.dropna().max() if s.notna().any() else None)
+
+    df1, ent1 = canonicalize_all(df, clusters, rules)
+    df2, ent2 = canonicalize_labels(df, labels, rules)
+    pd.testing.assert_frame_equal(ent1, ent2)
+    pd.testing.assert_frame_equal(df1, df2)
+
+def test_summarize_labels_same_as_summarize_clusters():
+    rng = np.random.default_rng(1)
+    n = 400
+    e = rng.integers(0, n, (n, 2))
+    cl = union_find(e[:, 0], e[:, 1], n)
+    df = pd.DataFrame({"uid": rng.integers(0, 120, n).astype(float)}, index=np.arange(n) * 3)
+    df.loc[df.index[::17], "uid"] = np.nan                # пропуски uid не считаются
+    ref = summarize_clusters(df, cl.to_lists(df.index))
+    pd.testing.assert_frame_equal(summarize_labels(df, cl.labels), ref)
+    # без колонки uid — только размеры
+    ref = summarize_clusters(df[[]], cl.to_lists(df.index))
+    pd.testing.assert_frame_equal(summarize_labels(df[[]], cl.labels), ref)
@@ -0,0 +1,41 @@
+# tests/test_data_generate.py
+import numpy as np
+import pandas as pd
+from src.data_generate import gen_customers_fast, noisy_strings, write_customers
+
+def test_fast_ground_truth_semantics():
+    df = gen_customers_fast(2000, seed=7, shard_size=300)
+    assert df["row_id"].tolist() == list(range(1, len(df) + 1))
+    assert df["uid"].is_monotonic_increasing and df["uid"].nunique() == 2000
+    assert df["uid"].max() == 2000 and df.groupby("uid").size().max() <= 3
+    # первая строка сущности — оригинал: почтовый ящик из имени
+    first = df.drop_duplicates("uid")
+    local = first["name"].str.lower().str.replace(r"[^a-z0-9]+", ".", regex=True)
+    assert (first["email"] == local + "@example.com").all()
+    assert first["phone"].str.fullmatch(r"0\d{9}").all() and df["phone"].str.fullmatch(r"\d{10}").all()
+    assert df["zip"].str.fullmatch(r"\d{5}").all()
+    # дубли меняют имя, но ZIP совпадает
+    dup = df[df.duplicated("uid")].set_index("uid")
+    base = first.set_index("uid").loc[dup.index]
+    assert (dup["zip"] == base["zip"]).all() and (dup["name"] != base["name"]).mean() > 0.3
+
+def test_fast_deterministic_across_workers_and_output(tmp_path):
+    a = gen_customers_fast(900, seed=3, shard_size=200)
+    b = gen_customers_fast(900, seed=3, shard_size=200, workers=2)
+    pd.testing.assert_frame_equal(a, b)
+    assert not a.equals(gen_customers_fast(900, seed=4, shard_size=200))
+    assert write_customers(tmp_path / "c.parquet", 900, seed=3, shard_size=200) == len(a)
+    assert pd.read_parquet(tmp_path / "c.parquet").astype(object).equals(a.astype(object))
+    write_customers(tmp_path / "c.csv", 900, seed=3, shard_size=200)
+    c = pd.read_csv(tmp_path / "c.csv", dtype={"zip": str, "phone": str})
+    assert (c.astype(str).to_numpy() == a.astype(str).to_numpy()).all()
+
+def test_noisy_strings_light_edits():
+    rng = np.random.default_rng(0)
+    src = np.array(["john smith", "ab", "a", "", "main street 12"] * 200)
+    out = noisy_strings(rng, src)
+    diff = np.char.str_len(out) - np.char.str_len(src)
+    assert set(diff.tolist()) <= {0, -1}                   # удаляется не больше одного символа
+    short = np.char.str_len(src) < 2
+    assert (out[short] == src[short]).all()                # короткие строки не трогаем
+    assert (out[~short] != src[~short]).mean() > 0.3
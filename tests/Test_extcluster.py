@@ -0,0 +1,37 @@
+# tests/test_extcluster.py
+import numpy as np
+import pandas as pd
+from src.cluster import build_clusters, Clusters
+from src.extcluster import external_components
+from src.storage import write_pairs
+
+def test_same_clusters_as_build_clusters(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 300
+    edges = rng.integers(0, n, (250, 2))
+    # рёбра разложены по трём файлам .npy
+    files = []
+    for k, part in enumerate(np.array_split(edges, 3)):
+        files.append(tmp_path / f"edges-{k}.npy")
+        np.save(files[-1], part.astype(np.int32))
+    ref = build_clusters(map(tuple, edges.tolist()), range(n))
+    # бюджет в 64 байта: parent на диске, минимальные чанки
+    for limit in (64, 1 << 30):
+        labels = external_components(files, n, tmp_path / f"labels-{limit}.npy",
+                                     memory_limit=limit, workdir=tmp_path)
+        assert Clusters.from_labels(np.array(labels)).to_lists() == ref
+
+def test_pair_tables_with_index(tmp_path):
+    index = pd.Index([10, 20, 30, 40])
+    write_pairs(np.array([[40, 20], [10, 30]]), tmp_path / "pred.parquet")
+    labels = external_components([tmp_path / "pred.parquet"], 4, tmp_path / "l.npy", index=index)
+    assert np.array(labels).tolist() == [0, 1, 0, 1]
+
+def test_star_on_disk(tmp_path):
+    # хаб — последняя строка, parent на диске
+    m = 50_000
+    edges = np.column_stack([np.arange(m), np.full(m, m)]).astype(np.int32)
+    np.save(tmp_path / "star.npy", edges)
+    labels = external_components([tmp_path / "star.npy"], m + 1, tmp_path / "l.npy",
+                                 memory_limit=64, workdir=tmp_path)
+    assert not np.array(labels).any()
@@ -0,0 +1,93 @@
+# tests/test_incremental.py
+import numpy as np
+import pandas as pd
+from src.rules import prepare_aux_cols, rules_fired
+from src.blocking import candidate_pairs
+from src.cluster import cluster_pairs
+from src.canonicalize import CANON_RULES, canonicalize_labels
+from src.incremental import IncrementalState
+
+def make_df(n=90, seed=2):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Name_norm": rng.choice(["ann lee", "ann le", "bob ray", "al kim"], n),
+        "Street_norm": rng.choice(["main st 1", "main street 1", "oak ave 5"], n),
+        "City_norm": rng.choice(["austin", "dallas"], n),
+        "Zip_norm": rng.choice(["11111", "22222", "33333", "44444"], n),
+        "Email_norm": rng.choice(["a@x.com", "b@y.com", None], n),
+        "Phone_norm": rng.choice(["5550001111", "5550002222", "5550003333"], n),
+    })
+
+def test_batches_same_as_full_run(tmp_path):
+    df = prepare_aux_cols(make_df())
+    cand = candidate_pairs(df)
+    pred = cand[rules_fired(df, cand[:, 0], cand[:, 1]) > 0]
+    cl = cluster_pairs(pred, df.index)
+    ref_rows, ref_ent = canonicalize_labels(df, cl.labels, CANON_RULES)
+
+    state = IncrementalState(tmp_path)
+    for lo, hi in [(0, 40), (40, 41), (41, 90)]:
+        state.add(df.iloc[lo:hi])
+    # состояние переживает переоткрытие каталога
+    state = IncrementalState(tmp_path)
+    assert len(state) == len(df)
+    assert set(map(tuple, state.pairs().tolist())) == set(map(tuple, pred.tolist()))
+    assert (state.labels() == cl.labels).all()
+    assert (state.entity_ids() == ref_rows["entity_id"].to_numpy()).all()
+    pd.testing.assert_frame_equal(state.entities().astype(object), ref_ent.astype(object))
+
+def test_untouched_entities_keep_ids(tmp_path):
+    df = make_df()
+    state = IncrementalState(tmp_path)
+    state.add(df)
+    before = state.entity_ids()
+    # новая запись с уникальным zip ни с кем не совпадает
+    new = df.iloc[:1].assign(Zip_norm="99999", Email_norm="z@z.com", Phone_norm="5559999999")
+    stats = state.add(new)
+    assert stats["candidates"] == 0 and stats["entities_updated"] == 1
+    assert (state.entity_ids()[:len(df)] == before).all()
+
+def test_small_batch_reads_only_its_parts(tmp_path, monkeypatch):
+    import src.incremental as inc
+    df = make_df(400, seed=5).assign(Email_norm="a@x.com",
+                                     Zip_norm=[f"{i // 10:05d}" for i in range(400)])
+    state = IncrementalState(tmp_path, buckets=16, record_group=25)
+    state.add(df)
+    stored = {p: p.read_bytes() for p in tmp_path.rglob("*.parquet")}
+    reads = []
+    real = inc._read_parquet
+    monkeypatch.setattr(inc, "_read_parquet", lambda p, g=None: reads.append((p, g)) or real(p, g))
+    stats = state.add(df.iloc[:1].assign(Zip_norm="00005"))
+    assert stats["candidates"] > 0
+    # записи: только нужные row groups, без полного скана
+    rec = [g for p, g in reads if p.parent.name == "records"]
+    assert rec and all(g is not None for g in rec)
+    assert sum(len(g) for g in rec) <= 2      # строки 50..59 лежат в одной группе
+    # индекс: по одному бакету на ключ (у новой записи одно значение каждого ключа)
+    keys = [d for d in (tmp_path / "index").iterdir()]
+    idx = {p.parent for p, _ in reads if "index" in p.parts}
+    assert 0 < len(idx) <= len(keys)
+    ent = {p for p, _ in reads if "entities" in p.parts}
+    assert ent and len(ent) < len(list((tmp_path / "entities").rglob("*.parquet")))
+    # части первого батча не переписываются
+    assert all(p.read_bytes() == b for p, b in stored.items())
+
+def test_delta_of_a_batch(tmp_path):
+    df = make_df()
+    state = IncrementalState(tmp_path)
+    state.add(df.iloc[:60])
+    before = dict(zip(range(60), state.entity_ids()))
+    state.add(df.iloc[60:])
+    pairs, rows, entities, retired = state.delta()
+    ids = state.entity_ids()
+    # пары и сущности батча, строки изменённых кластеров с прежним entity_id
+    assert set(map(tuple, pairs.tolist())) == set(map(tuple, state.pairs().tolist())) - \
+        set(map(tuple, state.delta(0)[0].tolist()))
+    assert (rows["entity_id"] == ids[rows.index]).all()
+    assert set(range(60, 90)) <= set(rows.index)
+    assert [before.get(r) for r in rows.index] == rows["prev_entity_id"].tolist()
+    assert set(entities["entity_id"]) == set(rows["entity_id"]) <= set(ids)
+    assert set(retired) == set(rows["prev_entity_id"].dropna()) - set(ids)
+    # остальные строки не менялись
+    same = np.setdiff1d(np.arange(60), rows.index)
+    assert all(ids[r] == before[r] for r in same)
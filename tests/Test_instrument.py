@@ -0,0 +1,44 @@
+# tests/test_instrument.py
+import json
+import time
+from collections import Counter
+from src.instrument import RunReport, add, begin, count, histogram, timer
+
+def work():
+    return sum(i * i for i in range(20000))
+
+def test_stages_counters_histograms(tmp_path):
+    # без активного отчёта вызовы ничего не делают
+    begin("x"); count("x"); add(Counter(a=1))
+    with timer("x"):
+        pass
+    with RunReport() as rep:
+        begin("load")
+        with timer("read"):
+            time.sleep(0.01)
+        begin("matching")
+        for _ in range(2):
+            with timer("score"):
+                with timer("features"):
+                    work()
+        add(Counter(pairs=10, email_phone_eq=3), "matching.")
+        count("matches", 4)
+        histogram("cluster_size", [1, 1, 2, 3, 3, 3])
+    st = rep.stages
+    assert set(st) == {"load", "load/read", "matching", "matching/score", "matching/score/features"}
+    assert st["load/read"]["seconds"] >= 0.01 and st["load"]["seconds"] >= st["load/read"]["seconds"]
+    assert st["matching/score"]["calls"] == 2 and "peak_rss_mb" in st["matching"]
+    assert rep.counters == {"matching.pairs": 10, "matching.email_phone_eq": 3, "matches": 4}
+    assert rep.histograms["cluster_size"] == {"1": 2, "2": 1, "3": 3}
+    r = json.loads(rep.write(tmp_path / "r.json").read_text())
+    assert r["stages"] == st and r["peak_rss_mb"] > 0
+
+def test_profile_stage(tmp_path):
+    with RunReport(profile=["matching"], profile_dir=tmp_path) as rep:
+        begin("load")
+        work()
+        begin("matching")
+        work()
+    assert list(rep.profiles) == ["matching"]
+    assert (tmp_path / "profile_matching.prof").exists()
+    assert any("work" in row["function"] for row in rep.profiles["matching"]["top"])
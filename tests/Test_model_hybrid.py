@@ -0,0 +1,32 @@
+# tests/test_model_hybrid.py
+from collections import Counter
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from src.rules import prepare_aux_cols, pair_features, is_match
+from src.model import hybrid_predict_pairs, hybrid_is_match
+
+FEAT_COLS = ["name_sim", "street_sim", "zip_eq", "city_eq", "email_user_eq", "phone_last4_eq"]
+
+def toy_clf():
+    rng = np.random.default_rng(0)
+    X = rng.random((200, len(FEAT_COLS)))
+    y = (X[:, 0] > 0.5).astype(int)
+    return LogisticRegression().fit(X, y)
+
+def test_hybrid_predict_pairs_same_as_per_pair(small_df):
+    df = prepare_aux_cols(small_df.copy())
+    clf = toy_clf()
+    cand = [(0, 1), (0, 2), (1, 2)]
+    for thr in [0.0, 0.5, 1.01]:
+        # эталон: исходный цикл is_match OR model score
+        ref = set()
+        for i, j in cand:
+            f = pair_features(df, i, j)
+            x = np.array([[f.get(c, 0) for c in FEAT_COLS]])
+            if is_match(df, i, j) or clf.predict_proba(x)[0, 1] >= thr:
+                ref.add((i, j))
+        stats = Counter()
+        assert hybrid_predict_pairs(df, cand, clf, FEAT_COLS, thr, stats=stats) == ref
+        assert {p for p in cand if hybrid_is_match(df, *p, clf, FEAT_COLS, thr)} == ref
+        # (0, 1) совпал по правилам — модели его признаки не понадобились
+        assert stats["fuzzy_skipped"] >= 1
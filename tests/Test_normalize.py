@@ -0,0 +1,65 @@
+# tests/test_normalize.py
+import random
+import pandas as pd
+from pathlib import Path
+from Normalize_functions import clean_text, clean_email, normalize_phone, normalize_zip
+from src.normalize import normalize_file, normalize_frame
+from src.rules import prepare_aux_cols
+
+DATA = Path(__file__).resolve().parents[1] / "data"
+
+def values(s):
+    return [None if pd.isnull(v) else v for v in s]
+
+def test_frame_matches_per_value_functions():
+    # ASCII, пробельные символы, пунктуация, не-ASCII и пропуски
+    rnd = random.Random(0)
+    alpha = "aZ09_ -.@,!\t\n\x0b\x0c\r\x1c\x7fé Ⅻ٣ßİ"
+    def rs():
+        return None if rnd.random() < 0.05 else "".join(rnd.choice(alpha) for _ in range(rnd.randint(0, 12)))
+    n = 3000
+    raw = pd.DataFrame({"row_id": range(n), "uid": range(n),
+                        **{c: [rs() for _ in range(n)] for c in ["name", "street", "city", "email", "zip", "phone"]}})
+    out = normalize_frame(raw)
+    ref = {"Name_norm": raw["name"].map(clean_text), "City_norm": raw["city"].map(clean_text),
+           "Street_norm": raw["street"].map(clean_text), "Email_norm": raw["email"].map(clean_email),
+           "Zip_norm": raw["zip"].map(normalize_zip),
+           "Phone_norm": raw["phone"].map(lambda p: normalize_phone(p, 10))}
+    for col, expected in ref.items():
+        assert values(out[col]) == values(expected), col
+    # email_user / phone_last4 — как в prepare_aux_cols
+    aux = prepare_aux_cols(out.drop(columns=["email_user", "phone_last4"]))
+    for col in ["email_user", "phone_last4"]:
+        assert values(out[col]) == values(aux[col]), col
+
+def test_numeric_inputs_like_str():
+    # числа проходят через str(), как в normalize_phone / normalize_zip
+    raw = pd.DataFrame({"zip": [7479.0, None, 501.0], "phone": pd.array([5551234567, 42, None], dtype="Int64")})
+    out = normalize_frame(raw, aux=False)
+    assert values(out["Zip_norm"]) == ["74790", None, "5010"]
+    assert values(out["Phone_norm"]) == ["5551234567", "0000000042", None]
+
+def test_file_reproduces_clear_data(tmp_path):
+    # data/raw.csv -> data/clear_data.csv байт в байт, при любом размере чанка
+    for rows in (1_000_000, 97):
+        dst = tmp_path / f"clear_{rows}.csv"
+        assert normalize_file(DATA / "raw.csv", dst, chunk_rows=rows) == 734
+        assert dst.read_bytes() == (DATA / "clear_data.csv").read_bytes()
+    normalize_file(DATA / "raw.csv", tmp_path / "clear.parquet", chunk_rows=200, aux=True)
+    df = pd.read_parquet(tmp_path / "clear.parquet")
+    assert len(df) == 734 and {"email_user", "phone_last4"} <= set(df.columns)
+
+def test_file_chunks_with_other_types(tmp_path):
+    # второй чанк: uid из одних NaN (float вместо int64), email из одних None
+    import pyarrow as pa
+    raw = pa.table({"row_id": [1, 2, 3, 4, 5, 6], "uid": [1, 1, None, None, 2, 3],
+                    "name": ["Ann", "Bob", "Cy", "Di", "Ed", "Flo"],
+                    "email": ["a@x.com", "b@y.com", None, None, "e@z.com", None]})
+    with pa.ipc.new_file(str(tmp_path / "raw.arrow"), raw.schema) as w:
+        w.write_table(raw)
+    for fmt in ("parquet", "arrow"):
+        dst = tmp_path / f"clear.{fmt}"
+        assert normalize_file(tmp_path / "raw.arrow", dst, chunk_rows=2, aux=True) == 6
+        df = pd.read_parquet(dst) if fmt == "parquet" else pa.ipc.open_file(str(dst)).read_all().to_pandas()
+        assert values(df["Email_norm"]) == ["a@x.com", "b@y.com", None, None, "e@z.com", None]
+        assert df["uid"].isna().tolist() == [False, False, True, True, False, False]
@@ -0,0 +1,29 @@
+# tests/test_parallel.py
+import numpy as np
+from src.rules import prepare_aux_cols, rules_fired
+from src.store import RecordStore
+from src.parallel import parallel_match
+
+def test_parallel_match_same_as_serial(small_df):
+    df = prepare_aux_cols(small_df.copy())
+    store = RecordStore.from_frame(df)
+    pairs = np.array([[0, 1], [0, 2], [1, 2], [2, 0], [1, 0]])
+    ref = rules_fired(df, pairs[:, 0], pairs[:, 1]) > 0
+    # 2 процесса, по одной паре на задачу — порядок результатов сохраняется
+    mask, stats = parallel_match(store, pairs, workers=2, chunk_size=1)
+    assert (mask == ref).all()
+    serial, stats1 = parallel_match(store, pairs, workers=1, chunk_size=2)
+    assert (serial == ref).all()
+    assert stats["pairs"] == stats1["pairs"] == len(pairs)
+    assert stats["email_phone_eq"] == stats1["email_phone_eq"]
+
+def test_parallel_features_same_as_batch(small_df):
+    from src.rules import pair_features_batch
+    from src.parallel import parallel_features
+    df = prepare_aux_cols(small_df.copy())
+    store = RecordStore.from_frame(df)
+    pairs = np.array([[0, 1], [0, 2], [1, 2]])
+    ref = pair_features_batch(df, pairs[:, 0], pairs[:, 1])
+    F, stats = parallel_features(store, pairs, workers=2, chunk_size=2)
+    assert F.reset_index(drop=True).equals(ref.reset_index(drop=True))
+    assert stats["pairs"] == len(pairs)
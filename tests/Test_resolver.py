@@ -0,0 +1,152 @@
+# tests/test_resolver.py
+import asyncio
+import json
+import numpy as np
+import pandas as pd
+from src.rules import prepare_aux_cols, rules_fired, pair_features_batch
+from src.blocking import block_keys, candidate_pairs
+from src.cluster import cluster_pairs
+from src.canonicalize import CANON_RULES, canonicalize_labels
+from src.resolver import EntityIndex, serve, _query_keys, _query_record
+
+def make_rows(n=60, seed=3):
+    rng = np.random.default_rng(seed)
+    df = prepare_aux_cols(pd.DataFrame({
+        "Name_norm": rng.choice(["ann lee", "ann le", "bob ray", "al kim"], n),
+        "Street_norm": rng.choice(["main st 1", "main street 1", "oak ave 5"], n),
+        "City_norm": rng.choice(["austin", "dallas"], n),
+        "Zip_norm": rng.choice(["11111", "22222", "33333"], n),
+        "Email_norm": rng.choice(["a@x.com", "b@y.com", None], n),
+        "Phone_norm": rng.choice(["5550001111", "5550002222", None], n),
+    }))
+    cand = candidate_pairs(df)
+    pred = cand[rules_fired(df, cand[:, 0], cand[:, 1]) > 0]
+    rows, _ = canonicalize_labels(df, cluster_pairs(pred, df.index).labels, CANON_RULES)
+    return rows
+
+def test_query_side_matches_batch_code():
+    rows = make_rows()
+    index = EntityIndex(rows)
+    queries = [_query_record(r) for r in rows.to_dict("records")]
+    # ключи запроса = blocking.block_keys
+    keys = block_keys(index.df)
+    for i, q in enumerate(queries):
+        ref = {name: s.iloc[i] for name, s in keys.items() if isinstance(s.iloc[i], str)}
+        assert _query_keys(q) == ref
+    # признаки = pair_features_batch по тем же парам
+    pairs = index.candidates([_query_keys(q) for q in queries])
+    pd.testing.assert_frame_equal(index.features(queries, pairs),
+                                  pair_features_batch(index.df, pairs[:, 0], pairs[:, 1]))
+
+def test_resolve_returns_entity():
+    rows = make_rows()
+    index = EntityIndex(rows)
+    res = index.resolve(rows.to_dict("records"))
+    assert [r["entity_id"] for r in res] == rows["entity_id"].tolist()
+    assert all(m["rule"] is not None for r in res for m in r["matches"])
+    # нет общих ключей или полей -> без совпадений
+    assert index.resolve([{"Name_norm": "zed", "Zip_norm": "99999"}, {}]) == \
+        [{"entity_id": None, "matches": []}] * 2
+
+def test_numeric_zip_and_phone():
+    rows = make_rows()
+    index = EntityIndex(rows)
+    recs = rows.iloc[:5].to_dict("records")
+    # zip / phone числами из JSON дают те же ключи и совпадения, что и строки
+    nums = [dict(r, Zip_norm=int(r["Zip_norm"]),
+                 Phone_norm=int(r["Phone_norm"]) if isinstance(r["Phone_norm"], str) else None)
+            for r in recs]
+    assert index.resolve(nums) == index.resolve(recs)
+    assert all(r["entity_id"] is not None for r in index.resolve(nums))
+
+def test_http_service(tmp_path):
+    rows = make_rows()
+    rows.to_csv(tmp_path / "rows.csv", index=False)
+    index = EntityIndex.load(tmp_path / "rows.csv")
+    recs = [{k: v for k, v in r.items() if isinstance(v, str)} for r in rows.to_dict("records")]
+
+    async def request(reader, writer, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+        head = (await reader.readuntil(b"\r\n\r\n")).decode()
+        n = int(head.lower().split("content-length:")[1].split("\r\n")[0])
+        return int(head.split(" ")[1]), json.loads(await reader.readexactly(n))
+
+    async def client(port, part):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        out = [await request(reader, writer, "POST", "/resolve", r) for r in part]
+        writer.close()
+        return out
+
+    async def run():
+        server, resolver = await serve(index, port=0)
+        port = server.sockets[0].getsockname()[1]
+        # параллельные клиенты по keep-alive соединениям
+        parts = await asyncio.gather(*(client(port, recs[i::4]) for i in range(4)))
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        batch = await request(reader, writer, "POST", "/resolve", {"records": recs[:5]})
+        missing = await request(reader, writer, "GET", "/nope")
+        stats = await request(reader, writer, "GET", "/stats")
+        writer.close()
+        server.close()
+        await resolver.stop()
+        return parts, batch, missing, stats
+
+    parts, batch, missing, stats = asyncio.run(run())
+    for i, part in enumerate(parts):
+        assert [r["entity_id"] for _, r in part] == [r["entity_id"] for r in recs[i::4]]
+    assert batch[0] == 200 and len(batch[1]["results"]) == 5
+    assert missing[0] == 404
+    code, st = stats
+    assert code == 200 and st["queries"] == len(recs) + 5 and st["batches"] <= st["queries"]
+    assert 0 < st["p50_ms"] <= st["p99_ms"]
+
+def test_http_bad_requests():
+    index = EntityIndex(make_rows())
+    rec = {"Name_norm": "ann lee", "Zip_norm": "11111"}
+
+    async def raw(port, data):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(data)
+        head = (await reader.readuntil(b"\r\n\r\n")).decode()
+        n = int(head.lower().split("content-length:")[1].split("\r\n")[0])
+        body = json.loads(await reader.readexactly(n))
+        writer.close()
+        return int(head.split(" ")[1]), body
+
+    def post(body):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        return f"POST /resolve HTTP/1.1\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data
+
+    async def run():
+        server, resolver = await serve(index, port=0, max_body=1000)
+        port = server.sockets[0].getsockname()[1]
+        out = {}
+        # тело больше лимита -> 413 без чтения тела
+        out["big"] = await raw(port, b"POST /resolve HTTP/1.1\r\nContent-Length: 10000000000\r\n\r\n")
+        # кривая строка запроса и Content-Length
+        out["line"] = await raw(port, b"GARBAGE\r\n\r\n")
+        out["length"] = await raw(port, b"POST /resolve HTTP/1.1\r\nContent-Length: abc\r\n\r\n")
+        # тело не объект / records не список объектов
+        for name, body in [("json", b"{oops"), ("list", [rec]), ("scalar", 5),
+                           ("records", {"records": 5}), ("items", {"records": [rec, 1]}),
+                           ("field", dict(rec, Zip_norm=11111.0)), ("nested", {"records": [dict(rec, Phone_norm=[1])]})]:
+            out[name] = await raw(port, post(body))
+        # ошибка внутри resolve -> 500, сервис продолжает работать
+        ok = index.resolve
+        index.resolve = lambda recs: 1 / 0
+        out["fail"] = await raw(port, post(rec))
+        index.resolve = ok
+        out["after"] = await raw(port, post(rec))
+        out["number"] = await raw(port, post(dict(rec, Zip_norm=11111)))
+        server.close()
+        await resolver.stop()
+        return out
+
+    out = asyncio.run(run())
+    for name in ["line", "length", "json", "list", "scalar", "records", "items", "field", "nested"]:
+        assert out[name][0] == 400 and out[name][1]["error"], name
+    assert out["fail"][0] == 500 and "ZeroDivisionError" in out["fail"][1]["error"]
+    assert out["after"][0] == 200 and out["after"][1]["entity_id"] is not None
+    assert out["number"] == out["after"]
+    assert out["big"][0] == 413 and out["big"][1]["error"]
@@ -0,0 +1,85 @@
+# tests/test_rules_batch.py
+from collections import Counter
+import numpy as np
+import pandas as pd
+from src.rules import (FEATURES, RULES, prepare_aux_cols, pair_features, pair_features_batch,
+                       is_match, match_rules, rule_counts, rules_fired,
+                       LazyFeatures, lazy_pair_features)
+
+def test_pair_features_batch_matches_per_pair(small_df):
+    df = prepare_aux_cols(small_df.copy())
+    pairs = [(0, 1), (0, 2), (1, 2), (2, 0)]
+    F = pair_features_batch(df, [p[0] for p in pairs], [p[1] for p in pairs])
+
+    assert list(F.columns) == FEATURES
+    assert len(F) == len(pairs)
+    # каждая строка совпадает с поэлементным pair_features
+    for k, (i, j) in enumerate(pairs):
+        f = pair_features(df, i, j)
+        for c in FEATURES:
+            assert F[c].iloc[k] == f[c], (i, j, c)
+
+def test_pair_features_batch_missing_values(small_df):
+    df = small_df.copy()
+    df.loc[[0, 1], "Zip_norm"] = np.nan
+    df.loc[0, "Name_norm"] = np.nan
+    df = prepare_aux_cols(df)
+    F = pair_features_batch(df, np.array([0]), np.array([1]))
+    f = pair_features(df, 0, 1)
+    # NaN != NaN, как и в pair_features
+    assert not F["zip_eq"].iloc[0] and not f["zip_eq"]
+    assert F["name_sim"].iloc[0] == f["name_sim"] == 0.0
+
+def test_pair_features_batch_empty(small_df):
+    df = prepare_aux_cols(small_df.copy())
+    F = pair_features_batch(df, np.array([], dtype=int), np.array([], dtype=int))
+    assert F.empty and list(F.columns) == FEATURES
+
+def test_match_rules_agree_with_is_match(small_df):
+    df = prepare_aux_cols(small_df.copy())
+    pairs = [(0, 1), (0, 2), (1, 2)]
+    F = pair_features_batch(df, [p[0] for p in pairs], [p[1] for p in pairs])
+    # и с порогами по умолчанию, и с переопределёнными
+    for thr in [{}, dict(name_thr=0.5, street_thr=10, hard_name=0.5), dict(name_thr=1.01)]:
+        fired = match_rules(F, **thr)
+        assert [bool(k) for k in fired] == [is_match(df, i, j, **thr) for i, j in pairs]
+
+def test_match_rules_reports_first_rule():
+    F = pd.DataFrame({
+        "name_sim":  [1.0, 0.95, 0.0, 0.0],
+        "street_sim": [100.0, 0.0, 90.0, 0.0],
+        "zip_eq":    [True, True, True, False],
+        "city_eq":   [True, False, False, False],
+        "email_eq":  [True, False, False, False],
+        "phone_eq":  [False, False, False, False],
+        "email_user_eq":  [False, False, False, False],
+        "phone_last4_eq": [False, False, False, False],
+    })
+    fired = match_rules(F)
+    assert [RULES[k - 1] if k else None for k in fired] == \
+        ["email_phone_eq", "name_zip_city", "street_zip", None]
+    assert rule_counts(fired)["street_zip"] == 1
+
+def test_lazy_features_same_decisions(small_df):
+    df = prepare_aux_cols(small_df.copy())
+    pairs = [(0, 1), (0, 2), (1, 2), (2, 1)]
+    i, j = [p[0] for p in pairs], [p[1] for p in pairs]
+    stats = Counter()
+    lazy = rules_fired(df, i, j, stats=stats)
+    # ленивый режим даёт те же правила, что и полный расчёт признаков
+    assert (lazy == rules_fired(df, i, j, lazy=False)).all()
+    assert stats["pairs"] == 4
+    assert stats["fuzzy_computed"] + stats["fuzzy_skipped"] == 2 * len(pairs)
+    # (0, 2): ни zip, ни город, ни email не совпадают — нечёткие метрики не нужны
+    F = lazy_pair_features(df, [0], [2])
+    assert F[["name_sim", "street_sim"]].isna().all(axis=None)
+
+def test_lazy_features_per_pair(small_df):
+    df = prepare_aux_cols(small_df.copy())
+    stats = Counter()
+    f = LazyFeatures(df, 0, 1, stats)
+    assert is_match(df, 0, 1, feats=f) is True
+    # email_eq/phone_eq не совпали, но имя с zip решили дело — улица не считалась
+    assert "street_sim" not in f and stats["fuzzy_skipped"] == 1
+    full = pair_features(df, 0, 1)
+    assert all(f[c] == full[c] for c in FEATURES)
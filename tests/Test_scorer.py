@@ -0,0 +1,60 @@
+# tests/test_scorer.py
+import json
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LogisticRegression
+from src.rules import prepare_aux_cols
+from src.model import load_model_bundle, model_matrix, model_proba, hybrid_predict_pairs
+from src.scorer import compile_model, scorer_path
+
+FEAT_COLS = ["name_sim", "street_sim", "zip_eq", "city_eq", "email_user_eq", "phone_last4_eq"]
+
+def toy_bundle(path, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.random((200, len(FEAT_COLS)))
+    clf = LogisticRegression().fit(X, (X[:, 0] + X[:, 1] > 1).astype(int))
+    joblib.dump({"clf": clf, "feat_cols": FEAT_COLS, "threshold": 0.6}, path)
+    return clf
+
+def features(n=500, seed=1):
+    rng = np.random.default_rng(seed)
+    F = pd.DataFrame({"name_sim": rng.random(n), "street_sim": rng.random(n) * 100})
+    for c in FEAT_COLS[2:]:
+        F[c] = rng.random(n) < 0.5
+    return F
+
+def test_compiled_same_as_sklearn(tmp_path):
+    path = tmp_path / "m.joblib"
+    clf = toy_bundle(path)
+    compile_model(path)
+    scorer, feat_cols, thr = load_model_bundle(path)
+    assert type(scorer).__name__ == "LinearScorer" and thr == 0.6 and feat_cols == FEAT_COLS
+    # масштабирование street_sim как в model_matrix, и вход sklearn как есть
+    F = features()
+    ref = clf.predict_proba(model_matrix(F, FEAT_COLS).to_numpy(dtype=float))[:, 1]
+    assert np.abs(model_proba(F, scorer, feat_cols) - ref).max() < 1e-12
+    X = F.to_numpy(dtype=float)
+    assert np.abs(scorer.predict_proba(X) - clf.predict_proba(X)).max() < 1e-12
+
+def test_hybrid_with_compiled(small_df, tmp_path):
+    df = prepare_aux_cols(small_df.copy())
+    path = tmp_path / "m.joblib"
+    clf = toy_bundle(path)
+    compile_model(path)
+    scorer, feat_cols, _ = load_model_bundle(path)
+    cand = [(0, 1), (0, 2), (1, 2)]
+    for thr in [0.0, 0.5, 1.01]:
+        assert hybrid_predict_pairs(df, cand, scorer, feat_cols, thr) == \
+               hybrid_predict_pairs(df, cand, clf, feat_cols, thr)
+
+def test_stale_artifact_ignored(tmp_path):
+    path = tmp_path / "m.joblib"
+    toy_bundle(path)
+    out = compile_model(path)
+    assert out == scorer_path(path) and json.loads(out.read_text())["kind"] == "logistic"
+    # пересохранённая модель: артефакт устарел -> снова sklearn
+    toy_bundle(path, seed=2)
+    assert isinstance(load_model_bundle(path)[0], LogisticRegression)
+    # сам артефакт можно передать вместо модели
+    assert type(load_model_bundle(out)[0]).__name__ == "LinearScorer"
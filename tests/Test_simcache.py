@@ -0,0 +1,38 @@
+# tests/test_simcache.py
+import numpy as np
+from src.rules import prepare_aux_cols, pair_features_batch, name_scores
+from src.simcache import SimilarityCache, similarity_caches
+
+def test_cached_features_match_uncached(small_df):
+    df = prepare_aux_cols(small_df.copy())
+    df.loc[2, "Name_norm"] = np.nan
+    i, j = np.array([0, 0, 1, 0, 2]), np.array([1, 2, 2, 1, 0])
+    caches = similarity_caches(df)
+    F = pair_features_batch(df, i, j)
+    # второй проход целиком из кэша
+    for _ in range(2):
+        G = pair_features_batch(df, i, j, sim_cache=caches)
+        assert (F.values == G.values).all()
+    # (0, 2) и (2, 0) - одна запись кэша
+    st = caches["name_sim"].stats()
+    assert st["misses"] == 3 and st["hits"] == 7 and st["entries"] == 3
+
+def test_bounded_cache_evicts():
+    cache = SimilarityCache.from_values(["ann", "anna", "bob", "bobby"], name_scores, max_entries=2)
+    s = cache.score_codes([0, 1, 2, 0], [1, 2, 3, 1])
+    assert s[0] == s[3] and cache.hits == 1
+    assert cache.stats()["entries"] == 2 and cache.evictions == 1
+    # вытесненная пара (0, 1) считается заново
+    cache.score_codes([0], [1])
+    assert cache.misses == 4
+
+def test_bounded_cache_zero_and_one():
+    vals = ["ann", "anna", "bob", "bobby"]
+    ref = SimilarityCache.from_values(vals, name_scores).score_codes([0, 1, 2], [1, 0, 3])
+    # 0 - ничего не кэшируется, 1 - только последняя пара
+    for size, entries in [(0, 0), (1, 1)]:
+        cache = SimilarityCache.from_values(vals, name_scores, max_entries=size)
+        for _ in range(2):
+            assert (cache.score_codes([0, 1, 2], [1, 0, 3]) == ref).all()
+        assert cache.stats()["entries"] == entries
+    assert cache.hits == 3 and cache.misses == 3
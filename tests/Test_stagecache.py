@@ -0,0 +1,34 @@
+# tests/test_stagecache.py
+import json
+import os
+import numpy as np
+from src.stagecache import StageCache
+
+def test_roundtrip_and_keys(tmp_path):
+    cache = StageCache(tmp_path / "cache")
+    data = tmp_path / "data.csv"
+    data.write_text("a,b\n1,2\n")
+    key = cache.key("features", data, [0.92, 88])
+    assert cache.get("features", key) is None
+    arrays = {"x": np.arange(5), "s": np.array(["a", None, "c"], dtype=object)}
+    cache.put("features", key, arrays)
+    out = cache.get("features", key)
+    assert (out["x"] == arrays["x"]).all() and list(out["s"]) == ["a", None, "c"]
+    assert (cache.hits, cache.misses) == (1, 1)
+    # pickle только для object-столбцов
+    manifest = json.loads((tmp_path / "cache" / f"features-{key}" / "columns.json").read_text())
+    assert manifest == {"columns": ["x", "s"], "pickled": [False, True]}
+    # другой порог или другое содержимое файла — другой ключ
+    assert cache.key("features", data, [0.90, 88]) != key
+    data.write_text("a,b\n1,3\n")
+    assert cache.key("features", data, [0.92, 88]) != key
+
+def test_eviction_lru(tmp_path):
+    cache = StageCache(tmp_path, max_bytes=3000)
+    for k in range(3):
+        cache.put("s", str(k), {"x": np.zeros(100)})   # ~1 KB на запись
+        os.utime(tmp_path / f"s-{k}", (k, k))
+    cache.get("s", "0")                                 # 0 — самая свежая
+    cache.put("s", "3", {"x": np.zeros(100)})
+    names = {d.name for d in cache.entries()}
+    assert "s-0" in names and "s-1" not in names and "s-3" in names
@@ -0,0 +1,31 @@
+# tests/test_storage.py
+import numpy as np
+import pandas as pd
+import pytest
+from src.storage import read_table, write_table, read_pairs, write_pairs
+
+@pytest.mark.parametrize("ext", [".csv", ".parquet", ".arrow"])
+def test_table_roundtrip_projection(tmp_path, ext):
+    df = pd.DataFrame({"Name_norm": ["anna", "bob"], "Zip_norm": ["01234", "99999"], "n": [1, 2]})
+    path = write_table(df, tmp_path / f"t{ext}")
+    out = read_table(path, columns=["Zip_norm", "n"], dtype={"Zip_norm": str})
+    assert list(out.columns) == ["Zip_norm", "n"]
+    assert out["Zip_norm"].tolist() == ["01234", "99999"]   # ведущий ноль сохраняется
+    assert out["n"].tolist() == [1, 2]
+
+@pytest.mark.parametrize("ext", [".csv", ".parquet", ".arrow"])
+def test_pairs_roundtrip(tmp_path, ext):
+    pairs = np.array([[0, 5], [2, 3]])
+    write_pairs(pairs, tmp_path / f"p{ext}")
+    out = read_pairs(tmp_path / f"p{ext}")
+    assert out.dtype == np.int64 and (out == pairs).all()
+    # в файле — int32, пока метки помещаются
+    if ext != ".csv":
+        assert read_table(tmp_path / f"p{ext}")["i"].dtype == np.int32
+    big = np.array([[0, 2**40]])
+    write_pairs(big, tmp_path / f"b{ext}")
+    assert (read_pairs(tmp_path / f"b{ext}") == big).all()
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        read_table(tmp_path / "x.xlsx")
@@ -0,0 +1,30 @@
+# tests/test_store.py
+import numpy as np
+from src.rules import prepare_aux_cols, pair_features_batch, rules_fired
+from src.store import RecordStore
+
+def test_store_features_same_as_frame(small_df):
+    df = prepare_aux_cols(small_df.copy())
+    df.loc[[0, 1], "Zip_norm"] = np.nan      # NaN != NaN и в хранилище
+    store = RecordStore.from_frame(df)
+    i, j = np.array([0, 0, 1, 2]), np.array([1, 2, 2, 0])
+    F = pair_features_batch(df, i, j)
+    G = pair_features_batch(store, i, j)
+    assert (F.values == G.values).all()
+    assert all(c.dtype == np.int32 for c in store.codes.values())
+
+def test_store_save_and_mmap_load(small_df, tmp_path):
+    df = prepare_aux_cols(small_df.copy())
+    store = RecordStore.from_frame(df)
+    loaded = RecordStore.load(store.save(tmp_path / "store"))
+    assert isinstance(loaded.codes["Name_norm"], np.memmap)
+    assert list(loaded.vocab) == list(store.vocab)
+    i, j = np.array([0, 1]), np.array([1, 2])
+    assert (rules_fired(loaded, i, j) == rules_fired(df, i, j)).all()
+
+def test_from_frame_leaves_input_as_is(small_df):
+    df = small_df.copy()
+    store = RecordStore.from_frame(df)
+    # aux-столбцы только в хранилище, исходный фрейм не меняется
+    assert list(df.columns) == list(small_df.columns)
+    assert {"email_user", "phone_last4"} <= set(store.columns)
@@ -0,0 +1,28 @@
+# tests/test_streaming.py
+import numpy as np
+from src.rules import prepare_aux_cols, rules_fired
+from src.store import RecordStore
+from src.storage import PairWriter, read_pairs
+from src.cluster import cluster_pairs
+from src.streaming import EdgeSpool, stream_match, chunk_size_for
+
+def test_stream_match_same_as_batch(small_df, tmp_path):
+    df = prepare_aux_cols(small_df.copy())
+    store = RecordStore.from_frame(df)
+    pairs = np.array([[0, 1], [0, 2], [1, 2]])
+    ref = pairs[rules_fired(df, pairs[:, 0], pairs[:, 1]) > 0]
+    spool = EdgeSpool(tmp_path / "edges", len(df))
+    # по одной паре на чанк; кандидаты и совпадения пишутся по мере обработки
+    with PairWriter(tmp_path / "cand.parquet") as cw, PairWriter(tmp_path / "pred.csv") as pw:
+        n, stats = stream_match(store, (pairs[k:k + 1] for k in range(len(pairs))), spool,
+                                cand_writer=cw, pred_writer=pw, task_size=1)
+    assert n == 3 and stats["pairs"] == 3
+    assert (read_pairs(tmp_path / "cand.parquet") == pairs).all()
+    assert (read_pairs(tmp_path / "pred.csv") == ref).all()
+    assert len(spool) == len(ref) == len(EdgeSpool(tmp_path / "edges", len(df)))
+    cl = spool.clusters()
+    assert (cl.labels == cluster_pairs(ref, df.index).labels).all()
+
+def test_chunk_size_for():
+    assert chunk_size_for(2**30) > chunk_size_for(2**29)
+    assert chunk_size_for(2**30, reserved=2**31) == 1_000   # нижняя граница
@@ -0,0 +1,45 @@
+# tests/test_union_find.py
+import numpy as np
+from src.cluster import build_clusters, union_find, cluster_pairs
+
+def test_union_find_same_as_build_clusters():
+    rng = np.random.default_rng(0)
+    for n, m in [(1, 0), (10, 4), (200, 150), (500, 2000)]:
+        e = rng.integers(0, n, (m, 2))
+        ref = build_clusters(set(map(tuple, e.tolist())), range(n))
+        cl = union_find(e[:, 0], e[:, 1], n)
+        # те же компоненты и в том же порядке
+        assert cl.to_lists() == ref
+        assert cl.n_clusters == len(ref)
+        assert cl.sizes.sum() == n
+
+def test_union_find_csr_layout():
+    cl = union_find(np.array([3, 0]), np.array([4, 2]), 5)
+    assert cl.labels.tolist() == [0, 1, 0, 2, 2]
+    assert cl.offsets.tolist() == [0, 2, 3, 5]
+    assert cl.members.tolist() == [0, 2, 1, 3, 4]
+
+def test_cluster_pairs_uses_index_labels(small_df):
+    df = small_df.set_axis([10, 20, 30])
+    cl = cluster_pairs({(10, 20)}, df.index)
+    assert cl.to_lists(df.index) == [[10, 20], [30]]
+    assert union_find([], [], 0).to_lists() == []
+
+def test_cluster_pairs_unknown_label():
+    import pandas as pd
+    import pytest
+    # метки вне индекса - ошибка, а не слияние с последней строкой
+    with pytest.raises(KeyError):
+        cluster_pairs(np.array([[0, 99]]), pd.Index([0, 1, 2]))
+
+def test_star_with_hub_at_max_row():
+    # один узел со многими совпадениями (хаб — последняя строка): не O(m²) по раундам
+    import time
+    m = 100_000
+    t0 = time.perf_counter()
+    cl = union_find(np.arange(m), np.full(m, m), m + 1)
+    assert cl.n_clusters == 1 and cl.sizes.tolist() == [m + 1]
+    # цепочка с рёбрами в обратном порядке
+    chain = union_find(np.arange(m - 1)[::-1], np.arange(1, m)[::-1], m)
+    assert chain.n_clusters == 1
+    assert time.perf_counter() - t0 < 5
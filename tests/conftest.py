@@ -4,6 +4,7 @@ import pandas as pd
 import sys, pathlib
 ROOT = pathlib.Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "src"))  # src modules import each other as top-level modules
 @pytest.fixture()
 def small_df():
     # два дубля (uid=1) + один другой объект (uid=2)